@@ -0,0 +1,192 @@
+# audio_ingestion.py
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from functools import partial
+
+from audio_storage import AUDIO_RESPONSE, audio_storage
+from config import AUDIO_JOBS_DIR, AUDIO_WORKERS, AUDIO_MAX_ATTEMPTS
+from rate_limiter import PRIORITY_BULK
+from response_queue import respuestas_queue
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 2
+
+
+class AudioIngestion:
+    """
+    Descarga de notas de voz desacoplada de los handlers de conversación.
+
+    El handler llama a `submit()` con el `file_id` y los metadatos de la
+    respuesta y contesta al usuario de inmediato. Cada trabajo se guarda como
+    un fichero JSON en `jobs_dir` antes de encolarse, de modo que sobrevive a
+    reinicios; un pool acotado de workers asíncronos descarga el audio, lo
+    verifica, lo guarda en `storage` y registra la respuesta en 'respuestas'.
+    El trabajo solo se borra cuando la cola de respuestas confirma que el
+    documento está en MongoDB o en su fichero de desbordamiento; si el bot se
+    detiene antes, se repite al arrancar. Los fallos se reintentan con espera exponencial y,
+    agotados los intentos, el trabajo se mueve a `jobs_dir/failed` para
+    revisarlo a mano.
+    """
+
+    def __init__(self, storage, jobs_dir: str, workers: int, max_attempts: int):
+        self.storage = storage
+        self.jobs_dir = jobs_dir
+        self.failed_dir = os.path.join(jobs_dir, 'failed')
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue = None
+        self._tasks = []
+        self._bot = None
+        # Trabajos cuya respuesta aún no se ha entregado a la cola de respuestas
+        # (en cola, descargándose o esperando un reintento)
+        self._active = set()
+
+    async def start(self, bot):
+        self._bot = bot
+        self._queue = asyncio.Queue()
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+        # Recuperar los trabajos que quedaron pendientes en la ejecución anterior
+        pending = await asyncio.get_running_loop().run_in_executor(None, self._load_pending_jobs)
+        for job in pending:
+            self._active.add(job['job_id'])
+            self._queue.put_nowait(job)
+        if pending:
+            logger.info("Recuperados %s audios pendientes de descargar", len(pending))
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f'audio-worker-{n}')
+            for n in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Detiene los workers. Los trabajos no terminados siguen en disco."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def pending(self) -> int:
+        """Audios cuya respuesta aún no se ha entregado a la cola de respuestas."""
+        return len(self._active)
+
+    async def submit(self, file_id: str, file_size, pregunta_id: str, usuario_id: str, pareja_id=None):
+        """Persiste un trabajo de descarga y lo encola. Devuelve su identificador."""
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'file_id': file_id,
+            'file_size': file_size,
+            'pregunta_id': pregunta_id,
+            'usuario_id': usuario_id,
+            'pareja_id': pareja_id,
+            'fecha_respuesta': datetime.utcnow().isoformat(),
+            'attempts': 0,
+        }
+        await asyncio.get_running_loop().run_in_executor(None, self._write_job, job)
+        self._active.add(job['job_id'])
+        self._queue.put_nowait(job)
+        return job['job_id']
+
+    # ------------------------------------------------------------------------
+    # Persistencia de trabajos
+    # ------------------------------------------------------------------------
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _write_job(self, job: dict):
+        # Escritura atómica: un reinicio nunca deja un JSON a medias
+        path = self._job_path(job['job_id'])
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _load_pending_jobs(self) -> list:
+        jobs = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), encoding='utf-8') as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error("Trabajo de audio ilegible %s: %s", name, e)
+        return jobs
+
+    def _remove_job(self, job_id: str):
+        try:
+            os.remove(self._job_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def _fail_job(self, job: dict):
+        os.replace(self._job_path(job['job_id']), os.path.join(self.failed_dir, f"{job['job_id']}.json"))
+
+    # ------------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------------
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                file_path = await self._download(job)
+                # respuesta_id = job_id (índice único): si el bot se detiene entre la
+                # inserción y el borrado del trabajo, la repetición no se guarda
+                respuestas_queue.enqueue({
+                    'respuesta_id': job['job_id'],
+                    'pregunta_id': job['pregunta_id'],
+                    'usuario_id': job['usuario_id'],
+                    'pareja_id': job['pareja_id'],
+                    'respuesta': file_path,
+                    'fecha_respuesta': datetime.fromisoformat(job['fecha_respuesta']),
+                    **AUDIO_RESPONSE,
+                }, on_saved=partial(self._remove_job, job['job_id']))
+                self._active.discard(job['job_id'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job['attempts'] += 1
+                if job['attempts'] >= self.max_attempts:
+                    logger.error("Audio %s descartado tras %s intentos: %s", job['file_id'], job['attempts'], e)
+                    self._active.discard(job['job_id'])
+                    await loop.run_in_executor(None, self._fail_job, job)
+                else:
+                    delay = RETRY_BASE_DELAY ** job['attempts']
+                    logger.warning("Error al descargar el audio %s (intento %s), reintentando en %ss: %s", job['file_id'], job['attempts'], delay, e)
+                    await loop.run_in_executor(None, self._write_job, job)
+                    loop.call_later(delay, self._queue.put_nowait, job)
+            finally:
+                self._queue.task_done()
+
+    async def _download(self, job: dict) -> str:
+        temp_path = self.storage.temp_path()
+        try:
+            # Las descargas van en segundo plano: ceden el paso a las respuestas a los usuarios
+            file = await self._bot.get_file(job['file_id'], rate_limit_args={'priority': PRIORITY_BULK})
+            await file.download_to_drive(temp_path)
+
+            size = os.path.getsize(temp_path)
+            expected_size = job.get('file_size')
+            if size == 0 or (expected_size and size != expected_size):
+                raise IOError(f"tamaño descargado {size} distinto del esperado {expected_size}")
+
+            name = f"{job['usuario_id']}_{job['pregunta_id']}_{job['job_id']}.ogg"
+            return await asyncio.get_running_loop().run_in_executor(None, self.storage.store, temp_path, name)
+        finally:
+            # store() mueve el fichero; si sigue aquí es que algo ha fallado o se ha cancelado
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+audio_ingestion = AudioIngestion(audio_storage, AUDIO_JOBS_DIR, AUDIO_WORKERS, AUDIO_MAX_ATTEMPTS)
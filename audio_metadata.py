@@ -0,0 +1,247 @@
+# audio_metadata.py
+#
+# Añade a cada respuesta con nota de voz los metadatos del audio (duración,
+# tamaño y canales) en el campo `audio`, para conocer la duración de las
+# grabaciones o encontrar las vacías sin abrir los ficheros:
+#
+#   {'audio': {'duracion': 12.34, 'bytes': 48211, 'canales': 1, 'preskip': 312,
+#              'frecuencia_original': 48000, 'paginas': 14, 'vacio': False}}
+#
+# Los .ogg no se decodifican: solo se leen las cabeceras de las páginas Ogg
+# (saltando el contenido) y el paquete OpusHead. La duración es la posición
+# de granulado de la última página menos el pre-skip, en muestras de 48 kHz.
+# Los ficheros se analizan en un pool de procesos y los resultados se
+# escriben con un bulk_write por lote.
+#
+# Un fichero que no se puede analizar se guarda como {'audio': {'error': ...}};
+# uno que no existe no se marca, para volver a intentarlo en la siguiente
+# ejecución. Por defecto solo se procesan las respuestas sin campo `audio`.
+#
+# Las respuestas con audio se buscan por la marca `tipo_respuesta` (indexada).
+# Las guardadas antes de que existiera se marcan una vez con --mark-legacy,
+# que sí recorre la colección entera.
+#
+# Uso:
+#   python audio_metadata.py [--workers 4] [--batch-size 500] [--all]
+#                            [--base-dir .] [--empty-threshold 0.5] [--dry-run]
+#                            [--mark-legacy]
+#   python audio_metadata.py --file nota.ogg [--file otra.ogg]
+
+import argparse
+import json
+import logging
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+OPUS_SAMPLE_RATE = 48000
+
+# Cabecera de página Ogg (RFC 3533): "OggS", versión, tipo, posición de
+# granulado, número de serie, número de página, CRC y número de segmentos,
+# seguida de la tabla de segmentos con el tamaño de cada uno
+PAGE_HEADER = struct.Struct('<4sBBqIIIB')
+CAPTURE_PATTERN = b'OggS'
+# Una página en la que no termina ningún paquete no tiene posición
+NO_GRANULE = -1
+
+# Paquete de identificación de Opus (RFC 7845, sección 5.1)
+OPUS_HEAD = b'OpusHead'
+OPUS_HEAD_FIELDS = struct.Struct('<BBHI')
+
+logger = logging.getLogger('audio_metadata')
+
+
+class OggError(ValueError):
+    """El fichero no es un Ogg/Opus válido."""
+
+
+def parse_opus_head(packet: bytes) -> tuple:
+    """Canales, pre-skip y frecuencia original del paquete OpusHead."""
+    if not packet.startswith(OPUS_HEAD) or len(packet) < len(OPUS_HEAD) + OPUS_HEAD_FIELDS.size:
+        raise OggError("el primer paquete no es un OpusHead")
+    version, channels, pre_skip, input_sample_rate = OPUS_HEAD_FIELDS.unpack_from(packet, len(OPUS_HEAD))
+    if version >> 4:
+        raise OggError(f"versión de Opus no soportada: {version}")
+    return channels, pre_skip, input_sample_rate
+
+
+def read_opus_metadata(path: str, empty_threshold: float = 0.5) -> dict:
+    """
+    Metadatos de un fichero Ogg/Opus leyendo solo las cabeceras de página.
+
+    Se usa el primer flujo lógico del fichero (las notas de voz de Telegram
+    tienen uno). Si la última página está truncada se usa la última completa
+    y el resultado lleva `truncado`.
+    """
+    size = os.path.getsize(path)
+    serial = None
+    head = None
+    last_granule = 0
+    pages = 0
+    truncated = False
+
+    with open(path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            header = f.read(PAGE_HEADER.size)
+            if not header:
+                break
+            if len(header) < PAGE_HEADER.size:
+                truncated = True
+                break
+            capture, version, _, granule, page_serial, _, _, segments = PAGE_HEADER.unpack(header)
+            if capture != CAPTURE_PATTERN or version != 0:
+                raise OggError(f"cabecera de página no válida en el byte {offset}")
+            lacing = f.read(segments)
+            body_size = sum(lacing)
+            if len(lacing) < segments or offset + PAGE_HEADER.size + segments + body_size > size:
+                truncated = True
+                break
+
+            if serial is None:
+                serial = page_serial
+            if page_serial != serial:
+                f.seek(body_size, os.SEEK_CUR)
+                continue
+
+            pages += 1
+            if head is None:
+                # El OpusHead ocupa siempre la primera página completa
+                head = parse_opus_head(f.read(body_size))
+            else:
+                f.seek(body_size, os.SEEK_CUR)
+            if granule != NO_GRANULE:
+                last_granule = granule
+
+    if head is None:
+        raise OggError("no hay ninguna página Ogg completa")
+    channels, pre_skip, input_sample_rate = head
+    duration = max(0, last_granule - pre_skip) / OPUS_SAMPLE_RATE
+    metadata = {
+        'duracion': round(duration, 3),
+        'bytes': size,
+        'canales': channels,
+        'preskip': pre_skip,
+        'frecuencia_original': input_sample_rate,
+        'paginas': pages,
+        'vacio': duration < empty_threshold,
+    }
+    if truncated:
+        metadata['truncado'] = True
+    return metadata
+
+
+def extract_metadata(path: str, empty_threshold: float = 0.5):
+    """
+    Tarea del pool: los metadatos, {'error': ...} si el fichero no es válido
+    o None si no existe. Nunca lanza, para no detener el resto del lote.
+    """
+    try:
+        return read_opus_metadata(path, empty_threshold)
+    except FileNotFoundError:
+        return None
+    except (OSError, OggError) as e:
+        return {'error': str(e)}
+
+
+# ============================================================================
+# ACTUALIZACIÓN DE 'respuestas'
+# ============================================================================
+
+def mark_legacy_respuestas(db, dry_run: bool = False) -> int:
+    """Marca como audio las respuestas .ogg guardadas antes de `tipo_respuesta`."""
+    import database
+    from audio_storage import AUDIO_RESPONSE, LEGACY_AUDIO_RESPONSE
+
+    collection = db[database.RESPUESTAS]
+    if dry_run:
+        return collection.count_documents(LEGACY_AUDIO_RESPONSE)
+    return collection.update_many(LEGACY_AUDIO_RESPONSE, {'$set': AUDIO_RESPONSE}).modified_count
+
+
+def update_respuestas(db, workers: int = None, batch_size: int = 500, base_dir: str = '.',
+                      reprocess: bool = False, empty_threshold: float = 0.5, dry_run: bool = False) -> dict:
+    """Analiza los audios de las respuestas y guarda sus metadatos con un bulk_write por lote."""
+    # Importados aquí para que los procesos del pool solo carguen el analizador
+    from pymongo import UpdateOne
+
+    import database
+    from audio_storage import AUDIO_RESPONSE, resolve_stored_path
+    from export_responses import SORT, batches
+
+    query = dict(AUDIO_RESPONSE)
+    if not reprocess:
+        query['audio'] = {'$exists': False}
+    collection = db[database.RESPUESTAS]
+    # El orden del índice tipo_respuesta_1_fecha_respuesta_1__id_1
+    cursor = collection.find(query, {'respuesta': 1}).sort(SORT).batch_size(batch_size)
+
+    workers = workers or os.cpu_count() or 1
+    extract = partial(extract_metadata, empty_threshold=empty_threshold)
+    stats = {'analizados': 0, 'vacios': 0, 'errores': 0, 'sin_fichero': 0, 'segundos_audio': 0.0}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in batches(cursor, batch_size):
+            paths = [resolve_stored_path(document['respuesta'], base_dir) for document in batch]
+            chunksize = max(1, len(paths) // (workers * 4))
+            operations = []
+            for document, path, metadata in zip(batch, paths, executor.map(extract, paths, chunksize=chunksize)):
+                if metadata is None:
+                    stats['sin_fichero'] += 1
+                    continue
+                if 'error' in metadata:
+                    logger.warning("No se pudo analizar %s: %s", path, metadata['error'])
+                    stats['errores'] += 1
+                else:
+                    stats['analizados'] += 1
+                    stats['vacios'] += metadata['vacio']
+                    stats['segundos_audio'] += metadata['duracion']
+                operations.append(UpdateOne({'_id': document['_id']}, {'$set': {'audio': metadata}}))
+
+            if operations and not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            logger.info("%s audios analizados, %s vacíos, %s con errores, %s sin fichero",
+                        stats['analizados'], stats['vacios'], stats['errores'], stats['sin_fichero'])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guarda en 'respuestas' la duración, el tamaño y los canales de cada audio.")
+    parser.add_argument('--file', action='append', help="Solo mostrar los metadatos de este fichero (se puede repetir)")
+    parser.add_argument('--workers', type=int, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Respuestas por lote y por bulk_write")
+    parser.add_argument('--base-dir', default='.', help="Directorio de trabajo del bot (para las rutas relativas)")
+    parser.add_argument('--all', action='store_true', help="Volver a analizar también las respuestas que ya tienen metadatos")
+    parser.add_argument('--empty-threshold', type=float, default=0.5, help="Segundos por debajo de los cuales un audio se marca como vacío")
+    parser.add_argument('--dry-run', action='store_true', help="Analizar sin escribir en MongoDB")
+    parser.add_argument('--mark-legacy', action='store_true',
+                        help="Marcar antes las respuestas .ogg guardadas sin tipo_respuesta (recorre la colección)")
+    args = parser.parse_args()
+
+    if args.file:
+        for path in args.file:
+            print(json.dumps({'fichero': path, **(extract_metadata(path, args.empty_threshold) or {'error': 'no existe'})},
+                             ensure_ascii=False))
+        return
+
+    import database
+    from config import validate_config
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    validate_config(require_telegram=False)
+    try:
+        if args.mark_legacy:
+            marked = mark_legacy_respuestas(database.init(), args.dry_run)
+            logger.info("%s respuestas antiguas marcadas como audio%s", marked, ' (simulación)' if args.dry_run else '')
+        stats = update_respuestas(database.init(), args.workers, args.batch_size, args.base_dir, args.all,
+                                  args.empty_threshold, args.dry_run)
+    finally:
+        database.close()
+    logger.info("Terminado: %s audios (%.1f horas), %s vacíos, %s con errores, %s sin fichero%s",
+                stats['analizados'], stats['segundos_audio'] / 3600, stats['vacios'], stats['errores'],
+                stats['sin_fichero'], ' (simulación)' if args.dry_run else '')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# audio_storage.py
+
+import hashlib
+import os
+import uuid
+
+from config import AUDIO_DIR, AUDIO_SHARD_LEVELS, AUDIO_CONTENT_HASHING
+
+CHUNK_SIZE = 1024 * 1024
+
+# Marca de las respuestas con nota de voz en 'respuestas' (la pone
+# audio_ingestion.py; índice en indexes.py). Las consultas de los scripts de
+# audios filtran por ella en lugar de por la extensión de `respuesta`, que
+# obligaría a recorrer la colección entera.
+AUDIO_RESPONSE = {'tipo_respuesta': 'audio'}
+# Las respuestas guardadas antes de la marca, para `audio_metadata.py --mark-legacy`
+LEGACY_AUDIO_RESPONSE = {'respuesta': {'$regex': r'\.ogg$'}, 'tipo_respuesta': {'$exists': False}}
+
+
+class AudioStorage:
+    """Interfaz de almacenamiento de las notas de voz."""
+
+    def temp_path(self) -> str:
+        """Ruta temporal donde descargar un audio antes de guardarlo."""
+        raise NotImplementedError
+
+    def store(self, temp_path: str, name: str) -> str:
+        """Mueve el audio descargado a su ubicación definitiva y devuelve la ruta."""
+        raise NotImplementedError
+
+    def path_for(self, name: str) -> str:
+        """Ruta definitiva que corresponde a un nombre de fichero."""
+        raise NotImplementedError
+
+
+class ShardedAudioStorage(AudioStorage):
+    """
+    Almacenamiento en disco repartido en subdirectorios por hash.
+
+    Cada fichero se guarda en `root/ab/cd/<nombre>`, donde `abcd` son los
+    primeros caracteres del SHA-1 del nombre, de modo que ningún directorio
+    acumula más de unos pocos cientos de ficheros. Con `content_hashing` el
+    nombre pasa a ser el SHA-256 del contenido: los reenvíos idénticos del
+    mismo audio (mismo `file_unique_id`) se guardan una sola vez.
+    """
+
+    def __init__(self, root: str, levels: int = 2, content_hashing: bool = False):
+        self.root = root
+        self.levels = levels
+        self.content_hashing = content_hashing
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def temp_path(self) -> str:
+        # Dentro de `root` para que el movimiento final sea un rename atómico
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return os.path.join(self.tmp_dir, f'{uuid.uuid4()}.part')
+
+    def path_for(self, name: str) -> str:
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        shards = [digest[2 * level:2 * level + 2] for level in range(self.levels)]
+        return os.path.join(self.root, *shards, name)
+
+    def store(self, temp_path: str, name: str) -> str:
+        if self.content_hashing:
+            extension = os.path.splitext(name)[1]
+            name = f'{file_sha256(temp_path)}{extension}'
+
+        final_path = self.path_for(name)
+        if self.content_hashing and os.path.exists(final_path):
+            # Mismo contenido ya almacenado: se reutiliza el fichero existente
+            os.remove(temp_path)
+            return final_path
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+        return final_path
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_stored_path(path: str, base_dir: str = '.') -> str:
+    """Ruta de un audio guardado en 'respuestas', que es relativa al directorio de trabajo del bot."""
+    if os.path.isabs(path) or os.path.exists(path):
+        return path
+    return os.path.join(base_dir, path)
+
+
+audio_storage = ShardedAudioStorage(AUDIO_DIR, AUDIO_SHARD_LEVELS, AUDIO_CONTENT_HASHING)
@@ -0,0 +1,122 @@
+# benchmark.py
+#
+# Benchmark sin red del bot completo: N participantes virtuales recorren el
+# flujo individual y/o el de pareja a través del ConversationHandler real de
+# bot.py, con la API de Telegram y MongoDB simuladas en memoria (offline_bot.py).
+# Informa del rendimiento total y de los percentiles p50/p95/p99 de cada paso.
+#
+# Uso:
+#   python benchmark.py [--participants 50] [--flow ambos] [--concurrency 10]
+#                       [--api-latency 0] [--mongo-latency 0] [--rate-limit]
+#                       [--seed 1] [--json resultados.json]
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from offline_bot import configure_environment, percentile
+
+FLOWS = ('individual', 'grupal')
+
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        'n': len(values),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+    }
+
+
+async def run_benchmark(participants: int, flows: tuple, concurrency: int, api_latency: float,
+                        mongo_latency: float, rate_limit: bool, seed: int) -> dict:
+    from offline_bot import OfflineBot, VirtualParticipant
+
+    offline_bot = OfflineBot(api_latency=api_latency, mongo_latency=mongo_latency, rate_limit=rate_limit)
+    await offline_bot.start()
+
+    rng = random.Random(seed)
+    virtual_participants = [
+        VirtualParticipant(offline_bot, user_id=100000 + index, flow=flows[index % len(flows)],
+                           rng=random.Random(rng.random()))
+        for index in range(participants)
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(participant):
+        async with semaphore:
+            await participant.run()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_one(participant) for participant in virtual_participants))
+    finally:
+        elapsed = time.perf_counter() - start
+        await offline_bot.stop()
+
+    results = {'participantes': participants, 'segundos': elapsed, 'flujos': {}}
+    total_steps = 0
+    for flow in flows:
+        by_label = {}
+        for participant in virtual_participants:
+            if participant.flow != flow:
+                continue
+            for label, latencies in participant.step_latencies.items():
+                by_label.setdefault(label, []).extend(latencies)
+        all_steps = [latency for latencies in by_label.values() for latency in latencies]
+        total_steps += len(all_steps)
+        results['flujos'][flow] = {
+            'total': summarize(all_steps),
+            'pasos': {label: summarize(latencies) for label, latencies in sorted(by_label.items())},
+        }
+
+    results['actualizaciones'] = total_steps
+    results['actualizaciones_por_segundo'] = total_steps / elapsed if elapsed else 0.0
+    results['llamadas_api'] = dict(sorted(offline_bot.request.calls.items()))
+    results['documentos'] = {name: len(collection.documents) for name, collection in offline_bot.collections.items()}
+    return results
+
+
+def print_report(results: dict):
+    print(f"{results['participantes']} participantes, {results['actualizaciones']} actualizaciones "
+          f"en {results['segundos']:.2f} s ({results['actualizaciones_por_segundo']:.1f} actualizaciones/s)")
+    for flow, data in results['flujos'].items():
+        print(f"\nFlujo {flow}")
+        print(f"  {'paso':<36} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+        for label, stats in list(data['pasos'].items()) + [('TOTAL', data['total'])]:
+            print(f"  {label:<36} {stats['n']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                  f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    print(f"\nLlamadas a la API: {results['llamadas_api']}")
+    print(f"Documentos escritos: {results['documentos']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sin red de los flujos del bot')
+    parser.add_argument('--participants', type=int, default=50)
+    parser.add_argument('--flow', choices=FLOWS + ('ambos',), default='ambos')
+    parser.add_argument('--concurrency', type=int, default=10, help='participantes simultáneos')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='segundos simulados por llamada a Telegram')
+    parser.add_argument('--mongo-latency', type=float, default=0.0, help='segundos simulados por operación de MongoDB')
+    parser.add_argument('--rate-limit', action='store_true', help='incluir el limitador de envíos de rate_limiter.py')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='guardar los resultados en este fichero')
+    args = parser.parse_args()
+
+    configure_environment()
+    flows = FLOWS if args.flow == 'ambos' else (args.flow,)
+    results = asyncio.run(run_benchmark(
+        args.participants, flows, args.concurrency, args.api_latency, args.mongo_latency, args.rate_limit, args.seed
+    ))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
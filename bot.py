@@ -1,157 +1,215 @@
 # bot.py
 
-from telegram.ext import Application, CommandHandler, ConversationHandler, MessageHandler, filters, CallbackQueryHandler
+import time
+
+# Inicio de la importación de los módulos del bot (informe de arranque)
+_IMPORT_START = time.perf_counter()
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ConversationHandler, MessageHandler, filters, TypeHandler
 from handlers import (
     task,
     consent_individual,
     consent_group,
     individual,
     group,
+    registration,
     questions_individual,
     questions_group,
     restart,
-    exit as exit_handler 
+    exit as exit_handler,
+    admin
+)
+from forms import (
+    TIPO_TAREA,
+    CONSENTIMIENTO_INDIVIDUAL,
+    CONSENTIMIENTO_GRUPAL,
+    REGISTRO,
+    PREGUNTAS_INDIVIDUAL,
+    PREGUNTAS_GRUPAL
+)
+from config import (
+    TELEGRAM_TOKEN,
+    RUN_MODE,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    MAX_CONCURRENT_UPDATES,
+    MONGO_ENSURE_INDEXES,
+    validate_config
 )
-from forms import *
-from config import TELEGRAM_TOKEN
+from update_processor import PerUserUpdateProcessor
+from callback_router import CallbackRouter
+from persistence import MongoPersistence
+from session_manager import session_manager
+from outbox import outbox
+from rate_limiter import rate_limiter
+import metrics
+from metrics import metrics_server, startup_timer
+import database
+import repository
+from response_queue import respuestas_queue
+from question_bank import question_bank
+from consent_cache import consent_cache
+from audio_ingestion import audio_ingestion
+from logging_setup import setup_logging
 import logging
-from logging.handlers import RotatingFileHandler 
 
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-rotating_error_handler = RotatingFileHandler(
-    'errors.log', maxBytes=5*1024*1024, backupCount=25  
-)
-rotating_error_handler.setLevel(logging.ERROR)
+# Nombres de los estados en las métricas
+STATE_NAMES = {
+    TIPO_TAREA: 'TIPO_TAREA',
+    CONSENTIMIENTO_INDIVIDUAL: 'CONSENTIMIENTO_INDIVIDUAL',
+    CONSENTIMIENTO_GRUPAL: 'CONSENTIMIENTO_GRUPAL',
+    REGISTRO: 'REGISTRO',
+    PREGUNTAS_INDIVIDUAL: 'PREGUNTAS_INDIVIDUAL',
+    PREGUNTAS_GRUPAL: 'PREGUNTAS_GRUPAL',
+}
 
-rotating_error_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-rotating_error_handler.setFormatter(rotating_error_formatter)
+async def post_init(application: Application):
+    # Application.initialize: datos persistidos de las conversaciones y getMe
+    startup_timer.mark('initialize')
+    # Índices de indexes.py (no hace nada con los que ya existen)
+    if MONGO_ENSURE_INDEXES:
+        await repository.ensure_indexes()
+        startup_timer.mark('índices')
+    # Reenviar respuestas pendientes en disco y arrancar la escritura diferida
+    await respuestas_queue.start()
+    startup_timer.mark('respuestas pendientes')
+    # Cargar el banco de preguntas una sola vez para todos los participantes
+    await question_bank.load()
+    question_bank.start_auto_refresh()
+    startup_timer.mark('banco de preguntas')
+    # Textos de consentimiento en memoria para no consultarlos en cada /start
+    await consent_cache.load()
+    consent_cache.start_polling()
+    startup_timer.mark('consentimientos')
+    # Workers de descarga de notas de voz (recuperan los trabajos pendientes)
+    await audio_ingestion.start(application.bot)
+    startup_timer.mark('descargas de audio')
+    # Expulsión de sesiones inactivas (se guardan antes en MongoDB)
+    session_manager.start(application, application.persistence)
+    # Endpoint local de métricas para Prometheus
+    await metrics_server.start()
+    startup_timer.mark('métricas')
+    startup_timer.report()
 
+async def post_shutdown(application: Application):
+    await metrics_server.stop()
+    # Vaciar la cola de respuestas antes de liberar el pool de MongoDB
+    await question_bank.stop_auto_refresh()
+    await consent_cache.stop_polling()
+    await audio_ingestion.stop()
+    await session_manager.stop()
+    await respuestas_queue.stop()
+    repository.shutdown()
 
-logger.addHandler(rotating_error_handler)
+def build_application(token: str = TELEGRAM_TOKEN, request=None, limiter=rate_limiter) -> Application:
+    """
+    Construye la Application con todos sus handlers, sin arrancarla.
 
-def main():
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    `request` sustituye la conexión HTTP con la API de Telegram y `limiter` el
+    limitador de envíos; los usa offline_bot.py para ejecutar el bot sin red en
+    los benchmarks.
+    """
+    persistence = MongoPersistence()
+    builder = (
+        Application.builder()
+        .token(token)
+        .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    # Siempre hay limitador: los envíos en segundo plano usan rate_limit_args
+    application = builder.rate_limiter(limiter).build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', task.start_task)],
         states={
-            TIPO_TAREA: [CallbackQueryHandler(task.handle_task_selection, pattern='^tarea_individual|tarea_grupal$')],        
-            CONSENTIMIENTO_INDIVIDUAL: [CallbackQueryHandler(consent_individual.handle_consent_individual, pattern='^aceptar_consentimiento|rechazar_consentimiento$')],
-            CONSENTIMIENTO_GRUPAL: [CallbackQueryHandler(consent_group.handle_consent_group, pattern='^aceptar_consentimiento_grupal|rechazar_consentimiento_grupal$')],
-
-            PAPEL_INDIVIDUAL: [CallbackQueryHandler(individual.handle_papel, pattern='^papel_estudiante|papel_profesor|papel_investigador|papel_otro$')],
-            OTRO_PAPEL_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.otro_papel)],
-            EMAIL_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.email)],
-            NOMBRE_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.nombre)],
-            ANIO_NACIMIENTO_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.anio_nacimiento)],
-            GENERO_INDIVIDUAL: [CallbackQueryHandler(individual.genero, pattern='^genero_masculino|genero_femenino|genero_otro|genero_prefiero_no_decirlo$')],
-            NIVEL_EDUCATIVO_INDIVIDUAL: [CallbackQueryHandler(individual.handle_nivel_educativo, pattern='^nivel_grado|nivel_maestria|nivel_doctorado|nivel_otro$')],
-            OTRO_NIVEL_EDUCATIVO_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.otro_nivel_educativo)],
-            GRADO_ANIO_INDIVIDUAL: [CallbackQueryHandler(individual.handle_grado_anio, pattern='^grado_\\d|grado_terminado$')],
-            GRADO_TIPO_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.handle_grado_tipo)],
-            UNIVERSIDAD_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.universidad_selection, pattern='^ull|ulpgc|otra_universidad$')],
-            OTRO_UNIVERSIDAD_INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.otro_universidad)],
-            PAIS_NACIMIENTO_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.pais_nacimiento_selection, pattern='^espana|otro_pais$')],
-            PAIS_NACIMIENTO_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.pais_nacimiento_input)],
-            PROVINCIA_NACIMIENTO_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.provincia_nacimiento_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_NACIMIENTO_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.provincia_nacimiento_input)],
-            MUNICIPIO_NACIMIENTO_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.municipio_nacimiento_input)],
-            PAIS_CRIANZA_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.pais_crianza_selection, pattern='^espana|otro_pais$')],
-            PAIS_CRIANZA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.pais_crianza_input)],
-            PROVINCIA_CRIANZA_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.provincia_crianza_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_CRIANZA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.provincia_crianza_input)],
-            MUNICIPIO_CRIANZA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.municipio_crianza_input)],
-            PAIS_RESIDENCIA_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.pais_residencia_selection, pattern='^espana|otro_pais$')],
-            PAIS_RESIDENCIA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.pais_residencia_input)],
-            PROVINCIA_RESIDENCIA_INDIVIDUAL_SELECTION: [CallbackQueryHandler(individual.provincia_residencia_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_RESIDENCIA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.provincia_residencia_input)],
-            MUNICIPIO_RESIDENCIA_INDIVIDUAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, individual.municipio_residencia_input)],
-            TIEMPO_RESIDENCIA_INDIVIDUAL: [CallbackQueryHandler(individual.tiempo_residencia, pattern='^toda_la_vida|mas_de_5|entre_3_y_5|entre_1_y_3|menos_de_1$')],
-
-            PAPEL_PARTICIPANTE_1: [CallbackQueryHandler(group.handle_papel_participante, pattern='^papel_estudiante|papel_profesor|papel_investigador|papel_otro$')],
-            OTRO_PAPEL_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_papel_participante)],
-            EMAIL_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.email_participante)],
-            NOMBRE_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.nombre_participante)],
-            ANIO_NACIMIENTO_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.anio_nacimiento_participante)],
-            GENERO_PARTICIPANTE_1: [CallbackQueryHandler(group.genero_participante, pattern='^genero_masculino|genero_femenino|genero_otro|genero_prefiero_no_decirlo$')],
-            NIVEL_EDUCATIVO_PARTICIPANTE_1: [CallbackQueryHandler(group.nivel_educativo_participante, pattern='^nivel_grado|nivel_maestria|nivel_doctorado|nivel_otro$')],
-            OTRO_NIVEL_EDUCATIVO_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_nivel_educativo_participante)],
-            GRADO_ANIO_PARTICIPANTE_1: [CallbackQueryHandler(group.grado_anio_participante, pattern='^grado_\\d|grado_terminado$')],
-            GRADO_TIPO_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.handle_grado_tipo_participante)],
-            UNIVERSIDAD_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.universidad_selection_participante, pattern='^ull|ulpgc|otra_universidad$')],
-            OTRO_UNIVERSIDAD_PARTICIPANTE_1: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_universidad_participante)],
-            PAIS_NACIMIENTO_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.pais_nacimiento_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_NACIMIENTO_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_nacimiento_participante_input)],
-            PROVINCIA_NACIMIENTO_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.provincia_nacimiento_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_NACIMIENTO_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_nacimiento_participante_input)],
-            MUNICIPIO_NACIMIENTO_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_nacimiento_participante_input)],
-            PAIS_CRIANZA_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.pais_crianza_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_CRIANZA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_crianza_participante_input)],
-            PROVINCIA_CRIANZA_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.provincia_crianza_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_CRIANZA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_crianza_participante_input)],
-            MUNICIPIO_CRIANZA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_crianza_participante_input)],
-            PAIS_RESIDENCIA_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.pais_residencia_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_RESIDENCIA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_residencia_participante_input)],
-            PROVINCIA_RESIDENCIA_PARTICIPANTE_1_SELECTION: [CallbackQueryHandler(group.provincia_residencia_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_RESIDENCIA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_residencia_participante_input)],
-            MUNICIPIO_RESIDENCIA_PARTICIPANTE_1_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_residencia_participante_input)],
-            TIEMPO_RESIDENCIA_PARTICIPANTE_1: [CallbackQueryHandler(group.tiempo_residencia_participante, pattern='^toda_la_vida|mas_de_5|entre_3_y_5|entre_1_y_3|menos_de_1$')],
-
-            PAPEL_PARTICIPANTE_2: [CallbackQueryHandler(group.handle_papel_participante, pattern='^papel_estudiante|papel_profesor|papel_investigador|papel_otro$')],
-            OTRO_PAPEL_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_papel_participante)],
-            EMAIL_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.email_participante)],
-            NOMBRE_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.nombre_participante)],
-            ANIO_NACIMIENTO_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.anio_nacimiento_participante)],
-            GENERO_PARTICIPANTE_2: [CallbackQueryHandler(group.genero_participante, pattern='^genero_masculino|genero_femenino|genero_otro|genero_prefiero_no_decirlo$')],
-            NIVEL_EDUCATIVO_PARTICIPANTE_2: [CallbackQueryHandler(group.nivel_educativo_participante, pattern='^nivel_grado|nivel_maestria|nivel_doctorado|nivel_otro$')],
-            OTRO_NIVEL_EDUCATIVO_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_nivel_educativo_participante)],
-            GRADO_ANIO_PARTICIPANTE_2: [CallbackQueryHandler(group.grado_anio_participante, pattern='^grado_\\d|grado_terminado$')],
-            GRADO_TIPO_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.handle_grado_tipo_participante)],
-            UNIVERSIDAD_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.universidad_selection_participante, pattern='^ull|ulpgc|otra_universidad$')],
-            OTRO_UNIVERSIDAD_PARTICIPANTE_2: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.otro_universidad_participante)],
-            PAIS_NACIMIENTO_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.pais_nacimiento_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_NACIMIENTO_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_nacimiento_participante_input)],
-            PROVINCIA_NACIMIENTO_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.provincia_nacimiento_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_NACIMIENTO_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_nacimiento_participante_input)],
-            MUNICIPIO_NACIMIENTO_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_nacimiento_participante_input)],
-            PAIS_CRIANZA_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.pais_crianza_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_CRIANZA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_crianza_participante_input)],
-            PROVINCIA_CRIANZA_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.provincia_crianza_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_CRIANZA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_crianza_participante_input)],
-            MUNICIPIO_CRIANZA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_crianza_participante_input)],
-            PAIS_RESIDENCIA_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.pais_residencia_participante_selection, pattern='^espana|otro_pais$')],
-            PAIS_RESIDENCIA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.pais_residencia_participante_input)],
-            PROVINCIA_RESIDENCIA_PARTICIPANTE_2_SELECTION: [CallbackQueryHandler(group.provincia_residencia_participante_selection, pattern='^tenerife|las_palmas|otra_provincia$')],
-            PROVINCIA_RESIDENCIA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.provincia_residencia_participante_input)],
-            MUNICIPIO_RESIDENCIA_PARTICIPANTE_2_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, group.municipio_residencia_participante_input)],
-            TIEMPO_RESIDENCIA_PARTICIPANTE_2: [CallbackQueryHandler(group.tiempo_residencia_participante, pattern='^toda_la_vida|mas_de_5|entre_3_y_5|entre_1_y_3|menos_de_1$')],
-            
-            
+            TIPO_TAREA: [CallbackRouter({'tarea': task.handle_task_selection})],
+            CONSENTIMIENTO_INDIVIDUAL: [CallbackRouter({'consentimiento': consent_individual.handle_consent_individual})],
+            CONSENTIMIENTO_GRUPAL: [CallbackRouter({'consentimiento': consent_group.handle_consent_group})],
+
+            REGISTRO: [
+            CallbackRouter({'registro': registration.handle_choice}),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, registration.handle_text),
+            ],
+
             PREGUNTAS_INDIVIDUAL: [
             MessageHandler(filters.ALL & ~filters.COMMAND, questions_individual.handle_questions),
-            CallbackQueryHandler(restart.handle_restart, pattern='^restart$'),  
-            CallbackQueryHandler(exit_handler.handle_exit, pattern='^exit$'), 
-            CallbackQueryHandler(questions_individual.handle_additional_audio, pattern='^(enviar_otro_audio|continuar)$'),
-            CallbackQueryHandler(questions_individual.handle_questions, pattern='^opcion_.*$'),
+            CallbackRouter({
+                ('pregunta', 'opcion'): questions_individual.handle_questions,
+                'audio': questions_individual.handle_additional_audio,
+                ('cuestionario', 'reiniciar'): restart.handle_restart,
+                ('cuestionario', 'salir'): exit_handler.handle_exit,
+            }),
             ],
             PREGUNTAS_GRUPAL: [
             MessageHandler(filters.ALL & ~filters.COMMAND, questions_group.handle_questions),
-            CallbackQueryHandler(restart.handle_restart, pattern='^restart$'),
-            CallbackQueryHandler(exit_handler.handle_exit, pattern='^exit$'),
-            CallbackQueryHandler(questions_group.handle_additional_audio, pattern='^(enviar_otro_audio|continuar)$'),
+            CallbackRouter({
+                ('pregunta', 'opcion'): questions_group.handle_questions,
+                'audio': questions_group.handle_additional_audio,
+                ('cuestionario', 'reiniciar'): restart.handle_restart,
+                ('cuestionario', 'salir'): exit_handler.handle_exit,
+            }),
             ],
         },
         fallbacks=[CommandHandler('start', task.start_task)],
+        name='registro',
+        persistent=True,
     )
+    metrics.instrument_conversation(conv_handler, STATE_NAMES)
 
+    # Registrar la actividad de cada usuario para expulsar las sesiones inactivas
+    application.add_handler(TypeHandler(Update, session_manager.touch), group=-2)
+    # Recuperar user_data desde MongoDB en la primera actualización de cada usuario
+    application.add_handler(TypeHandler(Update, persistence.load_user_data), group=-1)
+    application.add_handler(CommandHandler('recargar_consentimientos', admin.handle_reload_consents))
+    application.add_handler(CommandHandler('sesiones', admin.handle_session_stats))
+    application.add_handler(CommandHandler('envios', admin.handle_rate_limit_stats))
     application.add_handler(conv_handler)
-    application.run_polling()
+    # Enviar, agrupados, los mensajes que los handlers dejaron en la bandeja de salida
+    application.add_handler(TypeHandler(Update, outbox.flush), group=1)
+    return application
+
+def bootstrap():
+    """
+    Prepara el proceso antes de construir la Application: logging, validación
+    de la configuración y cliente de MongoDB. Importar bot.py o los handlers
+    no hace nada de esto.
+    """
+    startup_timer.start(_IMPORT_START)
+    startup_timer.mark('importación')
+    setup_logging()
+    validate_config()
+    startup_timer.mark('configuración')
+    # Crea el cliente; pymongo conecta en segundo plano con la primera operación
+    database.init()
+    startup_timer.mark('cliente de MongoDB')
+
+def main():
+    bootstrap()
+    application = build_application()
+    startup_timer.mark('construcción de la Application')
+
+    if RUN_MODE == 'webhook':
+        # Servidor HTTP local; un proxy inverso con TLS debe reenviar WEBHOOK_URL aquí
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN
+        )
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
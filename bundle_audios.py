@@ -0,0 +1,259 @@
+# bundle_audios.py
+#
+# Empaqueta las notas de voz de 'respuestas' en un tar o un zip para
+# entregarlas a los lingüistas, con un manifiesto (CSV o JSON) que describe
+# cada fichero: la pregunta, la respuesta y los datos de registro del
+# participante o de la pareja (las mismas columnas que export_responses.py).
+#
+# Las grabaciones se eligen por pregunta, pareja, provincia y rango de fechas.
+# Los .ogg se copian al archivo por bloques según se leen las respuestas del
+# cursor, sin cargarlos en memoria; el manifiesto se va escribiendo en un
+# fichero temporal y se añade al final del archivo.
+#
+# Uso:
+#   python bundle_audios.py corpus.tar.gz [--pregunta-id G-1.1 --pregunta-id G-1.2]
+#                           [--pareja-id ...] [--provincia "Las Palmas"]
+#                           [--provincia-campo residencia] [--since 2024-01-01]
+#                           [--until 2024-07-01] [--manifest-format csv|json]
+#                           [--manifest manifiesto.csv] [--base-dir .]
+
+import argparse
+import csv
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import zipfile
+from datetime import datetime
+
+import database
+from audio_storage import AUDIO_RESPONSE, resolve_stored_path
+from config import validate_config
+from export_responses import (
+    SORT,
+    RegistrationCache,
+    as_text,
+    batches,
+    columns,
+    combine,
+    date_query,
+    participant_fields,
+    registration_key,
+    to_row,
+)
+
+logger = logging.getLogger('bundle_audios')
+
+AUDIO_EXTENSION = '.ogg'
+MANIFEST_FIELDS = ('fichero', 'bytes', 'duracion', 'pregunta')
+PROVINCE_CONTEXTS = ('residencia', 'nacimiento', 'crianza')
+
+
+def archive_name(respuesta: dict) -> str:
+    """Ruta del audio dentro del archivo: audios/<pregunta_id>/<respuesta_id>.ogg"""
+    return f"audios/{respuesta.get('pregunta_id') or 'sin_pregunta'}/{respuesta['respuesta_id']}{AUDIO_EXTENSION}"
+
+
+def load_questions(db) -> dict:
+    """Texto de cada pregunta por pregunta_id (el banco de preguntas es pequeño)."""
+    questions = {}
+    for collection in (database.PREGUNTAS_SELECCION_MULTIPLE, database.PREGUNTAS_ABIERTAS):
+        for document in db[collection].find({}, {'_id': 0, 'pregunta_id': 1, 'pregunta': 1}):
+            questions[document.get('pregunta_id')] = document.get('pregunta')
+    return questions
+
+
+def province_matches(row: dict, provinces: set, context: str) -> bool:
+    values = (row.get(f'participante_{number}_provincia_{context}') for number in (1, 2))
+    return any(value and value.strip().lower() in provinces for value in values)
+
+
+# ============================================================================
+# ARCHIVOS
+# ============================================================================
+
+class TarArchive:
+    """tar en modo flujo ('w|'), comprimido con gzip si el nombre acaba en .gz o .tgz."""
+
+    def __init__(self, path: str):
+        mode = 'w|gz' if path.endswith(('.gz', '.tgz')) else 'w|'
+        self._tar = tarfile.open(path, mode)
+
+    def add(self, source: str, name: str):
+        # addfile copia el contenido por bloques desde el fichero abierto
+        info = self._tar.gettarinfo(source, arcname=name)
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        with open(source, 'rb') as f:
+            self._tar.addfile(info, f)
+
+    def close(self):
+        self._tar.close()
+
+
+class ZipArchive:
+    """zip sin compresión: los .ogg ya están comprimidos con Opus."""
+
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def add(self, source: str, name: str):
+        # ZipFile.write también copia por bloques
+        self._zip.write(source, arcname=name)
+
+    def close(self):
+        self._zip.close()
+
+
+def open_archive(path: str):
+    if path.endswith('.zip'):
+        return ZipArchive(path)
+    if path.endswith(('.tar', '.tar.gz', '.tgz')):
+        return TarArchive(path)
+    raise SystemExit(f"Extensión de archivo no soportada: {path} (usa .tar, .tar.gz, .tgz o .zip)")
+
+
+class CsvManifest:
+    name = 'manifest.csv'
+
+    def __init__(self, file, columns: list):
+        self._writer = csv.DictWriter(file, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, row: dict):
+        self._writer.writerow({key: as_text(value) for key, value in row.items()})
+
+    def close(self):
+        pass
+
+
+class JsonManifest:
+    """Array JSON escrito elemento a elemento."""
+
+    name = 'manifest.json'
+
+    def __init__(self, file, columns: list):
+        self.columns = columns
+        self._file = file
+        self._first = True
+        file.write('[\n')
+
+    def write(self, row: dict):
+        if not self._first:
+            self._file.write(',\n')
+        self._first = False
+        self._file.write(json.dumps({column: as_text(row.get(column)) for column in self.columns}, ensure_ascii=False))
+
+    def close(self):
+        self._file.write('\n]\n')
+
+
+MANIFESTS = {'csv': CsvManifest, 'json': JsonManifest}
+
+
+# ============================================================================
+# EMPAQUETADO
+# ============================================================================
+
+def audio_query(pregunta_ids: list = None, pareja_ids: list = None, since: datetime = None,
+                until: datetime = None) -> dict:
+    queries = [
+        dict(AUDIO_RESPONSE),
+        date_query(since, until),
+    ]
+    if pregunta_ids:
+        queries.append({'pregunta_id': {'$in': pregunta_ids}})
+    if pareja_ids:
+        queries.append({'pareja_id': {'$in': pareja_ids}})
+    return combine(*queries)
+
+
+def bundle(db, archive, manifest, query: dict, fields: list, base_dir: str = '.', provinces: set = None,
+           province_context: str = 'residencia', batch_size: int = 500, cache_size: int = 10000) -> dict:
+    """Añade al archivo los audios de `query` y escribe su fila en el manifiesto."""
+    questions = load_questions(db)
+    cache = RegistrationCache(db, cache_size)
+    stats = {'audios': 0, 'bytes': 0, 'sin_fichero': 0, 'descartados': 0}
+
+    cursor = db[database.RESPUESTAS].find(query).sort(SORT).batch_size(batch_size)
+    for batch in batches(cursor, batch_size):
+        registros = cache.lookup(batch)
+        for respuesta in batch:
+            row = to_row(respuesta, registros[registration_key(respuesta)], fields)
+            if provinces and not province_matches(row, provinces, province_context):
+                stats['descartados'] += 1
+                continue
+
+            source = resolve_stored_path(respuesta['respuesta'], base_dir)
+            try:
+                size = os.path.getsize(source)
+                name = archive_name(respuesta)
+                archive.add(source, name)
+            except FileNotFoundError:
+                logger.warning("No existe el audio %s de la respuesta %s", source, respuesta.get('respuesta_id'))
+                stats['sin_fichero'] += 1
+                continue
+
+            row.update({
+                'fichero': name,
+                'bytes': size,
+                # Solo si audio_metadata.py ya ha analizado el fichero
+                'duracion': (respuesta.get('audio') or {}).get('duracion'),
+                'pregunta': questions.get(respuesta.get('pregunta_id')),
+            })
+            manifest.write(row)
+            stats['audios'] += 1
+            stats['bytes'] += size
+        logger.info("%s audios empaquetados (%.1f MB)", stats['audios'], stats['bytes'] / 1_000_000)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Empaqueta las notas de voz seleccionadas con un manifiesto.")
+    parser.add_argument('output', help="Archivo de salida (.tar, .tar.gz, .tgz o .zip)")
+    parser.add_argument('--pregunta-id', action='append', help="Pregunta a incluir (se puede repetir)")
+    parser.add_argument('--pareja-id', action='append', help="Pareja a incluir (se puede repetir)")
+    parser.add_argument('--provincia', action='append', help="Provincia del participante (se puede repetir)")
+    parser.add_argument('--provincia-campo', choices=PROVINCE_CONTEXTS, default='residencia',
+                        help="Provincia de residencia, nacimiento o crianza")
+    parser.add_argument('--since', type=datetime.fromisoformat, help="Solo respuestas desde esta fecha (incluida)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="Solo respuestas anteriores a esta fecha")
+    parser.add_argument('--manifest-format', choices=sorted(MANIFESTS), default='csv')
+    parser.add_argument('--manifest', help="Guardar también una copia del manifiesto en este fichero")
+    parser.add_argument('--base-dir', default='.', help="Directorio de trabajo del bot (para las rutas relativas)")
+    parser.add_argument('--with-personal-data', action='store_true', help="Incluir correo electrónico y nombre")
+    parser.add_argument('--batch-size', type=int, default=500, help="Respuestas por lote")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    validate_config(require_telegram=False)
+
+    fields = participant_fields(args.with_personal_data)
+    manifest_class = MANIFESTS[args.manifest_format]
+    provinces = {province.strip().lower() for province in args.provincia or ()}
+    query = audio_query(args.pregunta_id, args.pareja_id, args.since, args.until)
+
+    archive = open_archive(args.output)
+    try:
+        with tempfile.NamedTemporaryFile('w+', encoding='utf-8', newline='', suffix=manifest_class.name) as f:
+            manifest = manifest_class(f, list(MANIFEST_FIELDS) + columns(fields))
+            stats = bundle(database.init(), archive, manifest, query, fields, args.base_dir, provinces,
+                           args.provincia_campo, args.batch_size)
+            manifest.close()
+            f.flush()
+            archive.add(f.name, manifest_class.name)
+            if args.manifest:
+                f.seek(0)
+                with open(args.manifest, 'w', encoding='utf-8', newline='') as copy:
+                    for chunk in iter(lambda: f.read(1024 * 1024), ''):
+                        copy.write(chunk)
+    finally:
+        archive.close()
+        database.close()
+    logger.info("Archivo %s terminado: %s audios (%.1f MB), %s sin fichero, %s descartados por provincia",
+                args.output, stats['audios'], stats['bytes'] / 1_000_000, stats['sin_fichero'], stats['descartados'])
+
+
+if __name__ == '__main__':
+    main()
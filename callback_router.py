@@ -0,0 +1,66 @@
+# callback_router.py
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+# Formato de callback_data de todos los botones: "<namespace>:<action>[:<arg>]"
+SEPARATOR = ':'
+
+
+def encode_callback(namespace: str, action: str, arg=None) -> str:
+    if arg is None:
+        return f"{namespace}{SEPARATOR}{action}"
+    return f"{namespace}{SEPARATOR}{action}{SEPARATOR}{arg}"
+
+
+def decode_callback(data: str):
+    """Devuelve (namespace, action, arg); arg es None si el botón no lo lleva."""
+    parts = data.split(SEPARATOR, 2)
+    if len(parts) == 2:
+        return parts[0], parts[1], None
+    if len(parts) == 3:
+        return parts[0], parts[1], parts[2]
+    return parts[0], None, None
+
+
+async def answer_stale_callback(update: Update, context):
+    """Botón que no corresponde al paso actual: se cierra la consulta y se sigue en el mismo estado."""
+    await update.callback_query.answer()
+    return None
+
+
+class CallbackRouter(BaseHandler):
+    """
+    Un único handler de CallbackQuery por estado de la conversación.
+
+    `routes` asocia `(namespace, action)` o solo `namespace` a la función que
+    atiende el botón. El callback_data se decodifica una vez en `check_update`
+    y la función se resuelve con un acceso a diccionario, en lugar de probar
+    una expresión regular por cada CallbackQueryHandler del estado. Los botones
+    que no tienen ruta (de mensajes antiguos) van a `default`.
+    """
+
+    __slots__ = ('routes', 'default')
+
+    def __init__(self, routes: dict, default=answer_stale_callback):
+        super().__init__(self.dispatch)
+        self.routes = routes
+        self.default = default
+
+    def resolve(self, data):
+        if not isinstance(data, str):
+            return self.default
+        namespace, action, _ = decode_callback(data)
+        return self.routes.get((namespace, action)) or self.routes.get(namespace) or self.default
+
+    def check_update(self, update: object):
+        if isinstance(update, Update) and update.callback_query:
+            return self.resolve(update.callback_query.data)
+        return None
+
+    async def handle_update(self, update, application, check_result, context):
+        self.collect_additional_context(context, update, application, check_result)
+        return await check_result(update, context)
+
+    async def dispatch(self, update: Update, context):
+        return await self.resolve(update.callback_query.data)(update, context)
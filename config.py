@@ -4,3 +4,101 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+
+# Conexión con MongoDB (el cliente se crea en database.init, no al importar)
+MONGO_USER = os.getenv('MONGO_USER')
+MONGO_PASSWORD = os.getenv('MONGO_PASSWORD')
+MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')
+MONGO_PORT = os.getenv('MONGO_PORT', '27017')
+MONGO_DB = os.getenv('MONGO_DB', 'tele_db')
+
+# Pool de conexiones y timeouts configurables (milisegundos)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '20'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000'))
+
+# Crear al arrancar los índices declarados en indexes.py que falten
+MONGO_ENSURE_INDEXES = os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() in ('1', 'true', 'yes')
+
+# Cola de escritura diferida para la colección 'respuestas'
+RESPUESTAS_BATCH_SIZE = int(os.getenv('RESPUESTAS_BATCH_SIZE', '100'))
+RESPUESTAS_FLUSH_INTERVAL = float(os.getenv('RESPUESTAS_FLUSH_INTERVAL', '1.0'))
+RESPUESTAS_SPILL_PATH = os.getenv('RESPUESTAS_SPILL_PATH', 'respuestas_pendientes.jsonl')
+
+# Recarga periódica del banco de preguntas en segundos (0 = solo al arrancar)
+QUESTION_BANK_REFRESH_INTERVAL = float(os.getenv('QUESTION_BANK_REFRESH_INTERVAL', '0'))
+
+# Textos de consentimiento: comprobación periódica de cambios en segundos (0 = desactivada)
+CONSENT_REFRESH_INTERVAL = float(os.getenv('CONSENT_REFRESH_INTERVAL', '300'))
+
+# IDs de Telegram autorizados para los comandos de administración
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+
+# Ingesta de audios en segundo plano
+AUDIO_DIR = os.getenv('AUDIO_DIR', 'audios')
+AUDIO_JOBS_DIR = os.getenv('AUDIO_JOBS_DIR', 'audio_jobs')
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', '4'))
+AUDIO_MAX_ATTEMPTS = int(os.getenv('AUDIO_MAX_ATTEMPTS', '5'))
+AUDIO_SHARD_LEVELS = int(os.getenv('AUDIO_SHARD_LEVELS', '2'))
+AUDIO_CONTENT_HASHING = os.getenv('AUDIO_CONTENT_HASHING', 'false').lower() in ('1', 'true', 'yes')
+
+# Modo de ejecución: 'polling' (por defecto) o 'webhook'
+RUN_MODE = os.getenv('RUN_MODE', 'polling').lower()
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+
+# Actualizaciones procesadas en paralelo (las de un mismo usuario siempre en orden)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))
+
+# Intervalo en segundos entre escrituras agrupadas de la persistencia de conversaciones
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '10'))
+
+# Expulsión de sesiones inactivas de la memoria
+SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+SESSION_CHECKPOINT_ON_EVICT = os.getenv('SESSION_CHECKPOINT_ON_EVICT', 'true').lower() in ('1', 'true', 'yes')
+SESSION_EVICTION_HINT = os.getenv('SESSION_EVICTION_HINT', 'true').lower() in ('1', 'true', 'yes')
+
+# Límites de envío a la API de Telegram
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SECOND', '30'))
+RATE_LIMIT_CHAT_PER_SECOND = float(os.getenv('RATE_LIMIT_CHAT_PER_SECOND', '1'))
+RATE_LIMIT_CHAT_BURST = float(os.getenv('RATE_LIMIT_CHAT_BURST', '3'))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv('RATE_LIMIT_GROUP_PER_MINUTE', '20'))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))
+
+# Endpoint de métricas en formato Prometheus (puerto 0 lo desactiva)
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Logging: nivel, formato ('text' o 'json'), fichero de errores y umbral en
+# segundos a partir del cual una actualización se registra como lenta
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_ERROR_FILE = os.getenv('LOG_ERROR_FILE', 'errors.log')
+LOG_SLOW_UPDATE = float(os.getenv('LOG_SLOW_UPDATE', '2'))
+
+
+def validate_config(require_telegram: bool = True):
+    """
+    Comprueba una sola vez, al arrancar, que la configuración es utilizable.
+    Lanza ValueError con todos los problemas encontrados.
+    """
+    problems = []
+    if require_telegram and not TELEGRAM_TOKEN:
+        problems.append("falta TELEGRAM_TOKEN")
+    if not MONGO_USER or not MONGO_PASSWORD:
+        problems.append("faltan MONGO_USER o MONGO_PASSWORD")
+    if RUN_MODE not in ('polling', 'webhook'):
+        problems.append(f"RUN_MODE debe ser 'polling' o 'webhook', no '{RUN_MODE}'")
+    if require_telegram and RUN_MODE == 'webhook' and not WEBHOOK_URL:
+        problems.append("RUN_MODE=webhook necesita WEBHOOK_URL")
+    if LOG_FORMAT not in ('text', 'json'):
+        problems.append(f"LOG_FORMAT debe ser 'text' o 'json', no '{LOG_FORMAT}'")
+    if MONGO_MAX_POOL_SIZE < 1 or AUDIO_WORKERS < 1 or MAX_CONCURRENT_UPDATES < 1:
+        problems.append("MONGO_MAX_POOL_SIZE, AUDIO_WORKERS y MAX_CONCURRENT_UPDATES deben ser al menos 1")
+    if problems:
+        raise ValueError("Configuración no válida: " + "; ".join(problems))
@@ -0,0 +1,102 @@
+# consent_cache.py
+
+import asyncio
+import hashlib
+import logging
+import time
+
+import repository
+from config import CONSENT_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre dos recargas provocadas por versiones que no están en
+# la caché: mientras tanto, un fallo se responde desde memoria
+MISS_RELOAD_INTERVAL = 60
+
+
+class ConsentTextCache:
+    """
+    Caché en memoria de los textos de consentimiento, indexada por versión.
+
+    Se rellena al arrancar y sirve cada `/start` sin consultar MongoDB. Para
+    detectar cambios se comprueba periódicamente un sello (hash del contenido
+    de la colección, que es muy pequeña) y se puede invalidar a mano con el
+    comando de administración `/recargar_consentimientos`.
+
+    Una versión que no está en la caché provoca como mucho una recarga cada
+    `MISS_RELOAD_INTERVAL` segundos; los `/start` que llegan a la vez esperan
+    a esa recarga en lugar de lanzar la suya.
+    """
+
+    def __init__(self):
+        self._texts = {}
+        self._stamp = None
+        self._refresh_task = None
+        self._miss_lock = asyncio.Lock()
+        self._loaded_at = None
+
+    async def load(self):
+        # Antes de consultar: si MongoDB falla, tampoco se reintenta en cada fallo
+        self._loaded_at = time.monotonic()
+        documents = await repository.find_textos_consentimientos()
+        texts = {document['version']: document['texto_consentimiento'] for document in documents}
+        stamp = self._compute_stamp(texts)
+        if stamp != self._stamp:
+            self._texts = texts
+            self._stamp = stamp
+            logger.info("Textos de consentimiento cargados: %s", sorted(texts))
+
+    @staticmethod
+    def _compute_stamp(texts: dict) -> str:
+        digest = hashlib.sha1()
+        for version in sorted(texts):
+            digest.update(version.encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(texts[version].encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    async def get(self, version: str):
+        """Devuelve el texto de la versión indicada o None si no existe."""
+        texto = self._texts.get(version)
+        if texto is None:
+            async with self._miss_lock:
+                # Versión nueva o caché vacía: recargar antes de rendirse, salvo
+                # que otro /start acabe de hacerlo
+                texto = self._texts.get(version)
+                if texto is None and (self._loaded_at is None
+                                      or time.monotonic() - self._loaded_at >= MISS_RELOAD_INTERVAL):
+                    await self.load()
+                    texto = self._texts.get(version)
+        return texto
+
+    async def invalidate(self):
+        """Descarta la caché y la vuelve a cargar desde MongoDB."""
+        self._stamp = None
+        await self.load()
+
+    def start_polling(self, interval: float = CONSENT_REFRESH_INTERVAL):
+        """Comprueba el sello periódicamente. Un intervalo de 0 lo desactiva."""
+        if interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._poll(interval), name='consent-cache-refresh')
+
+    async def stop_polling(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _poll(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("Error al comprobar los textos de consentimiento: %s", e)
+
+
+consent_cache = ConsentTextCache()
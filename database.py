@@ -0,0 +1,82 @@
+# database.py
+
+import logging
+import threading
+from urllib.parse import quote_plus
+
+from config import (
+    MONGO_USER,
+    MONGO_PASSWORD,
+    MONGO_HOST,
+    MONGO_PORT,
+    MONGO_DB,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS
+)
+
+logger = logging.getLogger(__name__)
+
+# Nombres de las colecciones
+PARTICIPANTES = 'participante_individual'
+TAREAS = 'tareas'
+RESPUESTAS = 'respuestas'
+PARTICIPANTES_PAREJA = 'participantes_pareja'
+CONSENTIMIENTOS = 'consentimientos'
+PREGUNTAS_SELECCION_MULTIPLE = 'preguntas_seleccion_multiple'
+PREGUNTAS_ABIERTAS = 'preguntas_abiertas'
+TEXTOS_CONSENTIMIENTOS = 'textos_consentimientos'
+
+# Persistencia de las conversaciones del bot
+DATOS_USUARIO = 'datos_usuario'
+ESTADOS_CONVERSACION = 'estados_conversacion'
+
+# Importar este módulo no conecta con MongoDB ni importa pymongo: el cliente
+# se crea en `init`, que el bot llama desde `bootstrap()` antes de construir la
+# Application. Si algo pide una colección antes, se inicializa en ese momento.
+_client = None
+_db = None
+_lock = threading.Lock()
+
+
+def init(db=None):
+    """
+    Crea el cliente de MongoDB (una sola vez) y devuelve la base de datos.
+
+    `db` permite usar otra base de datos ya construida, p. ej. las colecciones
+    en memoria de offline_bot.py.
+    """
+    global _client, _db
+    with _lock:
+        if db is not None:
+            _db = db
+        elif _db is None:
+            from pymongo import MongoClient
+
+            _client = MongoClient(
+                f'mongodb://{quote_plus(MONGO_USER)}:{quote_plus(MONGO_PASSWORD)}@{MONGO_HOST}:{MONGO_PORT}/',
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            )
+            _db = _client[MONGO_DB]
+            logger.info("Cliente de MongoDB creado para %s:%s/%s", MONGO_HOST, MONGO_PORT, MONGO_DB)
+        return _db
+
+
+def collection(name: str):
+    db = _db
+    if db is None:
+        db = init()
+    return db[name]
+
+
+def close():
+    global _client, _db
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _db = None
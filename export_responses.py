@@ -0,0 +1,509 @@
+# export_responses.py
+#
+# Exporta la colección 'respuestas' unida con los datos de registro de quien
+# respondió: el documento de 'participante_individual' (por usuario_id) en las
+# respuestas individuales o el de 'participantes_pareja' (por pareja_id) en las
+# de pareja. Cada respuesta es una fila con las columnas de la respuesta, las
+# de registro y las de hasta dos participantes (participante_1_*, participante_2_*).
+#
+# La memoria usada no depende del tamaño de la colección: las respuestas se
+# leen con un cursor en lotes de --batch-size, cada lote se une y se escribe
+# antes de leer el siguiente, y los registros se guardan en una caché LRU
+# acotada (--join cache, por defecto) o los une MongoDB con $lookup
+# (--join lookup). El correo y el nombre solo se exportan con --with-personal-data.
+#
+# Uso:
+#   python export_responses.py respuestas.csv [--format csv|jsonl|parquet]
+#                              [--join cache|lookup] [--batch-size 2000]
+#                              [--cache-size 10000] [--since 2024-01-01]
+#                              [--until 2024-07-01] [--with-personal-data]
+#
+# El formato Parquet necesita pyarrow (pip install pyarrow).
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import database
+from config import validate_config
+from registration_form import PARTICIPANT_FIELDS
+
+logger = logging.getLogger('export_responses')
+
+RESPONSE_FIELDS = ('respuesta_id', 'pregunta_id', 'usuario_id', 'pareja_id', 'respuesta', 'fecha_respuesta')
+REGISTRATION_FIELDS = ('tipo_tarea', 'fecha_registro')
+PERSONAL_FIELDS = ('email', 'nombre')
+MAX_PARTICIPANTS = 2
+
+# Orden de lectura: el del índice fecha_respuesta_1__id_1 de indexes.py
+SORT = [('fecha_respuesta', 1), ('_id', 1)]
+# Orden de inserción (índice fecha_insercion_1__id_1), el de --incremental
+INSERTION_SORT = [('fecha_insercion', 1), ('_id', 1)]
+
+
+def participant_fields(with_personal_data: bool = False) -> list:
+    return [field for field in PARTICIPANT_FIELDS if with_personal_data or field not in PERSONAL_FIELDS]
+
+
+def columns(fields: list) -> list:
+    result = list(RESPONSE_FIELDS) + list(REGISTRATION_FIELDS)
+    for participant_number in range(1, MAX_PARTICIPANTS + 1):
+        result += [f'participante_{participant_number}_{field}' for field in fields]
+    return result
+
+
+def to_row(respuesta: dict, registro: dict, fields: list) -> dict:
+    """Fila plana de una respuesta y su registro (None si no se encontró)."""
+    row = {field: respuesta.get(field) for field in RESPONSE_FIELDS}
+    is_pair = bool(respuesta.get('pareja_id'))
+    row['tipo_tarea'] = 'grupal' if is_pair else 'individual'
+    registro = registro or {}
+    row['fecha_registro'] = registro.get('fecha_registro')
+    if is_pair:
+        participants = [registro.get(f'participante_{number}') or {} for number in range(1, MAX_PARTICIPANTS + 1)]
+    else:
+        participants = [registro]
+    for number, participant in enumerate(participants, start=1):
+        for field in fields:
+            row[f'participante_{number}_{field}'] = participant.get(field)
+    return row
+
+
+def registration_key(respuesta: dict) -> tuple:
+    if respuesta.get('pareja_id'):
+        return ('pareja', respuesta['pareja_id'])
+    return ('individual', respuesta.get('usuario_id'))
+
+
+def batches(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ============================================================================
+# UNIÓN CON LOS REGISTROS
+# ============================================================================
+
+class RegistrationCache:
+    """
+    Caché LRU acotada de registros por usuario_id o pareja_id.
+
+    Las respuestas de un mismo participante suelen estar cerca en el tiempo,
+    así que casi todas las búsquedas aciertan. Los fallos de un lote se piden
+    en una sola consulta `$in` por colección; los registros que no existen
+    también se guardan (como None) para no volver a pedirlos.
+    """
+
+    def __init__(self, db, max_size: int):
+        self.db = db
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, respuestas: list) -> dict:
+        """Registros de las respuestas del lote, por registration_key."""
+        found = {}
+        missing = {'individual': set(), 'pareja': set()}
+        for respuesta in respuestas:
+            key = registration_key(respuesta)
+            if key in found or key[1] in missing[key[0]]:
+                continue
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[key] = self._entries[key]
+                self.hits += 1
+            else:
+                missing[key[0]].add(key[1])
+                self.misses += 1
+
+        fetched = {}
+        fetched.update(self._fetch('individual', database.PARTICIPANTES, 'usuario_id', missing['individual']))
+        fetched.update(self._fetch('pareja', database.PARTICIPANTES_PAREJA, 'pareja_id', missing['pareja']))
+        for key, registro in fetched.items():
+            self._entries[key] = registro
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        found.update(fetched)
+        return found
+
+    def _fetch(self, kind: str, collection: str, field: str, ids: set) -> dict:
+        if not ids:
+            return {}
+        result = {(kind, id): None for id in ids}
+        # Si alguien se registró más de una vez, vale el último registro
+        for document in self.db[collection].find({field: {'$in': list(ids)}}).sort('fecha_registro', 1):
+            result[(kind, document[field])] = document
+        return result
+
+
+def iter_cache_join(db, query: dict, batch_size: int, cache_size: int, sort: list = SORT):
+    cache = RegistrationCache(db, cache_size)
+    cursor = db[database.RESPUESTAS].find(query).sort(sort).batch_size(batch_size)
+    for batch in batches(cursor, batch_size):
+        registros = cache.lookup(batch)
+        yield [(respuesta, registros[registration_key(respuesta)]) for respuesta in batch]
+    logger.info("Caché de registros: %s aciertos, %s fallos", cache.hits, cache.misses)
+
+
+def iter_lookup_join(db, query: dict, batch_size: int, sort: list = SORT):
+    def latest(collection: str, field: str, alias: str) -> dict:
+        return {'$lookup': {
+            'from': collection,
+            'localField': field,
+            'foreignField': field,
+            'pipeline': [{'$sort': {'fecha_registro': -1}}, {'$limit': 1}],
+            'as': alias,
+        }}
+
+    pipeline = [
+        {'$match': query},
+        {'$sort': dict(sort)},
+        latest(database.PARTICIPANTES, 'usuario_id', '_individual'),
+        latest(database.PARTICIPANTES_PAREJA, 'pareja_id', '_pareja'),
+    ]
+    cursor = db[database.RESPUESTAS].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+    for batch in batches(cursor, batch_size):
+        rows = []
+        for document in batch:
+            individual = document.pop('_individual')
+            pareja = document.pop('_pareja')
+            matches = pareja if document.get('pareja_id') else individual
+            rows.append((document, matches[0] if matches else None))
+        yield rows
+
+
+# ============================================================================
+# FORMATOS DE SALIDA
+# ============================================================================
+
+def as_text(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class _TextWriter:
+    """
+    Base de los formatos de texto. Sin `position` crea el fichero; con
+    `position` (el desplazamiento guardado en el último checkpoint) lo recorta
+    ahí, descartando las filas escritas después, y sigue añadiendo al final.
+    """
+
+    def __init__(self, path: str, columns: list, position: int = None):
+        self.columns = columns
+        if position is None:
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+        else:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < position:
+                raise SystemExit(f"{path} tiene {size} bytes y el checkpoint espera al menos {position}; "
+                                 "borra el checkpoint para exportar de nuevo desde el principio")
+            with open(path, 'r+b') as f:
+                f.truncate(position)
+            self._file = open(path, 'a', encoding='utf-8', newline='')
+
+    def commit(self) -> int:
+        """Lleva al disco lo escrito y devuelve la posición para el checkpoint."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter(_TextWriter):
+    def __init__(self, path: str, columns: list, position: int = None):
+        super().__init__(path, columns, position)
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        if position is None:
+            self._writer.writeheader()
+
+    def write(self, rows: list):
+        self._writer.writerows({key: as_text(value) for key, value in row.items()} for row in rows)
+
+
+class JsonlWriter(_TextWriter):
+    def write(self, rows: list):
+        self._file.writelines(
+            json.dumps({column: as_text(row.get(column)) for column in self.columns}, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("El formato parquet necesita pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class ParquetWriter:
+    """Un grupo de filas por lote; todas las columnas son texto (nulo si falta)."""
+
+    def __init__(self, path: str, columns: list, position: int = None):
+        self._pyarrow = _import_pyarrow()
+        self.columns = columns
+        self._schema = self._pyarrow.schema([(column, self._pyarrow.string()) for column in columns])
+        self._writer = self._pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def _table(self, rows: list):
+        data = {column: [as_text(row.get(column)) for row in rows] for column in self.columns}
+        return self._pyarrow.Table.from_pydict(data, schema=self._schema)
+
+    def write(self, rows: list):
+        self._writer.write_table(self._table(rows))
+
+    def close(self):
+        self._writer.close()
+
+
+class ParquetPartsWriter(ParquetWriter):
+    """
+    Parquet para las exportaciones incrementales: un fichero no se puede
+    ampliar, así que `path` es un directorio con un fichero part-NNNNN.parquet
+    por checkpoint. Cada parte se escribe como .tmp y se renombra al
+    confirmarla; al reanudar se borran las partes posteriores al checkpoint.
+    """
+
+    def __init__(self, path: str, columns: list, position: int = None):
+        self._pyarrow = _import_pyarrow()
+        self.columns = columns
+        self._schema = self._pyarrow.schema([(column, self._pyarrow.string()) for column in columns])
+        self.path = path
+        self._parts = position or 0
+        self._writer = None
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            part = name.split('.')[0]
+            if name.endswith('.tmp') or (part.startswith('part-') and int(part[5:]) >= self._parts):
+                os.remove(os.path.join(path, name))
+
+    def _part_path(self) -> str:
+        return os.path.join(self.path, f'part-{self._parts:05d}.parquet')
+
+    def write(self, rows: list):
+        if self._writer is None:
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._part_path() + '.tmp', self._schema)
+        self._writer.write_table(self._table(rows))
+
+    def commit(self) -> int:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._part_path() + '.tmp', self._part_path())
+            self._parts += 1
+        return self._parts
+
+    def close(self):
+        # Una parte sin confirmar se descarta al reanudar
+        if self._writer is not None:
+            self._writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+INCREMENTAL_WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'parquet': ParquetPartsWriter}
+
+
+# ============================================================================
+# EXPORTACIÓN INCREMENTAL
+# ============================================================================
+
+class Checkpoint:
+    """
+    Marca de agua de una exportación incremental, en un fichero JSON propio de
+    cada destino: la última respuesta exportada (fecha_insercion y _id, el
+    orden de lectura), cuántas filas lleva el destino y la posición del writer
+    en ese momento.
+
+    La marca sigue el orden de inserción y no fecha_respuesta: una respuesta
+    que se guarda tarde (audio pendiente de descargar, reenvío del
+    desbordamiento de la cola) lleva una fecha_insercion posterior a la marca
+    y entra en la siguiente exportación. Las respuestas anteriores a
+    fecha_insercion no tienen el campo y solo se exportan en la primera.
+
+    Se guarda cada `every` lotes, después de llevar al disco las filas, y se
+    reemplaza de forma atómica. Si la exportación se interrumpe, la siguiente
+    ejecución recorta el destino a la posición guardada y sigue desde la marca,
+    así que no se repite ni se pierde ninguna fila.
+    """
+
+    def __init__(self, path: str, settings: dict, every: int = 10):
+        self.path = path
+        self.settings = settings
+        self.every = every
+        self.state = None
+        self._pending = 0
+
+    def load(self):
+        """Lee el checkpoint (None si es la primera exportación de este destino)."""
+        from bson import json_util
+
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            self.state = json_util.loads(f.read())
+        if self.state['settings'] != self.settings:
+            raise SystemExit(f"{self.path} se creó con otras opciones de exportación ({self.state['settings']}); "
+                             "usa un destino nuevo o borra el checkpoint")
+        return self.state
+
+    @property
+    def position(self):
+        return self.state['position'] if self.state else None
+
+    def query(self) -> dict:
+        """Respuestas posteriores a la marca de agua, en el orden de lectura."""
+        if not self.state:
+            return {}
+        fecha, last_id = self.state['fecha_insercion'], self.state['_id']
+        # Sin fecha, la marca está entre las respuestas anteriores al campo,
+        # que se ordenan antes que cualquier fecha
+        after = {'$type': 'date'} if fecha is None else {'$gt': fecha}
+        return {'$or': [
+            {'fecha_insercion': after},
+            {'fecha_insercion': fecha, '_id': {'$gt': last_id}},
+        ]}
+
+    def advance(self, last: dict, rows: int, writer):
+        """Avanza la marca hasta `last`, la última respuesta de un lote ya escrito."""
+        if self.state is None:
+            self.state = {'settings': self.settings, 'rows': 0, 'position': None}
+        self.state['fecha_insercion'] = last.get('fecha_insercion')
+        self.state['_id'] = last['_id']
+        self.state['rows'] += rows
+        self._pending += 1
+        if self._pending >= self.every:
+            self.save(writer)
+
+    def save(self, writer):
+        from bson import json_util
+
+        if self.state is None:
+            return
+        self.state['position'] = writer.commit()
+        self.state['updated'] = datetime.utcnow()
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(json_util.dumps(self.state, indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self._pending = 0
+
+
+# ============================================================================
+# EXPORTACIÓN
+# ============================================================================
+
+def date_query(since: datetime = None, until: datetime = None) -> dict:
+    if not since and not until:
+        return {}
+    condition = {}
+    if since:
+        condition['$gte'] = since
+    if until:
+        condition['$lt'] = until
+    return {'fecha_respuesta': condition}
+
+
+def combine(*queries) -> dict:
+    queries = [query for query in queries if query]
+    if len(queries) > 1:
+        return {'$and': queries}
+    return queries[0] if queries else {}
+
+
+def export(db, writer, query: dict, fields: list, join: str = 'cache', batch_size: int = 2000,
+           cache_size: int = 10000, checkpoint: Checkpoint = None) -> int:
+    """Escribe en `writer` las respuestas de `query` unidas con su registro. Devuelve cuántas."""
+    sort = INSERTION_SORT if checkpoint else SORT
+    if join == 'lookup':
+        joined_batches = iter_lookup_join(db, query, batch_size, sort)
+    else:
+        joined_batches = iter_cache_join(db, query, batch_size, cache_size, sort)
+
+    exported = 0
+    for joined in joined_batches:
+        writer.write([to_row(respuesta, registro, fields) for respuesta, registro in joined])
+        exported += len(joined)
+        if checkpoint:
+            checkpoint.advance(joined[-1][0], len(joined), writer)
+        logger.info("%s respuestas exportadas", exported)
+    if checkpoint:
+        checkpoint.save(writer)
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta las respuestas unidas con los datos de los participantes.")
+    parser.add_argument('output', help="Fichero de salida (directorio con --incremental y formato parquet)")
+    parser.add_argument('--format', choices=sorted(WRITERS), help="Por defecto, según la extensión del fichero")
+    parser.add_argument('--join', choices=('cache', 'lookup'), default='cache',
+                        help="Unir con una caché LRU en el proceso o con $lookup en MongoDB")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Respuestas por lote")
+    parser.add_argument('--cache-size', type=int, default=10000, help="Registros en la caché LRU")
+    parser.add_argument('--since', type=datetime.fromisoformat, help="Solo respuestas desde esta fecha (incluida)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="Solo respuestas anteriores a esta fecha")
+    parser.add_argument('--with-personal-data', action='store_true', help="Incluir correo electrónico y nombre")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Añadir solo las respuestas posteriores a la última exportación a este destino")
+    parser.add_argument('--checkpoint', help="Fichero del checkpoint (por defecto <output>.checkpoint.json)")
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="Lotes entre checkpoints")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    validate_config(require_telegram=False)
+
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if output_format not in WRITERS:
+        parser.error(f"formato desconocido '{output_format}'; usa --format {'/'.join(sorted(WRITERS))}")
+
+    fields = participant_fields(args.with_personal_data)
+    query = date_query(args.since, args.until)
+    checkpoint = None
+    if args.incremental:
+        checkpoint = Checkpoint(
+            args.checkpoint or args.output.rstrip(os.sep) + '.checkpoint.json',
+            {
+                'format': output_format,
+                'columns': columns(fields),
+                'since': args.since.isoformat() if args.since else None,
+                'until': args.until.isoformat() if args.until else None,
+                'join': args.join,
+            },
+            args.checkpoint_every,
+        )
+        state = checkpoint.load()
+        if state:
+            logger.info("Reanudando tras %s filas (última inserción %s)", state['rows'], state['fecha_insercion'])
+        query = combine(query, checkpoint.query())
+        writer = INCREMENTAL_WRITERS[output_format](args.output, columns(fields), checkpoint.position)
+    else:
+        writer = WRITERS[output_format](args.output, columns(fields))
+
+    try:
+        exported = export(database.init(), writer, query, fields, args.join, args.batch_size, args.cache_size,
+                          checkpoint)
+    finally:
+        writer.close()
+        database.close()
+    logger.info("Exportación terminada: %s respuestas en %s", exported, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# handlers/admin.py
+
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import ADMIN_USER_IDS
+from consent_cache import consent_cache
+from session_manager import session_manager
+from rate_limiter import rate_limiter, PRIORITY_INTERACTIVE, PRIORITY_BULK
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def handle_reload_consents(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_USER_IDS:
+        logger.warning("Usuario %s sin permisos intentó recargar los consentimientos", user_id)
+        return
+
+    try:
+        await consent_cache.invalidate()
+        await update.message.reply_text("\U00002705 Textos de consentimiento recargados.")
+    except Exception as e:
+        logger.error("Error en handle_reload_consents: %s", e)
+        await update.message.reply_text("\U0000274C No se pudieron recargar los textos de consentimiento.")
+
+async def handle_session_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_USER_IDS:
+        logger.warning("Usuario %s sin permisos intentó consultar las sesiones", user_id)
+        return
+
+    stats = session_manager.stats()
+    await update.message.reply_text(
+        f"\U0001F4CA Sesiones en memoria: {stats['sesiones']}\n"
+        f"Memoria aproximada: {stats['bytes'] / 1024:.1f} KiB "
+        f"(sesiones: {stats['bytes_sesiones'] / 1024:.1f} KiB, "
+        f"copias de la persistencia: {stats['bytes_persistencia'] / 1024:.1f} KiB)\n"
+        f"Sesiones expulsadas por inactividad: {stats['expulsadas']}"
+    )
+
+async def handle_rate_limit_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_USER_IDS:
+        logger.warning("Usuario %s sin permisos intentó consultar la cola de envíos", user_id)
+        return
+
+    stats = rate_limiter.stats()
+    by_priority = stats['en_cola_por_prioridad']
+    await update.message.reply_text(
+        f"\U0001F4E8 Peticiones en cola: {stats['en_cola']} "
+        f"(interactivas: {by_priority.get(PRIORITY_INTERACTIVE, 0)}, en segundo plano: {by_priority.get(PRIORITY_BULK, 0)})\n"
+        f"Peticiones enviadas: {stats['enviadas']}\n"
+        f"Espera media: {stats['espera_media'] * 1000:.0f} ms (máxima: {stats['espera_maxima'] * 1000:.0f} ms)\n"
+        f"Reintentos por RetryAfter: {stats['reintentos']}\n"
+        f"Pausa restante: {stats['pausa_restante']:.1f} s"
+    )
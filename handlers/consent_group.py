@@ -1,9 +1,13 @@
 # consent_group.py
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler
-from forms import consentimientos_collection, textos_consentimientos_collection, CONSENTIMIENTO_GRUPAL
+from forms import CONSENTIMIENTO_GRUPAL
 from datetime import datetime
+import repository
+from callback_router import decode_callback
+import keyboards
+from consent_cache import consent_cache
 from handlers.group import start_group_registration
 import logging
 
@@ -11,17 +15,13 @@ logger = logging.getLogger(__name__)
 
 async def show_consent_group(context: ContextTypes.DEFAULT_TYPE, user_id: int):
     try:
-        consentimiento_text = textos_consentimientos_collection.find_one({"version": "1.0_grupal"})
+        consentimiento_text = await consent_cache.get("1.0_grupal")
         if consentimiento_text:
-            # Crear los botones en línea para "Aceptar" y "Rechazar"
-            keyboard = [
-                [InlineKeyboardButton("\U0001F91D Aceptar", callback_data='aceptar_consentimiento_grupal')],
-                [InlineKeyboardButton("\U0001F6AB Rechazar", callback_data='rechazar_consentimiento_grupal')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            # Botones en línea compartidos para "Aceptar" y "Rechazar"
+            reply_markup = keyboards.CONSENTIMIENTO
             await context.bot.send_message(
                 chat_id=user_id,
-                text=f"\U0001F4DD {consentimiento_text['texto_consentimiento']}\n\nPor favor, seleccionen una opción para continuar:",
+                text=f"\U0001F4DD {consentimiento_text}\n\nPor favor, seleccionen una opción para continuar:",
                 reply_markup=reply_markup
             )
             return CONSENTIMIENTO_GRUPAL
@@ -29,7 +29,7 @@ async def show_consent_group(context: ContextTypes.DEFAULT_TYPE, user_id: int):
             await context.bot.send_message(chat_id=user_id, text="No se encontró el texto del consentimiento grupal para la versión 1.0_grupal.")
             return ConversationHandler.END
     except Exception as e:
-        logger.error(f"Error en show_consent_group: {e}")
+        logger.error("Error en show_consent_group: %s", e)
         await context.bot.send_message(chat_id=user_id, text="Ocurrió un error al mostrar el consentimiento grupal.")
         return ConversationHandler.END
 
@@ -38,13 +38,13 @@ async def handle_consent_group(update: Update, context: ContextTypes.DEFAULT_TYP
         query = update.callback_query
         await query.answer()
         user_id = query.from_user.id
-        decision = query.data
+        _, decision, _ = decode_callback(query.data)
 
-        if decision == 'aceptar_consentimiento_grupal':
+        if decision == 'aceptar':
             estado = 'firmado'
             await query.edit_message_text("\U00002705 Han aceptado el consentimiento. ¡Gracias por vuestra confianza! A continuación, comenzaremos a recolectar los datos.")
             # Registrar el consentimiento firmado en la base de datos
-            consentimientos_collection.insert_one({
+            await repository.save_consentimiento({
                 'usuario_id': str(user_id),
                 'fecha_consentimiento': datetime.utcnow(),
                 'estado': estado,
@@ -52,11 +52,11 @@ async def handle_consent_group(update: Update, context: ContextTypes.DEFAULT_TYP
             })
             return await start_group_registration(update, context)
 
-        elif decision == 'rechazar_consentimiento_grupal':
+        elif decision == 'rechazar':
             estado = 'rechazado'
             await query.edit_message_text("\U0001F6AB Han rechazado el consentimiento. Lamentamos que no puedan continuar, pero respetamos vuestra decisión.")
             # Registrar el consentimiento rechazado en la base de datos
-            consentimientos_collection.insert_one({
+            await repository.save_consentimiento({
                 'usuario_id': str(user_id),
                 'fecha_consentimiento': datetime.utcnow(),
                 'estado': estado,
@@ -69,7 +69,7 @@ async def handle_consent_group(update: Update, context: ContextTypes.DEFAULT_TYP
             return CONSENTIMIENTO_GRUPAL
 
     except Exception as e:
-        logger.error(f"Error en handle_consent_group: {e}")
+        logger.error("Error en handle_consent_group: %s", e)
         await context.bot.send_message(chat_id=user_id, text="Ocurrió un error al manejar el consentimiento grupal.")
         return ConversationHandler.END
 
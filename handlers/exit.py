@@ -18,7 +18,7 @@ async def handle_exit(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     except Exception as e:
-        logger.error(f"Error en handle_exit: {e}")
+        logger.error("Error en handle_exit: %s", e)
         if update.callback_query:
             chat_id = update.callback_query.message.chat.id
             # Mensaje de error con emoticonos en UTF-8
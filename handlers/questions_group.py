@@ -4,13 +4,20 @@ import uuid
 import random
 from datetime import datetime
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
 )
 
-from forms import *
+from forms import PREGUNTAS_GRUPAL, END
+from question_bank import question_bank
+from response_queue import respuestas_queue
+from audio_ingestion import audio_ingestion
+from session import SESSION_KEY, QuestionnaireSession, get_session
+from callback_router import decode_callback
+import keyboards
+from outbox import outbox
 
 logger = logging.getLogger(__name__)
 
@@ -23,34 +30,18 @@ async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error("No se pudo obtener el ID del usuario en start_questions.")
         return ConversationHandler.END
 
-    context.user_data['current_question_index'] = 0
-    context.user_data['waiting_for_decision'] = False
-
-    # Obtener todas las preguntas abiertas de tipo "grupal" o "ambos"
-    open_questions = list(preguntas_abiertas_collection.find({
-        "$or": [{"tipo_tarea": "grupal"}, {"tipo_tarea": "ambos"}]
-    }))
-
-    # Marcar tipo de pregunta
-    for q in open_questions:
-        q['tipo_pregunta'] = 'abierta'
-
-    # Agrupar preguntas abiertas por el identificador de grupo
-    open_questions_groups = {}
-    for question in open_questions:
-        group_key = question['pregunta_id'].split('.')[0]
-        if group_key not in open_questions_groups:
-            open_questions_groups[group_key] = []
-        open_questions_groups[group_key].append(question)
+    # Preguntas abiertas de tipo "grupal" o "ambos", ya agrupadas en el banco
+    await question_bank.ensure_loaded()
+    open_questions_groups = question_bank.open_groups("grupal")
 
     # Primera pregunta obligatoria (G-1.n)
-    mandatory_group = open_questions_groups.pop('G-1', None)
+    mandatory_group = open_questions_groups.get('G-1')
     if not mandatory_group:
         logger.error("No se encontraron preguntas del grupo G-1.")
         return ConversationHandler.END
 
     # Selección de seis grupos aleatorios adicionales excluyendo G-1
-    available_groups = list(open_questions_groups.keys())
+    available_groups = [key for key in open_questions_groups if key != 'G-1']
     if len(available_groups) < 6:
         logger.error("No hay suficientes grupos de preguntas abiertas para seleccionar seis grupos.")
         return ConversationHandler.END
@@ -60,87 +51,106 @@ async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     for group_key in selected_groups_keys:
         selected_open_questions.extend(open_questions_groups[group_key])
 
-    # Marcar tipo de pregunta
-    for question in selected_open_questions:
-        question['tipo_pregunta'] = 'abierta'
-
     # Crear la secuencia final de preguntas, colocando la pregunta obligatoria primero
     questions = []
     questions.extend(mandatory_group)  # Añadir las preguntas del grupo G-1 como primeras
     questions.extend(selected_open_questions)  # Añadir los seis grupos aleatorios
 
-    context.user_data['questions'] = questions
+    # Solo se guardan los IDs; los documentos siguen en el banco compartido
+    context.user_data[SESSION_KEY] = QuestionnaireSession.from_questions(questions)
 
-    logger.info(f"Total de preguntas cargadas: {len(context.user_data['questions'])}")
+    logger.info("Total de preguntas cargadas: %s", len(questions))
 
     return await ask_next_question(update, context)
 
 
+async def recover_missing_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    El estado de la conversación se restauró sin la sesión del cuestionario
+    (el bot se detuvo entre el guardado de los estados y el de user_data).
+    Si se conserva la pareja se empieza un cuestionario nuevo; si no, las
+    respuestas no se podrían asociar a ella y se termina la conversación.
+    """
+    if update.callback_query:
+        await update.callback_query.answer()
+    if context.user_data.get('pareja_id'):
+        logger.warning("Usuario %s en el cuestionario grupal sin sesión guardada; se empieza uno nuevo", update.effective_user.id)
+        outbox.send(update, "No hemos podido recuperar su cuestionario. Empezamos uno nuevo.")
+        return await start_questions(update, context)
+
+    logger.warning("Usuario %s en el cuestionario grupal sin sesión ni pareja guardadas; se termina la conversación", update.effective_user.id)
+    outbox.send(update, "No hemos podido recuperar su cuestionario. Escriban /start para empezar de nuevo.")
+    return ConversationHandler.END
+
 async def handle_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Check if bot is waiting for a decision after an audio was sent
+    session = get_session(context)
+    if session is None:
+        return await recover_missing_session(update, context)
+
     try:
         chat_id = update.effective_chat.id
 
-        # Check if bot is waiting for a decision after an audio was sent
-        if context.user_data.get('waiting_for_decision', False):
-            await context.bot.send_message(chat_id=chat_id, text="\u2753 Por favor, elijan si desean enviar otro audio o continuar antes de grabar un nuevo audio.")
+        if session.waiting_for_decision:
+            outbox.send(update, "\u2753 Por favor, elijan si desean enviar otro audio o continuar antes de grabar un nuevo audio.")
             return PREGUNTAS_GRUPAL
 
         if update.callback_query:
             query = update.callback_query
             user_id = update.effective_user.id
             await query.answer()
-            respuesta = query.data
-
-            if respuesta.startswith("opcion_"):
-                opcion = respuesta.split("_", 1)[1]
+            _, action, arg = decode_callback(query.data)
+            question = session.current_question()
+
+            if action == 'opcion':
+                # arg: "<índice de la opción>:<pregunta_id>"
+                index, _, pregunta_id = arg.partition(':')
+                if question is None or pregunta_id != session.current_question_id:
+                    # Botón de una pregunta anterior
+                    return PREGUNTAS_GRUPAL
+                opcion = question['opciones'][int(index)]
                 respuesta_id = str(uuid.uuid4())
-                respuestas_collection.insert_one({
+                respuestas_queue.enqueue({
                     'respuesta_id': respuesta_id,
-                    'pregunta_id': context.user_data['current_question']['pregunta_id'],
+                    'pregunta_id': session.current_question_id,
                     'usuario_id': str(user_id),
                     'pareja_id': context.user_data.get('pareja_id'),
                     'respuesta': opcion,
                     'fecha_respuesta': datetime.utcnow()
                 })
-                await context.bot.send_message(chat_id=chat_id, text="\u2705 ¡Gracias! Tu respuesta ha sido registrada con éxito.")
+                outbox.send(update, "\u2705 ¡Gracias! Tu respuesta ha sido registrada con éxito.")
             else:
-                await context.bot.send_message(chat_id=chat_id, text="\u2753 Selecciona una opción válida de la lista.")
+                outbox.send(update, "\u2753 Selecciona una opción válida de la lista.")
                 return PREGUNTAS_GRUPAL
 
         elif update.message:
             user_id = update.effective_user.id
 
-            if context.user_data['current_question'].get('tipo_pregunta') == 'abierta':
+            question = session.current_question()
+            if question and question.get('tipo_pregunta') == 'abierta':
                 if update.message.voice:
                     # Set waiting for decision to True
-                    context.user_data['waiting_for_decision'] = True
-
-                    file = await update.message.voice.get_file()
-                    file_path = f"audios/{user_id}_{context.user_data['current_question']['pregunta_id']}_{uuid.uuid4()}.ogg"
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    await file.download_to_drive(file_path)
-                    respuestas_collection.insert_one({
-                        'respuesta_id': str(uuid.uuid4()),
-                        'pregunta_id': context.user_data['current_question']['pregunta_id'],
-                        'usuario_id': str(user_id),
-                        'pareja_id': context.user_data.get('pareja_id'),
-                        'respuesta': file_path,
-                        'fecha_respuesta': datetime.utcnow()
-                    })
-                    await context.bot.send_message(chat_id=chat_id, text="\u2705 Respuesta registrada.")
-                    keyboard = [
-                        [InlineKeyboardButton("Enviar otro audio", callback_data='enviar_otro_audio')],
-                        [InlineKeyboardButton("Continuar", callback_data='continuar')]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await context.bot.send_message(chat_id=chat_id, text="¿Desean enviar otro audio o continuar con la siguiente pregunta?", reply_markup=reply_markup)
+                    session.waiting_for_decision = True
+
+                    # La descarga y el registro de la respuesta se hacen en segundo plano
+                    voice = update.message.voice
+                    await audio_ingestion.submit(
+                        voice.file_id,
+                        voice.file_size,
+                        pregunta_id=session.current_question_id,
+                        usuario_id=str(user_id),
+                        pareja_id=context.user_data.get('pareja_id')
+                    )
+                    outbox.send(update, "\u2705 Respuesta registrada.")
+                    reply_markup = keyboards.AUDIO_DECISION
+                    outbox.send(update, "¿Desean enviar otro audio o continuar con la siguiente pregunta?", reply_markup=reply_markup)
                     return PREGUNTAS_GRUPAL
                 else:
-                    await context.bot.send_message(chat_id=chat_id, text="\u2753 Por favor, envíen una nota de voz como respuesta.")
+                    outbox.send(update, "\u2753 Por favor, envíen una nota de voz como respuesta.")
                     return PREGUNTAS_GRUPAL
 
         # Advance to next question
-        context.user_data['current_question_index'] += 1
+        session.advance()
         return await ask_next_question(update, context)
 
     except Exception as e:
@@ -152,62 +162,58 @@ async def handle_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             chat_id = None
 
         if chat_id:
-            logger.error(f"Error en handle_questions: {e}")
-            await context.bot.send_message(chat_id=chat_id, text="Ocurrió un error al procesar su respuesta. Inténtelo de nuevo.")
+            logger.error("Error en handle_questions: %s", e)
+            outbox.send(update, "Ocurrió un error al procesar su respuesta. Inténtelo de nuevo.")
         else:
-            logger.error(f"Error en handle_questions: {e} - No se pudo determinar el chat_id.")
+            logger.error("Error en handle_questions: %s - No se pudo determinar el chat_id.", e)
 
         return PREGUNTAS_GRUPAL
 
 async def handle_additional_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if get_session(context) is None:
+        return await recover_missing_session(update, context)
+
     query = update.callback_query
     user_id = update.effective_user.id
     await query.answer()
 
     chat_id = query.message.chat.id
 
-    if query.data == 'enviar_otro_audio':
+    _, action, _ = decode_callback(query.data)
+    if action == 'otro':
         # Set waiting for decision to False, allowing the user to send another audio
-        context.user_data['waiting_for_decision'] = False
-        await context.bot.send_message(chat_id=chat_id, text="Por favor, graben otro audio para esta misma pregunta.")
-    elif query.data == 'continuar':
-        # Set waiting for decision to False, allowing to move to the next question
-        context.user_data['waiting_for_decision'] = False
-        context.user_data['current_question_index'] += 1
+        get_session(context).waiting_for_decision = False
+        outbox.send(update, "Por favor, graben otro audio para esta misma pregunta.")
+    elif action == 'continuar':
+        # Pasar a la siguiente pregunta (también deja de esperar la decisión)
+        get_session(context).advance()
         return await ask_next_question(update, context)
 
     return PREGUNTAS_GRUPAL
 
 async def ask_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    index = context.user_data.get('current_question_index', 0)
-    if index < len(context.user_data.get('questions', [])):
-        question = context.user_data['questions'][index]
-        context.user_data['current_question'] = question
+    session = get_session(context)
+    if not session.finished:
+        question = session.current_question()
+        if question is None:
+            # La pregunta ya no está en el banco (recargado): pasar a la siguiente
+            session.advance()
+            return await ask_next_question(update, context)
 
         chat_id = update.effective_chat.id
 
         if question.get('tipo_pregunta') == 'abierta':
             # Mensaje simple indicando que es una pregunta de voz
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="Esta es una pregunta de voz:"
-            )
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="\U0001F5E3 {0}".format(question['pregunta'])
-            )
+            outbox.send(update, "Esta es una pregunta de voz:")
+            outbox.send(update, "\U0001F5E3 {0}".format(question['pregunta']))
             return PREGUNTAS_GRUPAL
 
     else:
         chat_id = update.effective_chat.id
-        keyboard = [
-            [InlineKeyboardButton("\U0001F501 Volver a empezar", callback_data='restart')],
-            [InlineKeyboardButton("\U0001F6AA Salir", callback_data='exit')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="\U0001F44D ¡Gracias por completar el cuestionario!\nSi desean volver a empezar, seleccionen una opción a continuación:",
+        reply_markup = keyboards.FIN_CUESTIONARIO
+        outbox.send(
+            update,
+            "\U0001F44D ¡Gracias por completar el cuestionario!\nSi desean volver a empezar, seleccionen una opción a continuación:",
             reply_markup=reply_markup
         )
         return PREGUNTAS_GRUPAL
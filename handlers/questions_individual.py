@@ -5,7 +5,7 @@ from datetime import datetime
 import random
 from itertools import groupby
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
@@ -14,7 +14,14 @@ from telegram.ext import (
     filters,
 )
 
-from forms import *
+from forms import PREGUNTAS_INDIVIDUAL, TIPO_TAREA, END
+from question_bank import question_bank
+from response_queue import respuestas_queue
+from audio_ingestion import audio_ingestion
+from session import SESSION_KEY, QuestionnaireSession, get_session
+from callback_router import decode_callback
+import keyboards
+from outbox import outbox
 
 logger = logging.getLogger(__name__)
 
@@ -27,40 +34,20 @@ async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error("No se pudo obtener el ID del usuario en start_questions.")
         return ConversationHandler.END
 
-    context.user_data['current_question_index'] = 0
-    context.user_data['waiting_for_decision'] = False
+    # Selección aleatoria en memoria a partir del banco de preguntas
+    await question_bank.ensure_loaded()
+    multiple_choice_questions = question_bank.sample_multiple_choice("individual", 15)
 
-    # Selección aleatoria de preguntas de selección múltiple y abiertas
-    multiple_choice_questions = list(preguntas_seleccion_multiple_collection.aggregate([
-        {"$match": {"$or": [{"tipo_tarea": "individual"}, {"tipo_tarea": "ambos"}]}},
-        {"$sample": {"size": 15}}
-    ]))
-
-    open_questions = list(preguntas_abiertas_collection.find({
-        "$or": [{"tipo_tarea": "individual"}, {"tipo_tarea": "ambos"}]
-    }))
-
-    # Agrupar preguntas abiertas por el identificador de grupo
-    open_questions_groups = {}
-    for question in open_questions:
-        group_key = question['pregunta_id'].split('.')[0]
-        if group_key not in open_questions_groups:
-            open_questions_groups[group_key] = []
-        open_questions_groups[group_key].append(question)
+    # Preguntas abiertas ya agrupadas por el identificador de grupo
+    open_questions_groups = question_bank.open_groups("individual")
 
     # Selección aleatoria de grupos de preguntas abiertas
-    selected_groups_keys = random.sample(open_questions_groups.keys(), min(7, len(open_questions_groups)))
+    selected_groups_keys = random.sample(list(open_questions_groups.keys()), min(7, len(open_questions_groups)))
     selected_open_questions = []
     for group_key in selected_groups_keys:
         group_questions = open_questions_groups[group_key]
         selected_open_questions.extend(group_questions)
 
-    # Marcar tipo de pregunta
-    for question in multiple_choice_questions:
-        question['tipo_pregunta'] = 'seleccion_multiple'
-    for question in selected_open_questions:
-        question['tipo_pregunta'] = 'abierta'
-
     # Intercalar las preguntas de acuerdo a la secuencia requerida para 7 grupos
     questions = []
     mc_index = 0
@@ -120,172 +107,172 @@ async def start_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Grupo 7
     questions.extend(selected_open_questions[open_index:open_index+group_sizes[6]])
 
-    context.user_data['questions'] = questions
+    # Solo se guardan los IDs; los documentos siguen en el banco compartido
+    context.user_data[SESSION_KEY] = QuestionnaireSession.from_questions(questions)
 
-    logger.info(f"Total de preguntas cargadas: {len(context.user_data['questions'])}")
+    logger.info("Total de preguntas cargadas: %s", len(questions))
 
     return await ask_next_question(update, context)
 
+async def recover_missing_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    El estado de la conversación se restauró sin la sesión del cuestionario
+    (el bot se detuvo entre el guardado de los estados y el de user_data):
+    se empieza un cuestionario nuevo.
+    """
+    logger.warning("Usuario %s en el cuestionario individual sin sesión guardada; se empieza uno nuevo", update.effective_user.id)
+    if update.callback_query:
+        await update.callback_query.answer()
+    outbox.send(update, "No hemos podido recuperar tu cuestionario. Empezamos uno nuevo.")
+    return await start_questions(update, context)
+
 async def handle_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = get_session(context)
+    if session is None:
+        return await recover_missing_session(update, context)
+
     try:
         chat_id = update.effective_chat.id
 
-        if context.user_data.get('waiting_for_decision', False):
+        if session.waiting_for_decision:
             return PREGUNTAS_INDIVIDUAL
 
         if update.callback_query:
             query = update.callback_query
             user_id = update.effective_user.id
             await query.answer()
-            respuesta = query.data
-
-            if respuesta.startswith("opcion_"):
-                opcion = respuesta.split("_", 1)[1]
+            _, action, arg = decode_callback(query.data)
+            question = session.current_question()
+
+            if action == 'opcion':
+                # arg: "<índice de la opción>:<pregunta_id>"
+                index, _, pregunta_id = arg.partition(':')
+                if question is None or pregunta_id != session.current_question_id:
+                    # Botón de una pregunta anterior
+                    return PREGUNTAS_INDIVIDUAL
+                opcion = question['opciones'][int(index)]
                 respuesta_id = str(uuid.uuid4())
-                respuestas_collection.insert_one({
+                respuestas_queue.enqueue({
                     'respuesta_id': respuesta_id,
-                    'pregunta_id': context.user_data['current_question']['pregunta_id'],
+                    'pregunta_id': session.current_question_id,
                     'usuario_id': str(user_id),
                     'pareja_id': None,
                     'respuesta': opcion,
                     'fecha_respuesta': datetime.utcnow()
                 })
                 await query.edit_message_reply_markup(reply_markup=None)
-                await context.bot.send_message(chat_id=chat_id, text="\u2705 Respuesta registrada.")
-            elif respuesta == 'enviar_otro_audio':
-                context.user_data['waiting_for_decision'] = False
-                await query.edit_message_reply_markup(reply_markup=None)
-                await context.bot.send_message(chat_id=chat_id, text="Graba otro audio.")
-            elif respuesta == 'continuar':
-                context.user_data['waiting_for_decision'] = False
-                await query.edit_message_reply_markup(reply_markup=None)
-                context.user_data['current_question_index'] += 1
-                return await ask_next_question(update, context)
+                outbox.send(update, "\u2705 Respuesta registrada.")
             else:
-                await context.bot.send_message(chat_id=chat_id, text="Selecciona una opción válida de la lista.")
+                outbox.send(update, "Selecciona una opción válida de la lista.")
                 return PREGUNTAS_INDIVIDUAL
 
         elif update.message:
             user_id = update.effective_user.id
 
-            if context.user_data['current_question'].get('tipo_pregunta') == 'abierta':
+            question = session.current_question()
+            if question and question.get('tipo_pregunta') == 'abierta':
                 if update.message.voice:
                     try:
-                        context.user_data['waiting_for_decision'] = True
-
-                        file = await update.message.voice.get_file()
-                        file_path = f"audios/{user_id}_{context.user_data['current_question']['pregunta_id']}_{uuid.uuid4()}.ogg"
-                        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                        await file.download_to_drive(file_path)
-
-                        # Insertar la respuesta en la colección
-                        respuestas_collection.insert_one({
-                            'respuesta_id': str(uuid.uuid4()),
-                            'pregunta_id': context.user_data['current_question']['pregunta_id'],
-                            'usuario_id': str(user_id),
-                            'pareja_id': None,
-                            'respuesta': file_path,
-                            'fecha_respuesta': datetime.utcnow()
-                        })
+                        session.waiting_for_decision = True
+
+                        # La descarga y el registro de la respuesta se hacen en segundo plano
+                        voice = update.message.voice
+                        await audio_ingestion.submit(
+                            voice.file_id,
+                            voice.file_size,
+                            pregunta_id=session.current_question_id,
+                            usuario_id=str(user_id),
+                            pareja_id=None
+                        )
 
                         # Enviar confirmación
-                        await context.bot.send_message(chat_id=chat_id, text="\u2705 Respuesta guardada")
+                        outbox.send(update, "\u2705 Respuesta guardada")
 
                         # Teclado de opciones para continuar o grabar otro audio
-                        keyboard = [
-                            [InlineKeyboardButton("Enviar otro audio", callback_data='enviar_otro_audio')],
-                            [InlineKeyboardButton("Continuar", callback_data='continuar')]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await context.bot.send_message(chat_id=chat_id, text="¿Deseas enviar otro audio o continuar con la siguiente pregunta?", reply_markup=reply_markup)
+                        reply_markup = keyboards.AUDIO_DECISION
+                        outbox.send(update, "¿Deseas enviar otro audio o continuar con la siguiente pregunta?", reply_markup=reply_markup)
 
                     except Exception as e:
-                        logger.error(f"Error al manejar el archivo de voz: {e}")
-                        await context.bot.send_message(chat_id=chat_id, text="Ocurrió un error al procesar tu nota de voz. Inténtalo de nuevo.")
+                        logger.error("Error al manejar el archivo de voz: %s", e)
+                        outbox.send(update, "Ocurrió un error al procesar tu nota de voz. Inténtalo de nuevo.")
                     
                     return PREGUNTAS_INDIVIDUAL
                 else:
-                    await context.bot.send_message(chat_id=chat_id, text="Por favor, envía una nota de voz como respuesta.")
+                    outbox.send(update, "Por favor, envía una nota de voz como respuesta.")
                     return PREGUNTAS_INDIVIDUAL
 
-        context.user_data['current_question_index'] += 1
+        session.advance()
         return await ask_next_question(update, context)
 
     except Exception as e:
         chat_id = update.callback_query.message.chat.id if update.callback_query else update.message.chat.id if update.message else None
         if chat_id:
-            logger.error(f"Error en handle_questions: {e}")
-            await context.bot.send_message(chat_id=chat_id, text="Ocurrió un error al procesar tu respuesta. Inténtalo de nuevo.")
+            logger.error("Error en handle_questions: %s", e)
+            outbox.send(update, "Ocurrió un error al procesar tu respuesta. Inténtalo de nuevo.")
         else:
-            logger.error(f"Error en handle_questions: {e} - No se pudo determinar el chat_id.")
+            logger.error("Error en handle_questions: %s - No se pudo determinar el chat_id.", e)
 
         return PREGUNTAS_INDIVIDUAL
 
 async def handle_additional_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if get_session(context) is None:
+        return await recover_missing_session(update, context)
+
     query = update.callback_query
     user_id = update.effective_user.id
     await query.answer()
 
     chat_id = query.message.chat.id
 
-    if query.data == 'enviar_otro_audio':
+    _, action, _ = decode_callback(query.data)
+    if action == 'otro':
         # Set waiting for decision to False, allowing the user to send another audio
-        context.user_data['waiting_for_decision'] = False
-        await context.bot.send_message(chat_id=chat_id, text="Por favor, graba otro audio.")
-    elif query.data == 'continuar':
-        # Set waiting for decision to False, allowing to move to the next question
-        context.user_data['waiting_for_decision'] = False
-        context.user_data['current_question_index'] += 1
+        get_session(context).waiting_for_decision = False
+        outbox.send(update, "Por favor, graba otro audio.")
+    elif action == 'continuar':
+        # Pasar a la siguiente pregunta (también deja de esperar la decisión)
+        get_session(context).advance()
         return await ask_next_question(update, context)
 
     return PREGUNTAS_INDIVIDUAL
     
 async def ask_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    index = context.user_data.get('current_question_index', 0)
-    if index < len(context.user_data.get('questions', [])):
-        question = context.user_data['questions'][index]
-        context.user_data['current_question'] = question
+    session = get_session(context)
+    if not session.finished:
+        question = session.current_question()
+        if question is None:
+            # La pregunta ya no está en el banco (recargado): pasar a la siguiente
+            session.advance()
+            return await ask_next_question(update, context)
 
         chat_id = update.effective_chat.id
 
         if question.get('tipo_pregunta') == 'seleccion_multiple':
-            options = question.get('opciones', [])
-            if not options:
-                await context.bot.send_message(chat_id=chat_id, text="No hay opciones disponibles para esta pregunta.")
-                context.user_data['current_question_index'] += 1
+            # Teclado construido una sola vez al cargar el banco de preguntas
+            reply_markup = question_bank.keyboard(session.current_question_id)
+            if reply_markup is None:
+                outbox.send(update, "No hay opciones disponibles para esta pregunta.")
+                session.advance()
                 return await ask_next_question(update, context)
 
-            keyboard = [[InlineKeyboardButton(opcion, callback_data=f"opcion_{opcion}")] for opcion in options]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="\U0001F4AC {0}".format(question['pregunta']),
+            outbox.send(
+                update,
+                "\U0001F4AC {0}".format(question['pregunta']),
                 reply_markup=reply_markup
             )
             return PREGUNTAS_INDIVIDUAL
 
         elif question.get('tipo_pregunta') == 'abierta':
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="Esta es una pregunta de voz:"
-            )
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text="\U0001F5E3 {0}".format(question['pregunta'])
-            )
+            outbox.send(update, "Esta es una pregunta de voz:")
+            outbox.send(update, "\U0001F5E3 {0}".format(question['pregunta']))
             return PREGUNTAS_INDIVIDUAL
 
     else:
         chat_id = update.effective_chat.id
-        keyboard = [
-            [InlineKeyboardButton("\U0001F501 Volver a empezar", callback_data='restart')],
-            [InlineKeyboardButton("\U0001F6AA Salir", callback_data='exit')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="\U0001F44D ¡Gracias por completar el cuestionario!\nSi deseas volver a empezar, selecciona una opción a continuación:",
+        reply_markup = keyboards.FIN_CUESTIONARIO
+        outbox.send(
+            update,
+            "\U0001F44D ¡Gracias por completar el cuestionario!\nSi deseas volver a empezar, selecciona una opción a continuación:",
             reply_markup=reply_markup
         )
         return PREGUNTAS_INDIVIDUAL
@@ -295,5 +282,5 @@ async def handle_restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     chat_id = query.message.chat.id
-    await context.bot.send_message(chat_id=chat_id, text="Empezamos de nuevo desde el principio.")
+    outbox.send(update, "Empezamos de nuevo desde el principio.")
     return TIPO_TAREA
@@ -0,0 +1,132 @@
+# registration.py
+
+from telegram import Update
+from telegram.ext import ContextTypes
+from forms import REGISTRO
+from callback_router import decode_callback
+import keyboards
+from outbox import outbox
+from registration_form import STEPS, FIRST_STEP, FLOWS, PARTICIPANT_FIELDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Claves de user_data con la posición del participante en el formulario
+FLOW_KEY = 'registro_flujo'
+STEP_KEY = 'registro_paso'
+PARTICIPANT_KEY = 'participant_number'
+
+# Acción final de cada flujo (guardar los datos y pasar a las preguntas)
+_completions = {}
+
+
+def on_complete(flow_name: str):
+    """Registra la función que se ejecuta cuando todos los participantes del flujo han terminado."""
+    def decorator(func):
+        _completions[flow_name] = func
+        return func
+    return decorator
+
+
+def storage_key(context: ContextTypes.DEFAULT_TYPE, key: str, participant_number: int = None) -> str:
+    flow = FLOWS[context.user_data[FLOW_KEY]]
+    if flow.participants == 1:
+        return key
+    if participant_number is None:
+        participant_number = context.user_data[PARTICIPANT_KEY]
+    return f"{key}_participante_{participant_number}"
+
+
+def participant_data(context: ContextTypes.DEFAULT_TYPE, participant_number: int = None) -> dict:
+    """Datos de un participante con los nombres de campo del documento de MongoDB."""
+    return {
+        field: context.user_data.get(storage_key(context, field, participant_number))
+        for field in PARTICIPANT_FIELDS
+    }
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE, flow_name: str):
+    context.user_data[FLOW_KEY] = flow_name
+    context.user_data[PARTICIPANT_KEY] = 1
+    return await _ask(update, context, FIRST_STEP)
+
+
+async def _ask(update: Update, context: ContextTypes.DEFAULT_TYPE, step_name: str, query=None):
+    step = STEPS[step_name]
+    context.user_data[STEP_KEY] = step_name
+
+    flow = FLOWS[context.user_data[FLOW_KEY]]
+    text = flow.questions.get(step_name, step.question).format(participante=context.user_data[PARTICIPANT_KEY])
+
+    if query is not None and step.kind == 'text':
+        # Tras pulsar "Otro" se reutiliza el mismo mensaje para pedir el texto
+        await query.edit_message_text(text)
+    else:
+        outbox.send(update, text, reply_markup=keyboards.REGISTRO.get(step_name))
+    return REGISTRO
+
+
+async def _advance(update: Update, context: ContextTypes.DEFAULT_TYPE, next_step: str):
+    if next_step is not None:
+        return await _ask(update, context, next_step)
+
+    flow_name = context.user_data[FLOW_KEY]
+    participant_number = context.user_data[PARTICIPANT_KEY]
+    if participant_number < FLOWS[flow_name].participants:
+        context.user_data[PARTICIPANT_KEY] = participant_number + 1
+        outbox.send(update, f"Gracias. Ahora, vamos a recoger los datos del participante {participant_number + 1}.")
+        return await _ask(update, context, FIRST_STEP)
+
+    context.user_data.pop(STEP_KEY, None)
+    return await _completions[flow_name](update, context)
+
+
+async def handle_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        await query.answer()
+        _, step_name, option_id = decode_callback(query.data)
+        step = STEPS.get(context.user_data.get(STEP_KEY))
+        option = step.options_by_id.get(option_id) if step and step.name == step_name else None
+        if option is None:
+            # Botón de un paso anterior: se ignora y se sigue esperando el actual
+            return REGISTRO
+
+        next_step = option.next or step.next
+        if option.value is None:
+            return await _ask(update, context, next_step, query=query)
+
+        context.user_data[storage_key(context, step.key)] = option.value
+        await query.edit_message_text(step.confirmation.format(value=option.value))
+        return await _advance(update, context, next_step)
+
+    except Exception as e:
+        logger.error("Error en el paso de registro %s: %s", context.user_data.get(STEP_KEY), e)
+        outbox.send(update, "Ocurrió un error al procesar tu selección. Por favor, intenta de nuevo.")
+        return REGISTRO
+
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        step = STEPS.get(context.user_data.get(STEP_KEY))
+        if step is None:
+            return REGISTRO
+        if step.kind == 'choice':
+            outbox.send(update, "\U00002753 Por favor, selecciona una de las opciones.")
+            return REGISTRO
+
+        try:
+            value = step.validator(update.message.text)
+        except ValueError as e:
+            outbox.send(update, str(e))
+            return REGISTRO
+
+        context.user_data[storage_key(context, step.key)] = value
+        if step.confirmation:
+            outbox.send(update, step.confirmation.format(value=value))
+        return await _advance(update, context, step.next)
+
+    except Exception as e:
+        logger.error("Error en el paso de registro %s: %s", context.user_data.get(STEP_KEY), e)
+        outbox.send(update, "Ocurrió un error al registrar tu respuesta. Inténtalo de nuevo.")
+        return REGISTRO
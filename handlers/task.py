@@ -1,7 +1,11 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler
 from datetime import datetime
-from forms import TIPO_TAREA, tareas_collection
+from forms import TIPO_TAREA
+import repository
+from callback_router import decode_callback
+import keyboards
+from outbox import outbox
 from handlers import consent_individual, consent_group
 import logging
 
@@ -16,25 +20,15 @@ async def start_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Para empezar, selecciona el tipo de tarea que quieres realizar:"
         )
         
-        keyboard = [
-            [InlineKeyboardButton("\U0001F9CD Tarea Individual", callback_data='tarea_individual')],
-            [InlineKeyboardButton("\U0001F46A Tarea Grupal", callback_data='tarea_grupal')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Manejo de posibles contextos (mensaje normal o consulta)
-        if update.message:
-            await update.message.reply_text(welcome_message, reply_markup=reply_markup)
-        elif update.callback_query:
-            await update.callback_query.message.reply_text(welcome_message, reply_markup=reply_markup)
-            
+        reply_markup = keyboards.TAREA
+
+        # Sirve tanto para /start como para el botón de reinicio
+        outbox.send(update, welcome_message, reply_markup=reply_markup)
+
         return TIPO_TAREA
     except Exception as e:
-        logger.error(f"Error en start_task: {e}")
-        if update.message:
-            await update.message.reply_text("\U0000274C Ha ocurrido un error al intentar seleccionar la tarea. Por favor, intenta de nuevo.")
-        elif update.callback_query:
-            await update.callback_query.message.reply_text("\U0000274C Ha ocurrido un error al intentar seleccionar la tarea. Por favor, intenta de nuevo.")
+        logger.error("Error en start_task: %s", e)
+        outbox.send(update, "\U0000274C Ha ocurrido un error al intentar seleccionar la tarea. Por favor, intenta de nuevo.")
         return ConversationHandler.END
 
 async def handle_task_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -42,14 +36,13 @@ async def handle_task_selection(update: Update, context: ContextTypes.DEFAULT_TY
         query = update.callback_query
         await query.answer()
         user_id = query.from_user.id
-        task_type = query.data
+        _, tipo_tarea, _ = decode_callback(query.data)
 
-        if task_type not in ['tarea_individual', 'tarea_grupal']:
+        if tipo_tarea not in ['individual', 'grupal']:
             await query.edit_message_text("\U000026A0 Selección no válida. Por favor, elige una opción válida: \U0001F9CD Tarea Individual o \U0001F46A Tarea Grupal.")
             return TIPO_TAREA
 
-        tipo_tarea = 'individual' if task_type == 'tarea_individual' else 'grupal'
-        tareas_collection.insert_one({
+        await repository.save_tarea({
             'usuario_id': str(user_id),
             'tipo_tarea': tipo_tarea,
             'fecha_seleccion': datetime.utcnow()
@@ -73,8 +66,8 @@ async def handle_task_selection(update: Update, context: ContextTypes.DEFAULT_TY
             return await consent_group.show_consent_group(context, user_id=user_id)
 
     except Exception as e:
-        logger.error(f"Error en handle_task_selection: {e}")
+        logger.error("Error en handle_task_selection: %s", e)
         if update.callback_query:
-            await update.callback_query.message.reply_text("\U0000274C Ha ocurrido un error al procesar tu selección. Volvamos a intentarlo desde el principio.")
+            outbox.send(update, "\U0000274C Ha ocurrido un error al procesar tu selección. Volvamos a intentarlo desde el principio.")
         return await start_task(update, context)
 
@@ -0,0 +1,208 @@
+# indexes.py
+#
+# Índices de MongoDB que necesitan las consultas del bot y las de los
+# investigadores, declarados en código:
+#
+# - INDEXES: los índices de cada colección. `ensure_indexes` los crea si no
+#   existen (create_index no hace nada si ya hay uno idéntico), así que se
+#   puede ejecutar en cada arranque del bot (MONGO_ENSURE_INDEXES) o desde la
+#   línea de comandos.
+# - HOT_QUERIES: las consultas frecuentes. `check_queries` pide a MongoDB el
+#   plan de cada una con explain() y falla si alguna recorre la colección
+#   entera (COLLSCAN), p. ej. porque se ha borrado un índice o ha cambiado la
+#   forma de la consulta.
+#
+# Uso:
+#   python indexes.py            # crear los índices que falten y comprobar
+#   python indexes.py --check    # solo comprobar (sale con código 1 si falla)
+#   python indexes.py --list     # mostrar los índices declarados
+
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+import database
+from config import validate_config
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = 1
+
+
+class Index:
+    """Índice de una colección. `keys` es una lista de pares (campo, dirección)."""
+
+    __slots__ = ('collection', 'keys', 'unique')
+
+    def __init__(self, collection: str, keys: list, unique: bool = False):
+        self.collection = collection
+        self.keys = keys
+        self.unique = unique
+
+    @property
+    def name(self) -> str:
+        # El mismo nombre que pymongo genera por defecto
+        return '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+
+    def __str__(self):
+        return f"{self.collection}.{self.name}{' (único)' if self.unique else ''}"
+
+
+class Query:
+    """Consulta frecuente que debe resolverse con un índice."""
+
+    __slots__ = ('collection', 'filter', 'sort', 'description')
+
+    def __init__(self, collection: str, filter: dict, description: str, sort: list = None):
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+        self.description = description
+
+
+# ============================================================================
+# ÍNDICES DECLARADOS
+# ============================================================================
+
+INDEXES = [
+    # Respuestas: consultas por participante, pareja y pregunta, y exportaciones
+    # por fecha
+    Index(database.RESPUESTAS, [('usuario_id', ASCENDING)]),
+    # Único: una respuesta repetida (trabajo de audio reintentado tras un
+    # reinicio) falla con clave duplicada en lugar de guardarse dos veces
+    Index(database.RESPUESTAS, [('respuesta_id', ASCENDING)], unique=True),
+    Index(database.RESPUESTAS, [('pareja_id', ASCENDING)]),
+    Index(database.RESPUESTAS, [('pregunta_id', ASCENDING), ('fecha_respuesta', ASCENDING)]),
+    Index(database.RESPUESTAS, [('fecha_respuesta', ASCENDING), ('_id', ASCENDING)]),
+    # Notas de voz (bundle_audios.py, audio_metadata.py), en el orden de exportación
+    Index(database.RESPUESTAS, [('tipo_respuesta', ASCENDING), ('fecha_respuesta', ASCENDING), ('_id', ASCENDING)]),
+    # Exportación incremental: orden de inserción
+    Index(database.RESPUESTAS, [('fecha_insercion', ASCENDING), ('_id', ASCENDING)]),
+
+    Index(database.TAREAS, [('usuario_id', ASCENDING)]),
+    Index(database.CONSENTIMIENTOS, [('usuario_id', ASCENDING), ('version_consentimiento', ASCENDING)]),
+    Index(database.PARTICIPANTES, [('usuario_id', ASCENDING)]),
+    Index(database.PARTICIPANTES_PAREJA, [('pareja_id', ASCENDING)]),
+
+    # Banco de preguntas y textos de consentimiento. El bot los carga enteros
+    # (question_bank.py, consent_cache.py); quedan la búsqueda de una pregunta
+    # por id y la unicidad de cada versión de consentimiento
+    Index(database.PREGUNTAS_SELECCION_MULTIPLE, [('pregunta_id', ASCENDING)]),
+    Index(database.PREGUNTAS_ABIERTAS, [('pregunta_id', ASCENDING)]),
+    Index(database.TEXTOS_CONSENTIMIENTOS, [('version', ASCENDING)], unique=True),
+
+    # Persistencia: los estados se cargan por nombre de conversación al arrancar
+    # (datos_usuario solo se consulta por _id)
+    Index(database.ESTADOS_CONVERSACION, [('name', ASCENDING)]),
+]
+
+# Los valores de los filtros solo sirven para obtener el plan
+HOT_QUERIES = [
+    Query(database.ESTADOS_CONVERSACION, {'name': 'registro'}, 'estados de una conversación (arranque del bot)'),
+    Query(database.PREGUNTAS_SELECCION_MULTIPLE, {'pregunta_id': 'SM-1'}, 'pregunta de selección múltiple por id'),
+    Query(database.PREGUNTAS_ABIERTAS, {'pregunta_id': 'G-1.1'}, 'pregunta abierta por id'),
+    Query(database.RESPUESTAS, {'usuario_id': '1'}, 'respuestas de un participante'),
+    Query(database.RESPUESTAS, {'pareja_id': 'pareja'}, 'respuestas de una pareja'),
+    Query(database.RESPUESTAS, {'pregunta_id': 'SM-1'}, 'respuestas a una pregunta', sort=[('fecha_respuesta', ASCENDING)]),
+    Query(database.RESPUESTAS, {'tipo_respuesta': 'audio'}, 'respuestas con nota de voz',
+          sort=[('fecha_respuesta', ASCENDING), ('_id', ASCENDING)]),
+    Query(database.RESPUESTAS, {}, 'respuestas por orden de inserción (primera exportación)',
+          sort=[('fecha_insercion', ASCENDING), ('_id', ASCENDING)]),
+    # La forma de Checkpoint.query() en export_responses.py
+    Query(database.RESPUESTAS, {'$or': [
+        {'fecha_insercion': {'$gt': datetime(2024, 1, 1)}},
+        {'fecha_insercion': datetime(2024, 1, 1), '_id': {'$gt': '0'}},
+    ]}, 'respuestas posteriores a la marca de agua (exportación incremental)',
+          sort=[('fecha_insercion', ASCENDING), ('_id', ASCENDING)]),
+    Query(database.TAREAS, {'usuario_id': '1'}, 'tareas de un participante'),
+    Query(database.CONSENTIMIENTOS, {'usuario_id': '1'}, 'consentimientos de un participante'),
+    Query(database.PARTICIPANTES, {'usuario_id': '1'}, 'registro de un participante'),
+    Query(database.PARTICIPANTES_PAREJA, {'pareja_id': 'pareja'}, 'registro de una pareja'),
+]
+
+
+# ============================================================================
+# CREACIÓN Y COMPROBACIÓN
+# ============================================================================
+
+def ensure_indexes(db=None) -> list:
+    """
+    Crea los índices de INDEXES que falten. Un índice que el servidor rechaza
+    (p. ej. uno único con datos duplicados) se registra y no detiene el resto;
+    los errores de conexión sí se propagan. Devuelve los índices que han fallado.
+    """
+    from pymongo.errors import OperationFailure
+
+    db = db if db is not None else database.init()
+    failed = []
+    for index in INDEXES:
+        try:
+            db[index.collection].create_index(index.keys, name=index.name, unique=index.unique)
+        except OperationFailure as e:
+            logger.error("No se pudo crear el índice %s: %s", index, e)
+            failed.append(index)
+    logger.info("Índices comprobados: %s declarados, %s con errores", len(INDEXES), len(failed))
+    return failed
+
+
+def _stages(plan: dict):
+    """Todas las etapas de un plan de explain(), incluidas las anidadas."""
+    yield plan.get('stage')
+    if 'queryPlan' in plan:
+        # Formato del motor de ejecución basado en slots (MongoDB 5.1+)
+        yield from _stages(plan['queryPlan'])
+    if 'inputStage' in plan:
+        yield from _stages(plan['inputStage'])
+    for stage in plan.get('inputStages', ()):
+        yield from _stages(stage)
+
+
+def query_stages(db, query: Query) -> list:
+    cursor = db[query.collection].find(query.filter)
+    if query.sort:
+        cursor = cursor.sort(query.sort)
+    plan = cursor.explain()['queryPlanner']['winningPlan']
+    return [stage for stage in _stages(plan) if stage]
+
+
+def check_queries(db=None) -> list:
+    """
+    Comprueba con explain() que ninguna consulta de HOT_QUERIES recorre la
+    colección entera. Devuelve las que lo hacen, con sus etapas.
+    """
+    db = db if db is not None else database.init()
+    failures = []
+    for query in HOT_QUERIES:
+        stages = query_stages(db, query)
+        if 'COLLSCAN' in stages:
+            logger.error("Consulta sin índice (%s) en %s %s: %s", query.description, query.collection, query.filter, ' <- '.join(stages))
+            failures.append((query, stages))
+        else:
+            logger.debug("Consulta con índice (%s): %s", query.description, ' <- '.join(stages))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea y comprueba los índices de MongoDB del bot.")
+    parser.add_argument('--check', action='store_true', help="Solo comprobar con explain(), sin crear índices")
+    parser.add_argument('--list', action='store_true', help="Mostrar los índices declarados y salir")
+    args = parser.parse_args()
+
+    if args.list:
+        for index in INDEXES:
+            print(index)
+        return
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    validate_config(require_telegram=False)
+    failed = [] if args.check else ensure_indexes()
+    failures = check_queries()
+    if failed or failures:
+        print(f"{len(failed)} índices sin crear, {len(failures)} consultas con COLLSCAN", file=sys.stderr)
+        sys.exit(1)
+    print(f"Las {len(HOT_QUERIES)} consultas frecuentes usan índices")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# keyboards.py
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from callback_router import encode_callback
+from registration_form import STEPS
+
+# ============================================================================
+# TECLADOS COMPARTIDOS
+# ============================================================================
+#
+# Los InlineKeyboardMarkup de PTB son inmutables, así que cada teclado fijo se
+# construye una sola vez al importar el módulo y todos los handlers envían el
+# mismo objeto. Los de las preguntas de selección múltiple los construye el
+# banco de preguntas al cargarse (`build_question_keyboard`).
+
+
+def _column(buttons) -> InlineKeyboardMarkup:
+    """Teclado de un botón por fila a partir de pares (texto, callback_data)."""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data=data)] for label, data in buttons])
+
+
+TAREA = _column([
+    ("\U0001F9CD Tarea Individual", encode_callback('tarea', 'individual')),
+    ("\U0001F46A Tarea Grupal", encode_callback('tarea', 'grupal')),
+])
+
+CONSENTIMIENTO = _column([
+    ("\U0001F91D Aceptar", encode_callback('consentimiento', 'aceptar')),
+    ("\U0001F6AB Rechazar", encode_callback('consentimiento', 'rechazar')),
+])
+
+AUDIO_DECISION = _column([
+    ("Enviar otro audio", encode_callback('audio', 'otro')),
+    ("Continuar", encode_callback('audio', 'continuar')),
+])
+
+FIN_CUESTIONARIO = _column([
+    ("\U0001F501 Volver a empezar", encode_callback('cuestionario', 'reiniciar')),
+    ("\U0001F6AA Salir", encode_callback('cuestionario', 'salir')),
+])
+
+# Pasos de selección del registro. callback_data: "registro:<paso>:<opción>"
+REGISTRO = {
+    step.name: _column(
+        (option.label, encode_callback('registro', step.name, option.id)) for option in step.options
+    )
+    for step in STEPS.values() if step.kind == 'choice'
+}
+
+
+def build_question_keyboard(question: dict):
+    """
+    Teclado de una pregunta de selección múltiple o None si no tiene opciones.
+
+    callback_data: "pregunta:opcion:<índice>:<pregunta_id>"; el índice mantiene
+    el botón por debajo del límite de 64 bytes aunque la opción sea larga.
+    """
+    options = question.get('opciones') or []
+    if not options:
+        return None
+    return _column(
+        (opcion, encode_callback('pregunta', 'opcion', f"{index}:{question['pregunta_id']}"))
+        for index, opcion in enumerate(options)
+    )
@@ -0,0 +1,262 @@
+# loadtest.py
+#
+# Prueba de carga sin red: simula N participantes simultáneos que recorren el
+# flujo individual o el de pareja completo (offline_bot.py) con tiempos de
+# reflexión y tamaños de nota de voz realistas. Mide el tiempo hasta completar
+# el flujo, la latencia de cada actualización, el retraso del bucle de eventos
+# y el crecimiento de la memoria del proceso, para dimensionar el despliegue
+# antes de una campaña de trabajo de campo.
+#
+# Los tiempos de reflexión se pueden comprimir con --time-scale (0.01 recorre
+# en segundos un flujo que a un participante real le lleva unos 20 minutos).
+#
+# Uso:
+#   python loadtest.py [--participants 1000] [--pair-ratio 0.3] [--ramp-up 60]
+#                      [--time-scale 0.01] [--api-latency 0.05]
+#                      [--mongo-latency 0.002] [--rate-limit] [--drain-timeout 60]
+#                      [--json carga.json]
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import time
+
+from offline_bot import configure_environment, percentile
+
+# Tiempos de reflexión (mediana en segundos y dispersión de la lognormal)
+THINK_TIMES = {
+    'boton': (4.0, 0.6),
+    'texto': (12.0, 0.5),
+    'voz': (5.0, 0.5),
+}
+# Tamaño de las notas de voz (mediana en bytes y dispersión de la lognormal)
+VOICE_SIZE_MEDIAN = 60_000
+VOICE_SIZE_SIGMA = 0.7
+VOICE_SIZE_LIMITS = (4_000, 1_000_000)
+
+LAG_INTERVAL = 0.05
+MEMORY_INTERVAL = 1.0
+
+
+def make_think_time(time_scale: float):
+    def think_time(rng: random.Random, action: str, duration: int = 0) -> float:
+        median, sigma = THINK_TIMES[action]
+        # Una nota de voz no se envía antes de terminar de grabarla
+        return (duration + rng.lognormvariate(math.log(median), sigma)) * time_scale
+    return think_time
+
+
+def voice_size(rng: random.Random) -> int:
+    size = int(rng.lognormvariate(math.log(VOICE_SIZE_MEDIAN), VOICE_SIZE_SIGMA))
+    return min(max(size, VOICE_SIZE_LIMITS[0]), VOICE_SIZE_LIMITS[1])
+
+
+def rss_bytes() -> int:
+    """Memoria residente actual del proceso (o el máximo si no hay /proc)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KiB en Linux y en bytes en macOS
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+class Monitor:
+    """Muestrea el retraso del bucle de eventos y la memoria mientras dura la prueba."""
+
+    def __init__(self):
+        self.lags = []
+        self.memory = []
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._measure_lag(), name='loadtest-lag'),
+            asyncio.create_task(self._measure_memory(), name='loadtest-memory'),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _measure_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    async def _measure_memory(self):
+        from session_manager import session_manager
+
+        start = time.perf_counter()
+        while True:
+            self.memory.append({
+                'segundo': round(time.perf_counter() - start, 1),
+                'rss_bytes': rss_bytes(),
+                'sesiones': session_manager.stats()['sesiones'],
+            })
+            await asyncio.sleep(MEMORY_INTERVAL)
+
+
+async def run_loadtest(participants: int, pair_ratio: float, ramp_up: float, time_scale: float,
+                       extra_audio_probability: float, api_latency: float, mongo_latency: float,
+                       rate_limit: bool, seed: int, drain_timeout: float = 60.0) -> dict:
+    from offline_bot import OfflineBot, VirtualParticipant
+
+    rng = random.Random(seed)
+    rss_before = rss_bytes()
+    offline_bot = OfflineBot(api_latency=api_latency, mongo_latency=mongo_latency, rate_limit=rate_limit)
+    await offline_bot.start()
+    rss_started = rss_bytes()
+
+    think_time = make_think_time(time_scale)
+    virtual_participants = [
+        VirtualParticipant(
+            offline_bot,
+            user_id=200000 + index,
+            flow='grupal' if rng.random() < pair_ratio else 'individual',
+            rng=random.Random(rng.random()),
+            think_time=think_time,
+            voice_size=voice_size,
+            extra_audio_probability=extra_audio_probability,
+        )
+        for index in range(participants)
+    ]
+    completion_times = {'individual': [], 'grupal': []}
+    failures = []
+
+    async def run_one(participant, delay: float):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            await participant.run()
+        except Exception as e:
+            failures.append(f"{participant.user_id}: {e}")
+            return
+        completion_times[participant.flow].append(time.perf_counter() - start)
+
+    monitor = Monitor()
+    monitor.start()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            run_one(participant, rng.uniform(0, ramp_up)) for participant in virtual_participants
+        ))
+    finally:
+        elapsed = time.perf_counter() - start
+        # Los audios y las respuestas encoladas se terminan antes de parar el bot
+        drain = await offline_bot.drain(drain_timeout)
+        await monitor.stop()
+        rss_finished = rss_bytes()
+        await offline_bot.stop()
+
+    step_latencies = sorted(
+        latency
+        for participant in virtual_participants
+        for latencies in participant.step_latencies.values()
+        for latency in latencies
+    )
+    lags = sorted(monitor.lags)
+    peak_rss = max([sample['rss_bytes'] for sample in monitor.memory] + [rss_finished])
+
+    def distribution(values, scale=1.0):
+        values = sorted(values)
+        return {
+            'n': len(values),
+            'p50': percentile(values, 50) * scale,
+            'p95': percentile(values, 95) * scale,
+            'p99': percentile(values, 99) * scale,
+            'max': (values[-1] if values else 0.0) * scale,
+        }
+
+    return {
+        'participantes': participants,
+        'fallos': failures,
+        'segundos': elapsed,
+        'actualizaciones': len(step_latencies),
+        'actualizaciones_por_segundo': len(step_latencies) / elapsed if elapsed else 0.0,
+        'tiempo_completar_s': {flow: distribution(times) for flow, times in completion_times.items() if times},
+        'latencia_actualizacion_ms': distribution(step_latencies, 1000),
+        'retraso_bucle_ms': distribution(lags, 1000),
+        'vaciado': drain,
+        'memoria': {
+            'rss_inicial_bytes': rss_before,
+            'rss_tras_arrancar_bytes': rss_started,
+            'rss_pico_bytes': peak_rss,
+            'rss_final_bytes': rss_finished,
+            'crecimiento_bytes': rss_finished - rss_started,
+            'crecimiento_por_participante_bytes': (rss_finished - rss_started) / participants if participants else 0,
+            'sesiones_pico': max((sample['sesiones'] for sample in monitor.memory), default=0),
+            'muestras': monitor.memory,
+        },
+        'llamadas_api': dict(sorted(offline_bot.request.calls.items())),
+    }
+
+
+def print_report(results: dict):
+    mib = 1024 * 1024
+    print(f"{results['participantes']} participantes en {results['segundos']:.1f} s, "
+          f"{results['actualizaciones']} actualizaciones ({results['actualizaciones_por_segundo']:.1f}/s)")
+    if results['fallos']:
+        print(f"Participantes que no terminaron: {len(results['fallos'])}")
+        for failure in results['fallos'][:10]:
+            print(f"  {failure}")
+
+    print(f"\n  {'':<40} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9}")
+    rows = [(f'tiempo hasta completar ({flow}, s)', stats) for flow, stats in results['tiempo_completar_s'].items()]
+    rows += [
+        ('latencia por actualización (ms)', results['latencia_actualizacion_ms']),
+        ('retraso del bucle de eventos (ms)', results['retraso_bucle_ms']),
+    ]
+    for label, stats in rows:
+        print(f"  {label:<40} {stats['n']:>7} {stats['p50']:>9.2f} {stats['p95']:>9.2f} {stats['p99']:>9.2f} {stats['max']:>9.2f}")
+
+    memory = results['memoria']
+    print(f"\nMemoria: {memory['rss_tras_arrancar_bytes'] / mib:.1f} MiB al arrancar, "
+          f"pico {memory['rss_pico_bytes'] / mib:.1f} MiB, final {memory['rss_final_bytes'] / mib:.1f} MiB "
+          f"({memory['crecimiento_por_participante_bytes'] / 1024:.1f} KiB por participante); "
+          f"hasta {memory['sesiones_pico']} sesiones en memoria")
+    drain = results['vaciado']
+    print(f"Vaciado de colas al terminar: {drain['segundos']:.1f} s; quedan {drain['audios_pendientes']} audios "
+          f"y {drain['respuestas_en_cola']} respuestas sin guardar")
+    print(f"Llamadas a la API: {results['llamadas_api']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga sin red con participantes virtuales')
+    parser.add_argument('--participants', type=int, default=1000)
+    parser.add_argument('--pair-ratio', type=float, default=0.3, help='fracción de participantes en el flujo de pareja')
+    parser.add_argument('--ramp-up', type=float, default=60.0, help='segundos en los que van llegando los participantes')
+    parser.add_argument('--time-scale', type=float, default=0.01, help='factor aplicado a los tiempos de reflexión')
+    parser.add_argument('--extra-audio', type=float, default=0.1, help='probabilidad de enviar otro audio en la misma pregunta')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='segundos simulados por llamada a Telegram')
+    parser.add_argument('--mongo-latency', type=float, default=0.002, help='segundos simulados por operación de MongoDB')
+    parser.add_argument('--rate-limit', action='store_true', help='incluir el limitador de envíos de rate_limiter.py')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--drain-timeout', type=float, default=60.0,
+                        help='segundos máximos de espera a que se guarden los audios y respuestas pendientes')
+    parser.add_argument('--json', help='guardar los resultados (con las muestras de memoria) en este fichero')
+    args = parser.parse_args()
+
+    configure_environment()
+    results = asyncio.run(run_loadtest(
+        args.participants, args.pair_ratio, args.ramp_up, args.time_scale, args.extra_audio,
+        args.api_latency, args.mongo_latency, args.rate_limit, args.seed, args.drain_timeout
+    ))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
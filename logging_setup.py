@@ -0,0 +1,118 @@
+# logging_setup.py
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_ERROR_FILE
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Campos de contexto que se añaden a cada registro (si tienen valor)
+CONTEXT_FIELDS = ('user_id', 'state', 'latency_ms')
+
+# Usuario y estado de la actualización en curso. Cada actualización se procesa
+# en su propia tarea de asyncio, así que los valores no se mezclan entre usuarios.
+user_id_var = contextvars.ContextVar('log_user_id', default=None)
+state_var = contextvars.ContextVar('log_state', default=None)
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Copia el usuario y el estado actuales en el registro antes de encolarlo."""
+
+    def filter(self, record):
+        if getattr(record, 'user_id', None) is None:
+            record.user_id = user_id_var.get()
+        if getattr(record, 'state', None) is None:
+            record.state = state_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos de contexto que tenga el registro."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        # exc_text lo rellena ExceptionQueueHandler antes de encolar el registro
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        elif record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ExceptionQueueHandler(QueueHandler):
+    """
+    QueueHandler que conserva la excepción del registro.
+
+    El `prepare` de QueueHandler mezcla el traceback en el mensaje y borra
+    exc_info y exc_text, así que el formatter del listener ya no puede
+    separarlo (JsonFormatter perdería el campo 'exception'). Aquí el traceback
+    se formatea en exc_text, en el hilo que registra y mientras sus frames
+    siguen vivos, y el mensaje queda sin él.
+    """
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """
+    Configura el logging del bot sin bloquear el bucle de eventos.
+
+    El único handler del logger raíz es un QueueHandler: emitir un registro
+    solo lo formatea y lo deja en una cola. Un QueueListener, en su propio
+    hilo, lo escribe en la consola y, si es un error, en el fichero rotativo,
+    de modo que la E/S y la rotación de ficheros nunca retrasan una
+    actualización.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    error_handler = RotatingFileHandler(LOG_ERROR_FILE, maxBytes=5*1024*1024, backupCount=25, encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ExceptionQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, console_handler, error_handler, respect_handler_level=True)
+    _listener.start()
+    # Escribir lo que quede en la cola al terminar el proceso
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,284 @@
+# metrics.py
+
+import asyncio
+import functools
+import logging
+import time
+
+from config import METRICS_LISTEN, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Límites (en segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = 'hablacanaria'
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotónico con etiquetas."""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge:
+    """Valor instantáneo que se lee de una función en cada consulta."""
+
+    def __init__(self, name: str, documentation: str, function):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.function = function
+        _registry.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        try:
+            yield f"{self.name} {_format_value(self.function())}"
+        except Exception as e:
+            logger.warning("No se pudo leer la métrica %s: %s", self.name, e)
+
+
+class Histogram:
+    """
+    Histograma de latencias con etiquetas.
+
+    Por cada combinación de etiquetas guarda el número de observaciones por
+    límite, la suma y el total; `_count` sirve también para calcular el
+    rendimiento (peticiones por segundo) con `rate()` en Prometheus.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # etiquetas -> [contadores por límite..., suma, total]
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                values[index] += 1
+                break
+        values[-2] += seconds
+        values[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, values in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {values[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {values[-1]}"
+
+
+def timed(histogram: Histogram, errors: Counter = None, **labels):
+    """Decorador para corrutinas: registra su duración y, si fallan, el error."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(**labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ============================================================================
+# MÉTRICAS DEL BOT
+# ============================================================================
+
+UPDATE_LATENCY = Histogram('update_seconds', 'Tiempo total de procesamiento de una actualización')
+HANDLER_LATENCY = Histogram('handler_seconds', 'Duración de cada handler por estado de la conversación', ('state', 'handler'))
+HANDLER_ERRORS = Counter('handler_errors_total', 'Excepciones no capturadas por handler', ('state', 'handler'))
+MONGO_LATENCY = Histogram('mongo_seconds', 'Duración de cada operación de MongoDB', ('operation',))
+MONGO_ERRORS = Counter('mongo_errors_total', 'Operaciones de MongoDB fallidas', ('operation',))
+TELEGRAM_LATENCY = Histogram('telegram_api_seconds', 'Duración de cada llamada a la API de Telegram', ('endpoint',))
+TELEGRAM_ERRORS = Counter('telegram_api_errors_total', 'Llamadas a la API de Telegram fallidas', ('endpoint',))
+TELEGRAM_QUEUE_WAIT = Histogram('telegram_queue_seconds', 'Espera en la cola del limitador de envíos', ('priority',))
+
+
+def instrument_conversation(conversation, state_names: dict):
+    """
+    Envuelve los handlers del ConversationHandler para medir cada función por
+    estado. En los CallbackRouter se envuelven las rutas, de modo que cada
+    botón cuenta con el nombre de la función que lo atiende. El estado queda
+    además en el contexto de los logs de la actualización.
+    """
+    from callback_router import CallbackRouter
+    from logging_setup import state_var
+
+    def wrap(func, state):
+        handler_name = f"{func.__module__}.{func.__name__}"
+        measured = timed(HANDLER_LATENCY, HANDLER_ERRORS, state=state, handler=handler_name)(func)
+
+        @functools.wraps(func)
+        async def wrapper(update, context):
+            state_var.set(state)
+            return await measured(update, context)
+        return wrapper
+
+    groups = [('inicio', conversation.entry_points), ('fallback', conversation.fallbacks)]
+    groups += [(state_names.get(state, str(state)), handlers) for state, handlers in conversation.states.items()]
+
+    for state, handlers in groups:
+        for handler in handlers:
+            if isinstance(handler, CallbackRouter):
+                handler.routes = {route: wrap(func, state) for route, func in handler.routes.items()}
+                handler.default = wrap(handler.default, state)
+            else:
+                handler.callback = wrap(handler.callback, state)
+
+
+# ============================================================================
+# ARRANQUE
+# ============================================================================
+
+class StartupTimer:
+    """
+    Duración de cada fase del arranque (importar los módulos, validar la
+    configuración, construir la Application, cada paso de post_init...).
+    `report` las resume en una sola línea de log.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = None
+
+    def start(self, at: float = None):
+        """Empieza a medir en `at` (un valor de time.perf_counter) o ahora."""
+        self.phases = []
+        self._last = time.perf_counter() if at is None else at
+
+    def mark(self, phase: str):
+        """Cierra la fase `phase`, que empezó en la marca anterior."""
+        if self._last is None:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self):
+        if self.phases:
+            logger.info("Arranque completado en %.3f s: %s", self.total,
+                        ', '.join(f"{phase} {seconds:.3f} s" for phase, seconds in self.phases))
+
+
+startup_timer = StartupTimer()
+Gauge('startup_seconds', 'Duración del último arranque del bot', lambda: startup_timer.total)
+
+
+# ============================================================================
+# ENDPOINT HTTP
+# ============================================================================
+
+class MetricsServer:
+    """Servidor HTTP mínimo que publica `/metrics` en formato de texto de Prometheus."""
+
+    def __init__(self, host: str = METRICS_LISTEN, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        if self.port <= 0 or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Métricas disponibles en http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Descartar las cabeceras de la petición
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.warning("Error al servir las métricas: %s", e)
+        finally:
+            writer.close()
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,153 @@
+# migrate_audios.py
+#
+# Reubica los audios del antiguo directorio plano `audios/` en la estructura
+# repartida por hash de `audio_storage.py` y actualiza el campo `respuesta` de
+# los documentos de 'respuestas' que apuntaban a la ruta antigua.
+#
+# 'respuestas' se lee una sola vez (solo `_id` y `respuesta`) para saber qué
+# documentos apuntan a cada fichero, y cada uno se actualiza por `_id`: sin
+# índice en `respuesta`, filtrar por la ruta recorrería la colección entera
+# por cada audio. Las rutas se comparan normalizadas: las de 'respuestas' son
+# relativas al directorio de trabajo del bot (--base-dir) y las de --source al
+# directorio actual, así que `audios`, `./audios/` o una ruta absoluta valen
+# igual.
+#
+# Cada lote de respuestas se actualiza antes de mover sus ficheros. Si la
+# migración se interrumpe entre las dos cosas, las respuestas ya apuntan a la
+# ruta nueva y el fichero sigue en `source`; la siguiente ejecución lo mueve.
+#
+# Uso:
+#   python migrate_audios.py [--source audios] [--base-dir .] [--batch-size 500]
+#                            [--dry-run] [--allow-unmatched]
+
+import argparse
+import logging
+import os
+from collections import defaultdict
+
+from pymongo import UpdateOne
+
+from audio_storage import audio_storage, file_sha256
+from config import validate_config
+import database
+
+logger = logging.getLogger('migrate_audios')
+
+
+def iter_flat_audios(source: str):
+    """Ficheros .ogg situados directamente en `source` (el formato antiguo)."""
+    with os.scandir(source) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith('.ogg'):
+                yield entry
+
+
+def target_path(entry) -> str:
+    if audio_storage.content_hashing:
+        return audio_storage.path_for(f'{file_sha256(entry.path)}.ogg')
+    return audio_storage.path_for(entry.name)
+
+
+def normalized(path: str, base_dir: str = '.') -> str:
+    """Ruta absoluta y normalizada de `path`, relativo a `base_dir`."""
+    return os.path.normpath(os.path.abspath(os.path.join(base_dir, path)))
+
+
+def stored_path(path: str, base_dir: str = '.') -> str:
+    """Ruta que se guarda en 'respuestas': relativa a `base_dir`, como la escribe el bot."""
+    if os.path.isabs(path):
+        return path
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(base_dir))
+
+
+def respuestas_by_path(paths: set, base_dir: str = '.') -> dict:
+    """_id de las respuestas que apuntan a cada una de `paths` (normalizadas)."""
+    ids = defaultdict(list)
+    for document in database.collection(database.RESPUESTAS).find({}, {'respuesta': 1}):
+        respuesta = document.get('respuesta')
+        if not isinstance(respuesta, str) or not respuesta.endswith('.ogg'):
+            continue
+        path = normalized(respuesta, base_dir)
+        if path in paths:
+            ids[path].append(document['_id'])
+    return ids
+
+
+def migrate_batch(entries: list, targets: dict, respuestas: dict, base_dir: str, dry_run: bool, stats: dict):
+    """Actualiza las respuestas de `entries` y después mueve sus ficheros."""
+    updates = []
+    moves = []
+    for entry in entries:
+        new_path = targets[entry.path]
+        for _id in respuestas.pop(normalized(entry.path), ()):
+            updates.append(UpdateOne({'_id': _id}, {'$set': {'respuesta': stored_path(new_path, base_dir)}}))
+        moves.append((entry.path, new_path))
+
+    if dry_run:
+        stats['respuestas'] += len(updates)
+        stats['audios'] += len(moves)
+        return
+    if updates:
+        database.collection(database.RESPUESTAS).bulk_write(updates, ordered=False)
+        stats['respuestas'] += len(updates)
+
+    for old_path, new_path in moves:
+        if os.path.exists(new_path):
+            # Solo ocurre con content hashing: contenido idéntico ya migrado
+            os.remove(old_path)
+            stats['duplicados'] += 1
+        else:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.replace(old_path, new_path)
+        stats['audios'] += 1
+
+
+def migrate(source: str, batch_size: int, dry_run: bool, base_dir: str = '.', allow_unmatched: bool = False) -> dict:
+    stats = {'audios': 0, 'respuestas': 0, 'duplicados': 0}
+
+    # Listar antes de mover: los subdirectorios se crean dentro de `source`
+    entries = list(iter_flat_audios(source))
+    targets = {entry.path: target_path(entry) for entry in entries}
+    # También las rutas nuevas: respuestas ya actualizadas en una ejecución
+    # interrumpida antes de mover el fichero
+    respuestas = respuestas_by_path(
+        {normalized(path) for entry in entries for path in (entry.path, targets[entry.path])}, base_dir
+    )
+    already_updated = sum(len(respuestas.pop(normalized(path), ())) for path in set(targets.values()))
+    logger.info("%s audios que mover, %s con respuestas que actualizar, %s respuestas ya actualizadas",
+                len(entries), len(respuestas), already_updated)
+    if entries and not respuestas and not allow_unmatched and not already_updated:
+        # Lo más probable es que --source o --base-dir no coincidan con las rutas
+        # que guardó el bot: mover los ficheros dejaría las respuestas sin audio
+        raise SystemExit(f"Ninguna respuesta apunta a los {len(entries)} audios de {source}; revisa --source y "
+                         "--base-dir (o usa --allow-unmatched para moverlos igualmente)")
+
+    for start in range(0, len(entries), batch_size):
+        migrate_batch(entries[start:start + batch_size], targets, respuestas, base_dir, dry_run, stats)
+        logger.info("%s audios procesados", stats['audios'])
+
+    logger.info("Migración terminada: %s audios, %s respuestas actualizadas, %s duplicados eliminados%s",
+                stats['audios'], stats['respuestas'], stats['duplicados'], ' (simulación)' if dry_run else '')
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra los audios al almacenamiento repartido por hash.")
+    parser.add_argument('--source', default=audio_storage.root, help="Directorio plano con los audios antiguos")
+    parser.add_argument('--base-dir', default='.', help="Directorio de trabajo del bot (para las rutas relativas)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Audios por lote y actualizaciones por bulk_write")
+    parser.add_argument('--dry-run', action='store_true', help="Muestra lo que se haría sin mover ni actualizar nada")
+    parser.add_argument('--allow-unmatched', action='store_true',
+                        help="Mover los audios aunque ninguna respuesta apunte a ellos")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    validate_config(require_telegram=False)
+    try:
+        migrate(args.source, args.batch_size, args.dry_run, args.base_dir, args.allow_unmatched)
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,602 @@
+# offline_bot.py
+#
+# El bot completo (la Application de bot.build_application, con su
+# ConversationHandler, persistencia y tareas de fondo) ejecutándose sin
+# Telegram ni MongoDB, para benchmarks y pruebas de carga:
+#
+# - FakeTelegramRequest sustituye la conexión HTTP del Bot: responde a cada
+#   llamada de la API como lo haría Telegram y la registra.
+# - FakeCollection sustituye las colecciones de MongoDB (database.init) por
+#   listas en memoria con el subconjunto de pymongo que usa el bot.
+# - VirtualParticipant recorre un flujo completo (/start, tarea,
+#   consentimiento, registro y cuestionario) pulsando los botones que el bot
+#   le envía y mide la latencia de cada paso.
+#
+# Los módulos del bot leen la configuración al importarse, así que este módulo
+# no los importa hasta que `configure_environment` ha preparado las variables
+# de entorno (directorios temporales, métricas desactivadas...).
+
+import asyncio
+import copy
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+FAKE_TOKEN = '123456:OFFLINE'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'HablaCanariaBot', 'username': 'hablacanaria_offline_bot'}
+
+# Respuestas de texto para los pasos de registro que las piden
+TEXT_ANSWERS = {
+    'email': 'participante{n}@example.org',
+    'anio_nacimiento': '1990',
+    'grado_tipo': 'Filología Hispánica',
+}
+DEFAULT_TEXT_ANSWER = 'Respuesta {n}'
+
+# Bytes por segundo de una nota de voz de Telegram (Opus a unos 32 kbit/s)
+VOICE_BYTES_PER_SECOND = 4000
+
+# Directorio temporal creado por configure_environment; OfflineBot.stop lo borra
+_temporary_workdir = None
+
+
+def configure_environment(workdir: str = None, log_level: str = 'WARNING') -> str:
+    """
+    Prepara las variables de entorno antes de importar el bot. Los ficheros
+    que escribe (audios, trabajos, respuestas pendientes, log de errores) van a
+    `workdir` o a un directorio temporal, que se devuelve.
+    """
+    global _temporary_workdir
+    if not workdir:
+        workdir = _temporary_workdir = tempfile.mkdtemp(prefix='hablacanaria-offline-')
+    os.environ.setdefault('MONGO_USER', 'offline')
+    os.environ.setdefault('MONGO_PASSWORD', 'offline')
+    os.environ.setdefault('LOG_LEVEL', log_level)
+    os.environ.update({
+        'TELEGRAM_TOKEN': FAKE_TOKEN,
+        'AUDIO_DIR': os.path.join(workdir, 'audios'),
+        'AUDIO_JOBS_DIR': os.path.join(workdir, 'audio_jobs'),
+        'RESPUESTAS_SPILL_PATH': os.path.join(workdir, 'respuestas_pendientes.jsonl'),
+        'LOG_ERROR_FILE': os.path.join(workdir, 'errors.log'),
+        'METRICS_PORT': '0',
+        'MONGO_ENSURE_INDEXES': 'false',
+        'QUESTION_BANK_REFRESH_INTERVAL': '0',
+        'CONSENT_REFRESH_INTERVAL': '0',
+        'RUN_MODE': 'polling',
+    })
+    return workdir
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# ============================================================================
+# TELEGRAM
+# ============================================================================
+
+class FakeTelegramRequest(BaseRequest):
+    """
+    Conexión con la API de Telegram que no sale del proceso.
+
+    Responde a cada método con un resultado verosímil (los mensajes enviados
+    reciben un message_id y conservan su teclado), simula `latency` segundos
+    de red por llamada y guarda los mensajes de cada chat para que los
+    participantes virtuales puedan pulsar sus botones. Las notas de voz se
+    "descargan" como ficheros del tamaño anunciado en `register_file`.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {}
+        self._messages = {}
+        self._files = {}
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def register_file(self, file_id: str, size: int):
+        self._files[file_id] = size
+
+    def messages(self, chat_id: int) -> list:
+        """Mensajes enviados o editados en un chat, en orden."""
+        return self._messages.setdefault(chat_id, [])
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if '/file/bot' in url:
+            file_id = os.path.splitext(url.rsplit('/', 1)[-1])[0]
+            return 200, b'\0' * self._files.get(file_id, 0)
+
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        parameters = request_data.parameters if request_data else {}
+        result = self._result(endpoint, parameters)
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+    def _result(self, endpoint: str, parameters: dict):
+        if endpoint == 'getMe':
+            return BOT_USER
+        if endpoint == 'getFile':
+            file_id = parameters['file_id']
+            return {
+                'file_id': file_id,
+                'file_unique_id': file_id,
+                'file_size': self._files.get(file_id, 0),
+                'file_path': f'voice/{file_id}.ogg',
+            }
+        if endpoint == 'sendMessage':
+            return self._store_message(parameters, next(self._message_ids))
+        if endpoint in ('editMessageText', 'editMessageReplyMarkup'):
+            return self._store_message(parameters, parameters['message_id'], edited=True)
+        return True
+
+    def _store_message(self, parameters: dict, message_id: int, edited: bool = False) -> dict:
+        chat_id = int(parameters['chat_id'])
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'from': BOT_USER,
+            'text': parameters.get('text', ''),
+        }
+        if parameters.get('reply_markup'):
+            message['reply_markup'] = parameters['reply_markup']
+        if edited:
+            message['edit_date'] = message['date']
+        self.messages(chat_id).append(message)
+        return message
+
+
+# ============================================================================
+# MONGODB
+# ============================================================================
+
+def _get_path(document: dict, path: str):
+    for part in path.split('.'):
+        if not isinstance(document, dict) or part not in document:
+            return None
+        document = document[part]
+    return document
+
+
+def _set_path(document: dict, path: str, value):
+    *parents, last = path.split('.')
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def _unset_path(document: dict, path: str):
+    *parents, last = path.split('.')
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def _matches(document: dict, query: dict) -> bool:
+    return all(_get_path(document, key) == value for key, value in (query or {}).items())
+
+
+def _project(document: dict, projection: dict) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    included = {key for key, value in projection.items() if value and key != '_id'}
+    result = {key: copy.deepcopy(value) for key, value in document.items() if key in included}
+    if projection.get('_id', 1) and '_id' in document:
+        result['_id'] = document['_id']
+    return result
+
+
+class FakeCollection:
+    """
+    Colección de MongoDB en memoria con las operaciones que usa repository.py.
+
+    Los filtros solo admiten igualdad (también con rutas "a.b") y las
+    actualizaciones `$set` y `$unset`, que es todo lo que necesita el bot.
+    `latency` simula el tiempo de ida y vuelta al servidor; como repository.py
+    ejecuta pymongo en un pool de hilos, se simula con `time.sleep`.
+    """
+
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.documents = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _insert(self, document: dict):
+        document.setdefault('_id', f'{self.name}-{next(self._ids)}')
+        self.documents.append(copy.deepcopy(document))
+
+    def insert_one(self, document: dict):
+        self._wait()
+        with self._lock:
+            self._insert(document)
+
+    def insert_many(self, documents: list, ordered: bool = True):
+        self._wait()
+        with self._lock:
+            for document in documents:
+                self._insert(document)
+
+    def find(self, query: dict = None, projection: dict = None):
+        self._wait()
+        with self._lock:
+            return [_project(document, projection) for document in self.documents if _matches(document, query)]
+
+    def find_one(self, query: dict = None, projection: dict = None):
+        self._wait()
+        with self._lock:
+            for document in self.documents:
+                if _matches(document, query):
+                    return _project(document, projection)
+        return None
+
+    def _update(self, query: dict, update: dict, upsert: bool):
+        for document in self.documents:
+            if _matches(document, query):
+                break
+        else:
+            if not upsert:
+                return
+            document = {key: value for key, value in query.items() if '.' not in key}
+            self._insert(document)
+            document = self.documents[-1]
+        for path, value in update.get('$set', {}).items():
+            _set_path(document, path, copy.deepcopy(value))
+        for path in update.get('$unset', {}):
+            _unset_path(document, path)
+
+    def _replace(self, query: dict, replacement: dict, upsert: bool):
+        for index, document in enumerate(self.documents):
+            if _matches(document, query):
+                self.documents[index] = copy.deepcopy(replacement)
+                return
+        if upsert:
+            self._insert(dict(replacement))
+
+    def _delete(self, query: dict):
+        for index, document in enumerate(self.documents):
+            if _matches(document, query):
+                del self.documents[index]
+                return
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self._wait()
+        with self._lock:
+            self._update(query, update, upsert)
+
+    def replace_one(self, query: dict, replacement: dict, upsert: bool = False):
+        self._wait()
+        with self._lock:
+            self._replace(query, replacement, upsert)
+
+    def delete_one(self, query: dict):
+        self._wait()
+        with self._lock:
+            self._delete(query)
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        self._wait()
+        with self._lock:
+            for operation in operations:
+                kind = type(operation).__name__
+                if kind == 'ReplaceOne':
+                    self._replace(operation._filter, operation._doc, operation._upsert)
+                elif kind == 'UpdateOne':
+                    self._update(operation._filter, operation._doc, operation._upsert)
+                elif kind == 'DeleteOne':
+                    self._delete(operation._filter)
+                else:
+                    raise NotImplementedError(f"Operación no soportada en FakeCollection: {kind}")
+
+
+class FakeDatabase(dict):
+    """Base de datos en memoria: crea cada FakeCollection al pedirla."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+
+    def __missing__(self, name: str):
+        self[name] = FakeCollection(name, self.latency)
+        return self[name]
+
+
+def install_fake_mongo(latency: float = 0.0, multiple_choice: int = 30, open_groups: int = 12) -> dict:
+    """
+    Instala una FakeDatabase como base de datos del bot y carga un banco de
+    preguntas y los textos de consentimiento sintéticos. Devuelve las
+    colecciones por nombre.
+    """
+    import database
+
+    collections = FakeDatabase(latency)
+    database.init(db=collections)
+
+    collections['textos_consentimientos'].documents.extend([
+        {'_id': 'consentimiento-1', 'version': '1.0', 'texto_consentimiento': 'Texto del consentimiento individual.'},
+        {'_id': 'consentimiento-2', 'version': '1.0_grupal', 'texto_consentimiento': 'Texto del consentimiento grupal.'},
+    ])
+    collections['preguntas_seleccion_multiple'].documents.extend(
+        {
+            '_id': f'sm-{index}',
+            'pregunta_id': f'SM-{index}',
+            'pregunta': f'¿Cómo dirías la expresión {index}?',
+            'opciones': [f'Opción {option} de la pregunta {index}' for option in range(1, 5)],
+            'tipo_tarea': 'individual',
+        }
+        for index in range(1, multiple_choice + 1)
+    )
+    collections['preguntas_abiertas'].documents.extend(
+        {
+            '_id': f'g-{group}.{index}',
+            'pregunta_id': f'G-{group}.{index}',
+            'pregunta': f'Cuenta con tus palabras la situación {group}.{index}.',
+            'tipo_tarea': 'ambos',
+        }
+        for group in range(1, open_groups + 1) for index in range(1, 3)
+    )
+    return collections
+
+
+# ============================================================================
+# BOT
+# ============================================================================
+
+class OfflineBot:
+    """
+    La Application real de bot.py con FakeTelegramRequest y FakeCollection.
+
+    `start` y `stop` siguen la misma secuencia que `run_polling` (initialize,
+    post_init, start / stop, shutdown, post_shutdown) pero sin pedir
+    actualizaciones a Telegram: se entregan con `process_update`, que pasa por
+    el mismo procesador de actualizaciones concurrente que en producción.
+    """
+
+    def __init__(self, api_latency: float = 0.0, mongo_latency: float = 0.0, rate_limit: bool = False):
+        self.request = FakeTelegramRequest(api_latency)
+        self.mongo_latency = mongo_latency
+        self.rate_limit = rate_limit
+        self.application = None
+        self.collections = None
+        self._update_ids = itertools.count(1)
+
+    async def start(self):
+        import bot
+        from logging_setup import setup_logging
+        from metrics import startup_timer
+        from rate_limiter import rate_limiter, PriorityRateLimiter
+
+        startup_timer.start()
+        setup_logging()
+
+        if not self.rate_limit:
+            # La cola de prioridad sigue funcionando, pero sin límites de envío
+            unlimited = float('inf')
+            limiter = PriorityRateLimiter(unlimited, unlimited, unlimited, unlimited)
+        else:
+            limiter = rate_limiter
+
+        self.collections = install_fake_mongo(self.mongo_latency)
+        self.application = bot.build_application(token=FAKE_TOKEN, request=self.request, limiter=limiter)
+        await self.application.initialize()
+        await self.application.post_init(self.application)
+        await self.application.start()
+
+    async def drain(self, timeout: float) -> dict:
+        """
+        Espera, como mucho `timeout` segundos, a que se descarguen los audios
+        pendientes y se guarden las respuestas encoladas. Devuelve lo que ha
+        tardado y lo que queda pendiente.
+        """
+        from audio_ingestion import audio_ingestion
+        from response_queue import respuestas_queue
+
+        start = time.perf_counter()
+        while audio_ingestion.pending() or len(respuestas_queue):
+            if time.perf_counter() - start >= timeout:
+                break
+            await asyncio.sleep(0.05)
+        return {
+            'segundos': time.perf_counter() - start,
+            'audios_pendientes': audio_ingestion.pending(),
+            'respuestas_en_cola': len(respuestas_queue),
+        }
+
+    async def stop(self):
+        global _temporary_workdir
+        await self.application.stop()
+        await self.application.shutdown()
+        await self.application.post_shutdown(self.application)
+        if _temporary_workdir:
+            shutil.rmtree(_temporary_workdir, ignore_errors=True)
+            _temporary_workdir = None
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    async def process_update(self, data: dict):
+        update = Update.de_json(data, self.application.bot)
+        application = self.application
+        await application.update_processor.process_update(update, application.process_update(update))
+
+    def user_data(self, user_id: int) -> dict:
+        return self.application.user_data.get(user_id, {})
+
+
+class VirtualParticipant:
+    """
+    Participante simulado que recorre un flujo completo del bot.
+
+    En cada paso responde al último mensaje con teclado que le ha enviado el
+    bot: elige la tarea (`flow`), acepta el consentimiento, escoge opciones al
+    azar en el registro y en las preguntas de selección múltiple, y al final
+    sale del cuestionario. Si el bot no espera un botón, contesta con texto en
+    los pasos de registro que lo piden y con una nota de voz en las preguntas
+    abiertas. `step_latencies` guarda la duración de cada paso por etiqueta.
+
+    `think_time(rng, action, duration)` devuelve los segundos que el
+    participante tarda antes de cada acción ('boton', 'texto' o 'voz'; en las
+    notas de voz `duration` es la duración del audio) y `voice_size(rng)` el
+    tamaño en bytes de cada nota de voz.
+    """
+
+    MAX_STEPS = 1000
+
+    def __init__(self, offline_bot: OfflineBot, user_id: int, flow: str, rng: random.Random = None,
+                 think_time=None, voice_size=None, extra_audio_probability: float = 0.0):
+        self.bot = offline_bot
+        self.user_id = user_id
+        self.flow = flow
+        self.rng = rng or random.Random(user_id)
+        self.think_time = think_time
+        self.voice_size = voice_size or (lambda rng: rng.randint(20_000, 120_000))
+        self.extra_audio_probability = extra_audio_probability
+        self.step_latencies = {}
+        self.steps = 0
+        self.finished = False
+        self._seen = 0
+        self._keyboard_message = None
+        self._message_ids = itertools.count(1)
+
+    # ------------------------------------------------------------------------
+    # Construcción de actualizaciones
+    # ------------------------------------------------------------------------
+
+    @property
+    def _user(self) -> dict:
+        return {'id': self.user_id, 'is_bot': False, 'first_name': f'Participante {self.user_id}'}
+
+    def _message(self, **fields) -> dict:
+        return {
+            'update_id': self.bot.next_update_id(),
+            'message': {
+                'message_id': next(self._message_ids),
+                'date': int(datetime.now(timezone.utc).timestamp()),
+                'chat': {'id': self.user_id, 'type': 'private'},
+                'from': self._user,
+                **fields,
+            },
+        }
+
+    def _command(self, command: str) -> dict:
+        return self._message(text=command, entities=[{'type': 'bot_command', 'offset': 0, 'length': len(command)}])
+
+    def _callback(self, data: str) -> dict:
+        return {
+            'update_id': self.bot.next_update_id(),
+            'callback_query': {
+                'id': f'{self.user_id}-{self.steps}',
+                'from': self._user,
+                'chat_instance': str(self.user_id),
+                'message': self._keyboard_message,
+                'data': data,
+            },
+        }
+
+    def _voice(self) -> dict:
+        size = self.voice_size(self.rng)
+        file_id = f'voz-{self.user_id}-{self.steps}'
+        self.bot.request.register_file(file_id, size)
+        return self._message(voice={
+            'file_id': file_id,
+            'file_unique_id': file_id,
+            'duration': max(1, size // VOICE_BYTES_PER_SECOND),
+            'mime_type': 'audio/ogg',
+            'file_size': size,
+        })
+
+    # ------------------------------------------------------------------------
+    # Recorrido
+    # ------------------------------------------------------------------------
+
+    async def _send(self, label: str, data: dict):
+        start = time.perf_counter()
+        await self.bot.process_update(data)
+        self.step_latencies.setdefault(label, []).append(time.perf_counter() - start)
+        self.steps += 1
+
+        # Mensaje con teclado más reciente de los que ha enviado el bot en este paso
+        messages = self.bot.request.messages(self.user_id)
+        new_messages, self._seen = messages[self._seen:], len(messages)
+        self._keyboard_message = None
+        for message in new_messages:
+            if message.get('reply_markup') and 'edit_date' not in message:
+                self._keyboard_message = message
+
+    def _choose_button(self) -> str:
+        buttons = [button['callback_data'] for row in self._keyboard_message['reply_markup']['inline_keyboard'] for button in row]
+        namespace = buttons[0].split(':', 1)[0]
+        if namespace == 'tarea':
+            return f'tarea:{self.flow}'
+        if namespace == 'consentimiento':
+            return 'consentimiento:aceptar'
+        if namespace == 'audio':
+            return 'audio:otro' if self.rng.random() < self.extra_audio_probability else 'audio:continuar'
+        if namespace == 'cuestionario':
+            return 'cuestionario:salir'
+        return self.rng.choice(buttons)
+
+    async def _think(self, action: str, duration: int = 0):
+        if self.think_time:
+            await asyncio.sleep(self.think_time(self.rng, action, duration))
+
+    async def run(self):
+        from handlers.registration import STEP_KEY
+        from registration_form import STEPS
+
+        await self._send('start', self._command('/start'))
+        while not self.finished:
+            if self.steps >= self.MAX_STEPS:
+                raise RuntimeError(f"El participante {self.user_id} no terminó el flujo en {self.MAX_STEPS} pasos")
+
+            if self._keyboard_message is not None:
+                data = self._choose_button()
+                await self._think('boton')
+                label = ':'.join(data.split(':')[:2])
+                self.finished = data == 'cuestionario:salir'
+                await self._send(label, self._callback(data))
+                continue
+
+            step_name = self.bot.user_data(self.user_id).get(STEP_KEY)
+            if step_name is not None:
+                step = STEPS[step_name]
+                answer = TEXT_ANSWERS.get(step.key, DEFAULT_TEXT_ANSWER).format(n=self.user_id)
+                await self._think('texto')
+                await self._send(f'registro:{step_name}', self._message(text=answer))
+            else:
+                voice = self._voice()
+                await self._think('voz', voice['message']['voice']['duration'])
+                await self._send('pregunta:voz', voice)
@@ -0,0 +1,62 @@
+# outbox.py
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Límite de Telegram para el texto de un mensaje
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n"
+
+
+class Outbox:
+    """
+    Agrupa los mensajes que un handler envía seguidos al mismo chat.
+
+    Los handlers llaman a `send` en lugar de `bot.send_message`; los mensajes
+    se acumulan por actualización y `flush`, registrado como TypeHandler en el
+    grupo 1 (después del ConversationHandler), los envía. Dos mensajes
+    consecutivos para el mismo chat se unen en uno solo salvo que el primero
+    lleve teclado (los botones deben quedar debajo de su propio texto) o que el
+    resultado supere el límite de Telegram. Así "Respuesta guardada" + la
+    pregunta siguiente con su teclado es una única llamada a la API.
+
+    Las ediciones de mensajes no pasan por aquí: se hacen directamente, ya que
+    modifican un mensaje anterior y no cambian el orden del chat.
+    """
+
+    def __init__(self):
+        # update_id -> [{'chat_id', 'text', 'reply_markup'}]
+        self._pending = {}
+        self.sent = 0
+        self.coalesced = 0
+
+    def send(self, update, text: str, reply_markup=None, chat_id: int = None):
+        if chat_id is None:
+            chat_id = update.effective_chat.id
+        messages = self._pending.setdefault(update.update_id, [])
+
+        if messages:
+            last = messages[-1]
+            if (last['chat_id'] == chat_id and last['reply_markup'] is None
+                    and len(last['text']) + len(SEPARATOR) + len(text) <= MAX_MESSAGE_LENGTH):
+                last['text'] = f"{last['text']}{SEPARATOR}{text}"
+                last['reply_markup'] = reply_markup
+                self.coalesced += 1
+                return
+
+        messages.append({'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup})
+
+    async def flush(self, update, context):
+        messages = self._pending.pop(getattr(update, 'update_id', None), None)
+        if not messages:
+            return
+        for message in messages:
+            try:
+                await context.bot.send_message(**message)
+                self.sent += 1
+            except Exception as e:
+                logger.error("Error al enviar un mensaje al chat %s: %s", message['chat_id'], e)
+
+
+outbox = Outbox()
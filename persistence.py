@@ -0,0 +1,177 @@
+# persistence.py
+
+import asyncio
+import copy
+import logging
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import repository
+from session import encode_user_value, decode_user_value
+from config import PERSISTENCE_UPDATE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class MongoPersistence(BasePersistence):
+    """
+    Persistencia del ConversationHandler y de `user_data` en MongoDB.
+
+    - Los estados de conversación se cargan al arrancar (son un entero por
+      participante). PTB entrega los cambios en su pasada periódica de
+      `update_persistence` (cada `update_interval` segundos) y aquí se escriben
+      todos los de una pasada con un único `bulk_write`.
+    - `user_data` se carga de forma perezosa: `load_user_data` se registra como
+      TypeHandler en el grupo -1 y recupera los datos del usuario en su primera
+      actualización tras un reinicio.
+    - PTB solo llama a `update_user_data` para los usuarios con actividad y lo
+      hace cada `update_interval` segundos; aquí se compara con la última
+      versión guardada y se escriben únicamente las claves modificadas.
+    """
+
+    def __init__(self, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        # Última versión escrita de cada user_data, para calcular las diferencias
+        self._snapshots = {}
+        self._loaded_users = set()
+        self._pending_conversations = {}
+        self._conversation_flush = None
+
+    # ------------------------------------------------------------------------
+    # Carga perezosa de user_data
+    # ------------------------------------------------------------------------
+
+    async def load_user_data(self, update, context):
+        user = update.effective_user
+        if user is None or user.id in self._loaded_users:
+            return
+        try:
+            data = await repository.find_datos_usuario(user.id)
+        except Exception as e:
+            logger.error("Error al recuperar los datos del usuario %s: %s", user.id, e)
+            return
+        self._loaded_users.add(user.id)
+        if data:
+            for key, value in data.items():
+                context.user_data.setdefault(key, decode_user_value(value))
+            self._snapshots[user.id] = data
+
+    async def get_user_data(self):
+        return {}
+
+    async def update_user_data(self, user_id, data):
+        snapshot = self._snapshots.get(user_id, {})
+        encoded = {key: encode_user_value(value) for key, value in data.items()}
+        changed = {key: value for key, value in encoded.items() if key not in snapshot or snapshot[key] != value}
+        removed = [key for key in snapshot if key not in encoded]
+        if not changed and not removed:
+            return
+        await repository.update_datos_usuario(user_id, changed, removed)
+        self._snapshots[user_id] = copy.deepcopy(encoded)
+
+    async def drop_user_data(self, user_id):
+        self._snapshots.pop(user_id, None)
+        self._loaded_users.discard(user_id)
+        await repository.delete_datos_usuario(user_id)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    def cached_user_data(self) -> tuple:
+        """Lo que la persistencia guarda en memoria de cada usuario: la última versión escrita y si ya se cargó."""
+        return self._snapshots, self._loaded_users
+
+    def forget_user(self, user_id):
+        """Olvida la copia en memoria de un usuario; se recargará en su próxima actualización."""
+        self._snapshots.pop(user_id, None)
+        self._loaded_users.discard(user_id)
+
+    # ------------------------------------------------------------------------
+    # Estados de conversación
+    # ------------------------------------------------------------------------
+
+    async def get_conversations(self, name):
+        documents = await repository.find_estados_conversacion(name)
+        return {tuple(document['key']): document['state'] for document in documents}
+
+    async def update_conversation(self, name, key, new_state):
+        self._pending_conversations[(name, key)] = new_state
+        if self._conversation_flush is None or self._conversation_flush.done():
+            # PTB llama a update_conversation para todos los estados de una pasada
+            # a la vez (asyncio.gather): la tarea empieza cuando ya se han
+            # registrado todos y los escribe juntos, sin esperar más
+            self._conversation_flush = asyncio.create_task(self._write_conversations())
+
+    async def _write_conversations(self):
+        # Incluye los cambios que llegan mientras se escribe. Tras un fallo, los
+        # estados se reintentan en la siguiente pasada con cambios o en flush()
+        while self._pending_conversations:
+            if not await self._flush_conversations():
+                return
+
+    async def _flush_conversations(self) -> bool:
+        from pymongo import DeleteOne, ReplaceOne
+
+        pending, self._pending_conversations = self._pending_conversations, {}
+        operations = []
+        for (name, key), state in pending.items():
+            document_id = f"{name}:{':'.join(str(part) for part in key)}"
+            if state is None:
+                operations.append(DeleteOne({"_id": document_id}))
+            else:
+                operations.append(ReplaceOne(
+                    {"_id": document_id},
+                    {"_id": document_id, "name": name, "key": list(key), "state": state},
+                    upsert=True
+                ))
+        try:
+            await repository.save_estados_conversacion(operations)
+        except Exception as e:
+            logger.error("Error al guardar %s estados de conversación: %s", len(operations), e)
+            # Reintentar en la siguiente escritura sin pisar estados más recientes
+            for conversation, state in pending.items():
+                self._pending_conversations.setdefault(conversation, state)
+            return False
+        return True
+
+    async def flush(self):
+        # PTB llama a flush al detenerse, después de la última pasada: se espera
+        # a la escritura en curso y se reintenta lo que quede pendiente
+        if self._conversation_flush:
+            await self._conversation_flush
+            self._conversation_flush = None
+        await self._write_conversations()
+
+    # ------------------------------------------------------------------------
+    # Datos no persistidos (store_data los desactiva)
+    # ------------------------------------------------------------------------
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
@@ -0,0 +1,134 @@
+# question_bank.py
+
+import asyncio
+import logging
+import random
+
+import repository
+from keyboards import build_question_keyboard
+from config import QUESTION_BANK_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+TIPOS_TAREA = ('individual', 'grupal')
+
+
+def group_key(pregunta_id: str) -> str:
+    """Identificador de grupo de una pregunta abierta ('G-3.2' -> 'G-3')."""
+    return pregunta_id.split('.')[0]
+
+
+class QuestionBank:
+    """
+    Banco de preguntas compartido por todo el proceso.
+
+    Se carga una sola vez desde MongoDB (y se puede recargar) y guarda las
+    preguntas ya clasificadas por `tipo_tarea`, incluyendo en cada tipo las
+    marcadas como 'ambos', y las abiertas agrupadas por su identificador de
+    grupo. Construir un cuestionario es entonces un muestreo en memoria sin
+    consultas a la base de datos.
+
+    Los documentos son compartidos entre usuarios: los handlers no deben
+    modificarlos.
+    """
+
+    def __init__(self):
+        self._multiple_choice = {tipo: [] for tipo in TIPOS_TAREA}
+        self._open_groups = {tipo: {} for tipo in TIPOS_TAREA}
+        self._by_id = {}
+        self._keyboards = {}
+        self._loaded = False
+        self._load_lock = None
+        self._refresh_task = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self):
+        multiple_choice = await repository.find_preguntas_seleccion_multiple()
+        open_questions = await repository.find_preguntas_abiertas()
+
+        multiple_choice_by_tipo = {tipo: [] for tipo in TIPOS_TAREA}
+        open_groups_by_tipo = {tipo: {} for tipo in TIPOS_TAREA}
+        by_id = {}
+        keyboards = {}
+
+        for question in multiple_choice:
+            question['tipo_pregunta'] = 'seleccion_multiple'
+            by_id[question['pregunta_id']] = question
+            keyboards[question['pregunta_id']] = build_question_keyboard(question)
+            for tipo in self._tipos_for(question):
+                multiple_choice_by_tipo[tipo].append(question)
+
+        for question in open_questions:
+            question['tipo_pregunta'] = 'abierta'
+            by_id[question['pregunta_id']] = question
+            key = group_key(question['pregunta_id'])
+            for tipo in self._tipos_for(question):
+                open_groups_by_tipo[tipo].setdefault(key, []).append(question)
+
+        # Sustitución atómica: los cuestionarios en curso conservan sus referencias
+        self._multiple_choice = multiple_choice_by_tipo
+        self._open_groups = open_groups_by_tipo
+        self._by_id = by_id
+        self._keyboards = keyboards
+        self._loaded = True
+
+        logger.info("Banco de preguntas cargado: %s de selección múltiple, %s abiertas", len(multiple_choice), len(open_questions))
+
+    async def ensure_loaded(self):
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    @staticmethod
+    def _tipos_for(question: dict):
+        tipo_tarea = question.get('tipo_tarea')
+        if tipo_tarea == 'ambos':
+            return TIPOS_TAREA
+        return (tipo_tarea,) if tipo_tarea in TIPOS_TAREA else ()
+
+    def get(self, pregunta_id: str):
+        return self._by_id.get(pregunta_id)
+
+    def keyboard(self, pregunta_id: str):
+        """Teclado ya construido de una pregunta de selección múltiple (None si no tiene opciones)."""
+        return self._keyboards.get(pregunta_id)
+
+    def sample_multiple_choice(self, tipo_tarea: str, size: int) -> list:
+        questions = self._multiple_choice[tipo_tarea]
+        return random.sample(questions, min(size, len(questions)))
+
+    def open_groups(self, tipo_tarea: str) -> dict:
+        """Grupos de preguntas abiertas del tipo de tarea: {clave_grupo: [preguntas]}."""
+        return self._open_groups[tipo_tarea]
+
+    def start_auto_refresh(self, interval: float = QUESTION_BANK_REFRESH_INTERVAL):
+        """Recarga el banco periódicamente. Un intervalo de 0 lo desactiva."""
+        if interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._auto_refresh(interval), name='question-bank-refresh')
+
+    async def stop_auto_refresh(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _auto_refresh(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("Error al recargar el banco de preguntas: %s", e)
+
+
+question_bank = QuestionBank()
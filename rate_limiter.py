@@ -0,0 +1,290 @@
+# rate_limiter.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+from config import (
+    RATE_LIMIT_GLOBAL_PER_SECOND,
+    RATE_LIMIT_CHAT_PER_SECOND,
+    RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_GROUP_PER_MINUTE,
+    RATE_LIMIT_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Prioridades (menor número, antes sale). Se indican por llamada con
+# rate_limit_args={'priority': PRIORITY_BULK}; por defecto es interactiva.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Métodos que no cuentan para los límites de envío de Telegram
+UNLIMITED_ENDPOINTS = frozenset({'getUpdates', 'setWebhook', 'deleteWebhook', 'getMe', 'answerCallbackQuery'})
+
+
+class _TokenBucket:
+    """Cubo de fichas: `rate` fichas por segundo con ráfagas de hasta `capacity`."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos hasta que haya una ficha disponible (0 si ya la hay)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """
+    Limitador de envíos a la API de Telegram con cola de prioridad.
+
+    Se instala con `Application.builder().rate_limiter(...)`, así que todas las
+    llamadas del bot pasan por `process_request`:
+
+    - Un cubo global (`overall_rate` llamadas por segundo) y uno por chat
+      (`chat_rate` por segundo con ráfagas de `chat_burst` en chats privados,
+      `group_rate` por minuto en grupos).
+    - Las peticiones que no pueden salir esperan en una cola ordenada por
+      prioridad y orden de llegada: las respuestas a los participantes pasan
+      por delante de los avisos masivos (`PRIORITY_BULK`).
+    - Ante un `RetryAfter` se detienen todos los envíos el tiempo indicado por
+      Telegram y se reintenta la petición hasta `max_retries` veces. El
+      reintento conserva su número de orden, así que vuelve a la cola delante
+      de las peticiones de su prioridad que llegaron después.
+    """
+
+    def __init__(self, overall_rate: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+                 chat_rate: float = RATE_LIMIT_CHAT_PER_SECOND,
+                 chat_burst: float = RATE_LIMIT_CHAT_BURST,
+                 group_rate: float = RATE_LIMIT_GROUP_PER_MINUTE,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.overall_rate = overall_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._global = None
+        self._chats = {}
+        self._paused_until = 0.0
+        self._wakeup = None
+        self._task = None
+
+        # Métricas
+        self.released = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def initialize(self):
+        # PTB inicializa el bot dos veces (Application y Updater)
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._global = _TokenBucket(self.overall_rate, self.overall_rate, loop.time())
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._dispatch(), name='rate-limiter')
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Dejar salir lo que quede en cola para no bloquear el apagado
+        for *_, future in self._queue:
+            if not future.done():
+                future.set_result(None)
+        self._queue.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = PRIORITY_INTERACTIVE
+        if isinstance(rate_limit_args, dict):
+            priority = rate_limit_args.get('priority', PRIORITY_INTERACTIVE)
+
+        attempt = 0
+        sequence = None
+        while True:
+            if endpoint not in UNLIMITED_ENDPOINTS:
+                sequence = await self._acquire(priority, data.get('chat_id'), sequence)
+            start = time.perf_counter()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                metrics.TELEGRAM_ERRORS.inc(endpoint=endpoint)
+                retry_after = e.retry_after
+                if hasattr(retry_after, 'total_seconds'):
+                    retry_after = retry_after.total_seconds()
+                self._pause(float(retry_after))
+                self.retries += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning("Límite de Telegram alcanzado en %s; reintento %s en %s s", endpoint, attempt, retry_after)
+            except Exception:
+                metrics.TELEGRAM_ERRORS.inc(endpoint=endpoint)
+                raise
+            finally:
+                metrics.TELEGRAM_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+
+    # ------------------------------------------------------------------------
+    # Cola
+    # ------------------------------------------------------------------------
+
+    async def _acquire(self, priority: int, chat_id, sequence: int = None) -> int:
+        """Espera turno en la cola. Devuelve el número de orden, que un reintento vuelve a pasar."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if sequence is None:
+            sequence = next(self._sequence)
+        heapq.heappush(self._queue, (priority, sequence, loop.time(), chat_id, future))
+        self._wakeup.set()
+        await future
+        return sequence
+
+    def _pause(self, seconds: float):
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id, now: float):
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = _TokenBucket(self.group_rate / 60, self.group_rate, now)
+            else:
+                bucket = _TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _release_ready(self, now: float):
+        """Libera las peticiones que pueden salir; devuelve cuánto esperar a la siguiente (None si no hay)."""
+        if not self._queue:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        delay = None
+        waiting = []
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            priority, _, enqueued, chat_id, future = item
+            if future.done():
+                continue
+
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                waiting.append(item)
+                delay = global_wait if delay is None else min(delay, global_wait)
+                break
+
+            bucket = self._chat_bucket(chat_id, now)
+            chat_wait = bucket.wait_time(now) if bucket else 0.0
+            if chat_wait > 0:
+                waiting.append(item)
+                delay = chat_wait if delay is None else min(delay, chat_wait)
+                continue
+
+            self._global.consume(now)
+            if bucket:
+                bucket.consume(now)
+            future.set_result(None)
+
+            wait = now - enqueued
+            metrics.TELEGRAM_QUEUE_WAIT.observe(wait, priority=priority)
+            self.released += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        for item in waiting:
+            heapq.heappush(self._queue, item)
+        return delay
+
+    def _prune_chats(self, now: float):
+        queued = {item[3] for item in self._queue}
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items() if chat_id not in queued and bucket.full(now)]:
+            del self._chats[chat_id]
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        last_prune = loop.time()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            delay = self._release_ready(now)
+
+            # Los cubos llenos de chats sin peticiones no aportan nada
+            if now - last_prune > 60:
+                self._prune_chats(now)
+                last_prune = now
+
+            if delay is None:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ------------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------------
+
+    def _pending(self) -> list:
+        # La cola conserva las peticiones canceladas hasta que _release_ready las descarta
+        return [item for item in self._queue if not item[4].done()]
+
+    def queue_depth(self) -> int:
+        return len(self._pending())
+
+    def stats(self) -> dict:
+        pending = self._pending()
+        by_priority = {}
+        for item in pending:
+            by_priority[item[0]] = by_priority.get(item[0], 0) + 1
+        loop_time = asyncio.get_running_loop().time()
+        return {
+            'en_cola': len(pending),
+            'en_cola_por_prioridad': by_priority,
+            'enviadas': self.released,
+            'reintentos': self.retries,
+            'espera_media': self.total_wait / self.released if self.released else 0.0,
+            'espera_maxima': self.max_wait,
+            'pausa_restante': max(0.0, self._paused_until - loop_time),
+        }
+
+
+rate_limiter = PriorityRateLimiter()
+
+metrics.Gauge('telegram_queue_depth', 'Peticiones a la API de Telegram esperando en la cola', rate_limiter.queue_depth)
@@ -0,0 +1,267 @@
+# registration_form.py
+
+import re
+from datetime import datetime
+
+# ============================================================================
+# DEFINICIÓN DECLARATIVA DEL FORMULARIO DE REGISTRO
+# ============================================================================
+#
+# Cada paso describe una pregunta: el texto, el tipo de entrada ('choice' con
+# botones o 'text' con un mensaje libre), la clave de user_data donde se guarda
+# la respuesta, el validador y el paso siguiente. `handlers/registration.py`
+# recorre esta tabla para los flujos individual y de grupo, así que añadir o
+# cambiar una pregunta solo requiere tocar este fichero.
+
+EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+
+
+class Option:
+    """Botón de un paso de selección. `value=None` pide la respuesta por texto en `next`."""
+
+    __slots__ = ('id', 'label', 'value', 'next')
+
+    def __init__(self, id: str, label: str, value=None, next: str = None):
+        self.id = id
+        self.label = label
+        self.value = value
+        self.next = next
+
+
+class Step:
+    """
+    Paso del formulario.
+
+    - `key`: clave de user_data; en los flujos de grupo se guarda como
+      `<key>_participante_<n>`.
+    - `validator`: solo en pasos de texto; devuelve el valor a guardar o lanza
+      ValueError con el mensaje que se muestra al participante.
+    - `next`: nombre del paso siguiente (None termina el participante). Una
+      opción puede indicar su propio `next` para ramificar el flujo.
+    - `confirmation`: mensaje tras guardar la respuesta (`{value}`).
+    """
+
+    __slots__ = ('name', 'question', 'kind', 'key', 'options', 'validator', 'next', 'confirmation', 'options_by_id')
+
+    def __init__(self, name: str, question: str, key: str = None, options=None, validator=None,
+                 next: str = None, confirmation: str = None):
+        self.name = name
+        self.question = question
+        self.kind = 'choice' if options else 'text'
+        self.key = key
+        self.options = tuple(options or ())
+        self.validator = validator
+        self.next = next
+        if confirmation is None and self.kind == 'choice':
+            confirmation = "\U00002705 Has seleccionado: {value}."
+        self.confirmation = confirmation
+        self.options_by_id = {option.id: option for option in self.options}
+
+
+class Flow:
+    """Flujo de registro: número de participantes y textos propios de ese flujo."""
+
+    __slots__ = ('name', 'participants', 'questions')
+
+    def __init__(self, name: str, participants: int, questions: dict = None):
+        self.name = name
+        self.participants = participants
+        self.questions = questions or {}
+
+
+# ============================================================================
+# VALIDADORES
+# ============================================================================
+
+def free_text(text: str) -> str:
+    return text
+
+
+def validate_email(text: str) -> str:
+    if not EMAIL_REGEX.match(text):
+        raise ValueError("El correo electrónico proporcionado no es válido. Por favor, ingresa un correo electrónico válido:")
+    return text
+
+
+def validate_birth_year(text: str) -> int:
+    try:
+        anio_nacimiento = int(text)
+    except ValueError:
+        raise ValueError("\U0001F4A1 Por favor, introduce un año válido (solo números).")
+    age = datetime.now().year - anio_nacimiento
+    if age < 18 or age > 120:
+        raise ValueError("\U000026A0 La edad debe estar entre 18 y 120 años. Por favor, introduce un año válido.")
+    return anio_nacimiento
+
+
+def validate_degree(text: str) -> str:
+    grado_tipo = text.strip()
+    if len(grado_tipo) < 2:
+        raise ValueError("Por favor, escribe el nombre completo del grado.")
+    return grado_tipo
+
+
+# ============================================================================
+# PASOS
+# ============================================================================
+
+def _location_steps(context_type: str, messages: dict, next_step: str) -> list:
+    """País → provincia → municipio para nacimiento, crianza o residencia."""
+    return [
+        Step(
+            f'pais_{context_type}', messages['country_question'], key=f'pais_{context_type}',
+            options=[
+                Option('espana', "\U0001F1EA\U0001F1F8 España", 'España', next=f'provincia_{context_type}'),
+                Option('otro_pais', "\U0001F310 Otro", next=f'pais_{context_type}_otro'),
+            ],
+        ),
+        Step(
+            f'pais_{context_type}_otro', "\U00002753 Por favor, escribe el nombre de tu país:",
+            key=f'pais_{context_type}', validator=free_text, next=f'provincia_{context_type}_otra',
+        ),
+        Step(
+            f'provincia_{context_type}', messages['province_question'], key=f'provincia_{context_type}',
+            options=[
+                Option('tenerife', "Santa Cruz de Tenerife", 'Santa Cruz de Tenerife'),
+                Option('las_palmas', "Las Palmas", 'Las Palmas'),
+                Option('otra_provincia', "Otra", next=f'provincia_{context_type}_otra'),
+            ],
+            next=f'municipio_{context_type}',
+        ),
+        Step(
+            f'provincia_{context_type}_otra', "\U00002753 Por favor, escribe el nombre de tu provincia:",
+            key=f'provincia_{context_type}', validator=free_text, next=f'municipio_{context_type}',
+        ),
+        Step(
+            f'municipio_{context_type}', messages['municipio_question'],
+            key=f'municipio_{context_type}', validator=free_text, next=next_step,
+        ),
+    ]
+
+
+_STEPS = [
+    Step(
+        'papel', "\U0001F4D1 Por favor, selecciona cuál es tu papel en esta investigación:", key='papel',
+        options=[
+            Option('papel_estudiante', "\U0001F393 Estudiante", 'Estudiante'),
+            Option('papel_profesor', "\U0001F3EB Profesor", 'Docente'),
+            Option('papel_investigador', "\U0001F52C Investigador", 'Investigador(a)'),
+            Option('papel_otro', "\U0001F464 Otro", next='otro_papel'),
+        ],
+        next='email',
+    ),
+    Step('otro_papel', "\U00002753 Por favor, especifica tu papel:", key='papel', validator=free_text, next='email'),
+    Step('email', "\U0001F4E7 Por favor, proporciona tu correo electrónico:", key='email', validator=validate_email, next='nombre'),
+    Step('nombre', "\U0001F464 ¿Cuál es tu nombre?", key='nombre', validator=free_text, next='anio_nacimiento'),
+    Step('anio_nacimiento', "\U0001F4C5 ¿En qué año naciste?", key='anio_nacimiento', validator=validate_birth_year, next='genero'),
+    Step(
+        'genero', "\U0001F3C3 ¿Cuál es tu género?", key='genero',
+        options=[
+            Option('genero_masculino', "\U0001F468\u200D\U0001F393 Masculino", 'Masculino'),
+            Option('genero_femenino', "\U0001F469\u200D\U0001F393 Femenino", 'Femenino'),
+            Option('genero_otro', "\U0001F9D1 Otro", 'Otro'),
+            Option('genero_prefiero_no_decirlo', "\U0001F636 Prefiero no decirlo", 'Prefiero no decirlo'),
+        ],
+        next='nivel_educativo',
+    ),
+    Step(
+        'nivel_educativo', "\U0001F4DA ¿Cuál es tu nivel educativo?", key='nivel_educativo',
+        options=[
+            Option('nivel_grado', "\U0001F393 Grado", 'Grado', next='grado_anio'),
+            Option('nivel_maestria', "\U0001F3EB Máster", 'Máster', next='universidad'),
+            Option('nivel_doctorado', "\U0001F52C Doctorado", 'Doctorado', next='universidad'),
+            Option('nivel_otro', "\U0001F9D1 Otro", next='otro_nivel_educativo'),
+        ],
+    ),
+    Step(
+        'otro_nivel_educativo', "Por favor, especifica tu nivel educativo:",
+        key='nivel_educativo', validator=free_text, next='pais_nacimiento',
+    ),
+    Step(
+        'grado_anio', "¿En qué año de Grado estás?", key='grado_anio',
+        options=[
+            Option('grado_1', "1", '1'),
+            Option('grado_2', "2", '2'),
+            Option('grado_3', "3", '3'),
+            Option('grado_4', "4", '4'),
+            Option('grado_terminado', "Terminado", 'terminado'),
+        ],
+        next='grado_tipo',
+        confirmation="\U00002705 Has seleccionado el año: {value}.",
+    ),
+    Step(
+        'grado_tipo', "\U0001F393 ¿Qué grado estudias o estudiaste? (ej: Ingeniería Informática, Psicología, etc.)",
+        key='grado_tipo', validator=validate_degree, next='universidad',
+        confirmation="\U00002705 Grado registrado: {value}",
+    ),
+    Step(
+        'universidad', "\U0001F3EB ¿A qué universidad perteneces?", key='universidad',
+        options=[
+            Option('ull', "Universidad de La Laguna \U0001F3DD\U0000FE0F", 'Universidad de La Laguna'),
+            Option('ulpgc', "Universidad de Las Palmas Gran Canaria \U0001F3DD\U0000FE0F", 'Universidad de Las Palmas Gran Canaria'),
+            Option('otra_universidad', "Otra \U0001F30D", next='otra_universidad'),
+        ],
+        next='pais_nacimiento',
+    ),
+    Step(
+        'otra_universidad', "\U00002753 Por favor, escribe el nombre de tu universidad:",
+        key='universidad', validator=free_text, next='pais_nacimiento',
+    ),
+    *_location_steps('nacimiento', {
+        'country_question': '\U0001F30D ¿En qué país naciste?',
+        'province_question': '\U0001F4CD ¿En qué provincia naciste?',
+        'municipio_question': '\U0001F3E0 ¿En qué municipio naciste?'
+    }, next_step='pais_crianza'),
+    *_location_steps('crianza', {
+        'country_question': '\U0001F30E ¿En qué país creciste?',
+        'province_question': '\U0001F4CD ¿En qué provincia creciste?',
+        'municipio_question': '\U0001F3E1 ¿En qué municipio creciste?'
+    }, next_step='pais_residencia'),
+    *_location_steps('residencia', {
+        'country_question': '\U0001F30F ¿En qué país vives actualmente?',
+        'province_question': '\U0001F4CD ¿En qué provincia vives actualmente?',
+        'municipio_question': '\U0001F3E1 ¿En qué municipio vives actualmente?'
+    }, next_step='tiempo_residencia'),
+    Step(
+        'tiempo_residencia', "\U0001F4C5 ¿Cuánto tiempo llevas viviendo en tu lugar de residencia actual?", key='tiempo_residencia',
+        options=[
+            Option('toda_la_vida', "\U0001F4A1 Toda la vida", 'Toda la vida'),
+            Option('mas_de_5', "\U0001F553 Más de 5 años", 'Más de 5 años'),
+            Option('entre_3_y_5', "\U0001F551 Entre 3 y 5 años", 'Entre 3 y 5 años'),
+            Option('entre_1_y_3', "\U0001F550 Entre 1 y 3 años", 'Entre 1 y 3 años'),
+            Option('menos_de_1', "\U0001F55C Menos de un año", 'Menos de un año'),
+        ],
+    ),
+]
+
+STEPS = {step.name: step for step in _STEPS}
+FIRST_STEP = 'papel'
+
+# Campos de cada participante en el documento que se guarda en MongoDB
+PARTICIPANT_FIELDS = (
+    'papel', 'email', 'nombre', 'anio_nacimiento', 'genero', 'nivel_educativo', 'universidad',
+    'grado_anio', 'grado_tipo',
+    'pais_nacimiento', 'provincia_nacimiento', 'municipio_nacimiento',
+    'pais_crianza', 'provincia_crianza', 'municipio_crianza',
+    'pais_residencia', 'provincia_residencia', 'municipio_residencia',
+    'tiempo_residencia',
+)
+
+FLOWS = {
+    'individual': Flow('individual', participants=1),
+    'grupal': Flow('grupal', participants=2, questions={
+        'papel': "Participante {participante}, por favor, selecciona tu papel:",
+    }),
+}
+
+
+def _check_steps():
+    """Comprueba al importar que todos los `next` apuntan a pasos existentes."""
+    for step in _STEPS:
+        targets = [step.next] + [option.next for option in step.options]
+        for target in targets:
+            if target is not None and target not in STEPS:
+                raise ValueError(f"El paso '{step.name}' apunta a un paso inexistente: '{target}'")
+
+
+_check_steps()
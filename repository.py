@@ -0,0 +1,139 @@
+# repository.py
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import metrics
+
+import database
+import indexes
+from config import MONGO_MAX_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# pymongo es síncrono: cada operación se ejecuta en un hilo del pool para que
+# el bucle de eventos de PTB nunca se bloquee esperando a MongoDB. El número de
+# hilos coincide con el tamaño del pool de conexiones de MongoClient.
+_executor = ThreadPoolExecutor(max_workers=MONGO_MAX_POOL_SIZE, thread_name_prefix='mongo')
+
+
+async def _run(func, *args, **kwargs):
+    """Ejecuta una llamada bloqueante de pymongo fuera del bucle de eventos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+def _collection(name: str):
+    return database.collection(name)
+
+
+def _timed(func):
+    """Registra la latencia de la operación (incluida la espera en el pool) en las métricas."""
+    return metrics.timed(metrics.MONGO_LATENCY, metrics.MONGO_ERRORS, operation=func.__name__)(func)
+
+
+# ============================================================================
+# ESCRITURAS
+# ============================================================================
+
+@_timed
+async def save_tarea(document: dict):
+    return await _run(_collection(database.TAREAS).insert_one, document)
+
+@_timed
+async def save_consentimiento(document: dict):
+    return await _run(_collection(database.CONSENTIMIENTOS).insert_one, document)
+
+@_timed
+async def save_participante(document: dict):
+    return await _run(_collection(database.PARTICIPANTES).insert_one, document)
+
+@_timed
+async def save_pareja(document: dict):
+    return await _run(_collection(database.PARTICIPANTES_PAREJA).insert_one, document)
+
+@_timed
+async def save_respuesta(document: dict):
+    return await _run(_collection(database.RESPUESTAS).insert_one, document)
+
+@_timed
+async def save_respuestas(documents: list, ordered: bool = True):
+    return await _run(_collection(database.RESPUESTAS).insert_many, documents, ordered=ordered)
+
+
+# ============================================================================
+# LECTURAS
+# ============================================================================
+
+@_timed
+async def find_textos_consentimientos() -> list:
+    def _find():
+        return list(_collection(database.TEXTOS_CONSENTIMIENTOS).find({}, {"_id": 0, "version": 1, "texto_consentimiento": 1}))
+    return await _run(_find)
+
+@_timed
+async def find_preguntas_seleccion_multiple() -> list:
+    def _find():
+        return list(_collection(database.PREGUNTAS_SELECCION_MULTIPLE).find())
+    return await _run(_find)
+
+@_timed
+async def find_preguntas_abiertas() -> list:
+    def _find():
+        return list(_collection(database.PREGUNTAS_ABIERTAS).find())
+    return await _run(_find)
+
+
+# ============================================================================
+# PERSISTENCIA DE CONVERSACIONES
+# ============================================================================
+
+@_timed
+async def find_datos_usuario(user_id: int):
+    document = await _run(_collection(database.DATOS_USUARIO).find_one, {"_id": user_id})
+    return document.get('user_data', {}) if document else None
+
+@_timed
+async def update_datos_usuario(user_id: int, changed: dict, removed: list):
+    """Actualiza solo las claves de user_data que han cambiado."""
+    update = {}
+    if changed:
+        update["$set"] = {f"user_data.{key}": value for key, value in changed.items()}
+    if removed:
+        update["$unset"] = {f"user_data.{key}": "" for key in removed}
+    if update:
+        await _run(_collection(database.DATOS_USUARIO).update_one, {"_id": user_id}, update, upsert=True)
+
+@_timed
+async def delete_datos_usuario(user_id: int):
+    await _run(_collection(database.DATOS_USUARIO).delete_one, {"_id": user_id})
+
+@_timed
+async def find_estados_conversacion(name: str) -> list:
+    def _find():
+        return list(_collection(database.ESTADOS_CONVERSACION).find({"name": name}, {"_id": 0, "key": 1, "state": 1}))
+    return await _run(_find)
+
+@_timed
+async def save_estados_conversacion(operations: list):
+    if operations:
+        await _run(_collection(database.ESTADOS_CONVERSACION).bulk_write, operations, ordered=True)
+
+
+# ============================================================================
+# ÍNDICES
+# ============================================================================
+
+@_timed
+async def ensure_indexes() -> list:
+    """Crea los índices declarados en indexes.py que falten."""
+    return await _run(indexes.ensure_indexes)
+
+
+def shutdown():
+    """Espera a que terminen las operaciones pendientes, libera los hilos y cierra el cliente."""
+    _executor.shutdown(wait=True)
+    database.close()
+    logger.info("Pool de operaciones de MongoDB cerrado")
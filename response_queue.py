@@ -0,0 +1,212 @@
+# response_queue.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+import repository
+from config import RESPUESTAS_BATCH_SIZE, RESPUESTAS_FLUSH_INTERVAL, RESPUESTAS_SPILL_PATH
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def stamp_inserted(documents: list):
+    inserted = datetime.utcnow()
+    for document in documents:
+        document['fecha_insercion'] = inserted
+
+
+class ResponseQueue:
+    """
+    Cola de escritura diferida para la colección 'respuestas'.
+
+    Los handlers encolan documentos sin esperar a MongoDB; una tarea en segundo
+    plano los agrupa en lotes ordenados de `insert_many` que se vacían al
+    alcanzar `batch_size` documentos o cada `flush_interval` segundos. Si MongoDB
+    no está disponible, los lotes se guardan en `spill_path` (JSONL extendido de
+    BSON) y se reintentan en el siguiente vaciado o al reiniciar el bot.
+
+    Quien necesite saber cuándo un documento ya no se puede perder (p. ej. para
+    borrar el trabajo de audio del que procede) pasa `on_saved` a `enqueue`: se
+    llama, en un hilo del pool, cuando el documento está en MongoDB o en
+    `spill_path`.
+
+    Cada documento lleva en `fecha_insercion` el momento en que se escribió en
+    MongoDB (se vuelve a fijar al reenviar el desbordamiento): las
+    exportaciones incrementales avanzan por ese campo, no por la fecha de la
+    respuesta, para no saltarse las que llegan con retraso.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, spill_path: str):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._buffer = []
+        self._on_saved = {}
+        self._wakeup = None
+        self._lock = None
+        self._task = None
+        self._closing = False
+
+    def enqueue(self, document: dict, on_saved=None):
+        """Añade un documento a la cola. No bloquea ni realiza E/S."""
+        self._buffer.append(document)
+        if on_saved:
+            # El documento sigue en el buffer (o en el lote) hasta que se llama,
+            # así que su id() no se reutiliza mientras tanto
+            self._on_saved[id(document)] = on_saved
+        if len(self._buffer) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    async def start(self):
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._run(), name='respuestas-write-behind')
+
+    async def stop(self):
+        """Detiene la tarea de fondo y vacía todo lo pendiente antes de salir."""
+        self._closing = True
+        if self._task:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Un error inesperado no debe parar la tarea: las respuestas
+                # siguientes se quedarían en el buffer hasta el cierre
+                logger.exception("Error al vaciar la cola de respuestas")
+
+    async def flush(self):
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                if not await self._write(batch):
+                    # MongoDB no responde: pasar a disco todo lo pendiente
+                    pending, self._buffer = self._buffer, []
+                    if pending:
+                        await self._spill(pending)
+                    # Lo que no se insertó ya está en spill_path
+                    await self._saved(batch + pending)
+                    return
+                await self._saved(batch)
+            await self._replay_spill()
+
+    async def _saved(self, documents: list):
+        callbacks = [self._on_saved.pop(id(document)) for document in documents if id(document) in self._on_saved]
+        if callbacks:
+            await asyncio.get_running_loop().run_in_executor(None, self._run_callbacks, callbacks)
+
+    @staticmethod
+    def _run_callbacks(callbacks: list):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Error al confirmar una respuesta guardada")
+
+    async def _write(self, batch: list) -> bool:
+        # pymongo y bson se importan al usarlos para que importar este módulo
+        # (y los handlers que lo usan) no los cargue
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        stamp_inserted(batch)
+        while batch:
+            try:
+                await repository.save_respuestas(batch, ordered=True)
+                return True
+            except BulkWriteError as e:
+                # Con ordered=True los primeros nInserted documentos ya están guardados
+                # y el error es del siguiente
+                inserted = e.details.get('nInserted', 0)
+                errors = e.details.get('writeErrors', [])
+                if errors and errors[0].get('code') == DUPLICATE_KEY_ERROR:
+                    # Ya estaba guardada (p. ej. un audio cuyo trabajo se repitió
+                    # tras un reinicio): cuenta como guardada y se sigue con el resto
+                    logger.warning("Respuesta %s ya guardada, se omite", batch[inserted].get('respuesta_id'))
+                    batch = batch[inserted + 1:]
+                    continue
+                logger.error("Error parcial al guardar respuestas (%s/%s insertadas): %s", inserted, len(batch), e)
+                await self._spill(batch[inserted:])
+                return False
+            except PyMongoError as e:
+                logger.error("MongoDB no disponible, guardando %s respuestas en disco: %s", len(batch), e)
+                await self._spill(batch)
+                return False
+            except Exception:
+                # Errores que no son de MongoDB (p. ej. un documento que no se
+                # puede codificar en BSON): el lote se guarda en disco igualmente
+                logger.exception("Error inesperado al guardar %s respuestas, se guardan en disco", len(batch))
+                await self._spill(batch)
+                return False
+        return True
+
+    async def _spill(self, documents: list):
+        from bson import json_util
+
+        def _append():
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for document in documents:
+                    try:
+                        line = json_util.dumps(document)
+                    except Exception:
+                        # Un documento que no se puede serializar no impide guardar el resto
+                        logger.exception("No se pudo guardar en disco la respuesta %s: %r",
+                                         document.get('respuesta_id'), document)
+                        continue
+                    f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+        await asyncio.get_running_loop().run_in_executor(None, _append)
+
+    async def _replay_spill(self):
+        if not os.path.exists(self.spill_path):
+            return
+
+        from bson import json_util
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        def _read():
+            with open(self.spill_path, encoding='utf-8') as f:
+                return [json_util.loads(line) for line in f if line.strip()]
+
+        loop = asyncio.get_running_loop()
+        documents = await loop.run_in_executor(None, _read)
+        if documents:
+            stamp_inserted(documents)
+            try:
+                # Sin orden para que los duplicados (ya insertados antes del fallo)
+                # no impidan guardar el resto
+                await repository.save_respuestas(documents, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                    logger.error("No se pudieron reenviar las respuestas guardadas en disco: %s", e)
+                    return
+            except PyMongoError as e:
+                logger.warning("MongoDB sigue sin estar disponible, se reintentará más tarde: %s", e)
+                return
+            logger.info("Reenviadas %s respuestas guardadas en disco", len(documents))
+        await loop.run_in_executor(None, os.remove, self.spill_path)
+
+
+respuestas_queue = ResponseQueue(RESPUESTAS_BATCH_SIZE, RESPUESTAS_FLUSH_INTERVAL, RESPUESTAS_SPILL_PATH)
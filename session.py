@@ -0,0 +1,87 @@
+# session.py
+
+from question_bank import question_bank
+
+SESSION_KEY = 'cuestionario'
+
+
+class QuestionnaireSession:
+    """
+    Estado compacto del cuestionario de un participante.
+
+    Solo guarda los `pregunta_id` seleccionados (las mismas cadenas que usa el
+    banco de preguntas, sin copiarlas), la posición actual y si se espera la
+    decisión tras un audio. Los documentos completos se consultan en el banco
+    compartido cuando hacen falta, así que cada sesión ocupa unos cientos de
+    bytes en lugar de decenas de documentos de MongoDB.
+    """
+
+    __slots__ = ('question_ids', 'index', 'waiting_for_decision')
+
+    def __init__(self, question_ids, index: int = 0, waiting_for_decision: bool = False):
+        self.question_ids = tuple(question_ids)
+        self.index = index
+        self.waiting_for_decision = waiting_for_decision
+
+    @classmethod
+    def from_questions(cls, questions: list):
+        return cls(question['pregunta_id'] for question in questions)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def __eq__(self, other):
+        if not isinstance(other, QuestionnaireSession):
+            return NotImplemented
+        return (self.question_ids, self.index, self.waiting_for_decision) == \
+            (other.question_ids, other.index, other.waiting_for_decision)
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.question_ids)
+
+    @property
+    def current_question_id(self):
+        return None if self.finished else self.question_ids[self.index]
+
+    def current_question(self):
+        """Documento de la pregunta actual según el banco de preguntas."""
+        pregunta_id = self.current_question_id
+        return question_bank.get(pregunta_id) if pregunta_id else None
+
+    def advance(self):
+        self.index += 1
+        self.waiting_for_decision = False
+
+    # ------------------------------------------------------------------------
+    # Serialización para la persistencia
+    # ------------------------------------------------------------------------
+
+    def to_document(self) -> dict:
+        return {
+            '_tipo': 'QuestionnaireSession',
+            'question_ids': list(self.question_ids),
+            'index': self.index,
+            'waiting_for_decision': self.waiting_for_decision,
+        }
+
+    @classmethod
+    def from_document(cls, document: dict):
+        return cls(document['question_ids'], document['index'], document['waiting_for_decision'])
+
+
+def get_session(context):
+    """Sesión de cuestionario del usuario o None si no ha empezado."""
+    return context.user_data.get(SESSION_KEY)
+
+
+def encode_user_value(value):
+    if isinstance(value, QuestionnaireSession):
+        return value.to_document()
+    return value
+
+
+def decode_user_value(value):
+    if isinstance(value, dict) and value.get('_tipo') == 'QuestionnaireSession':
+        return QuestionnaireSession.from_document(value)
+    return value
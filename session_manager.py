@@ -0,0 +1,168 @@
+# session_manager.py
+
+import asyncio
+import logging
+import sys
+import time
+
+from config import SESSION_TTL, SESSION_SWEEP_INTERVAL, SESSION_CHECKPOINT_ON_EVICT, SESSION_EVICTION_HINT
+from session import SESSION_KEY
+from rate_limiter import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+EVICTION_HINT = (
+    "\U0001F4BE Hemos guardado tu progreso. Cuando quieras continuar, "
+    "responde a la última pregunta y seguiremos donde lo dejaste."
+)
+
+
+def deep_sizeof(value, seen=None) -> int:
+    """Tamaño aproximado en bytes de un objeto y de todo lo que contiene."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in value)
+    elif hasattr(value, '__slots__'):
+        size += sum(deep_sizeof(getattr(value, slot), seen) for slot in value.__slots__ if hasattr(value, slot))
+    return size
+
+
+class SessionManager:
+    """
+    Ciclo de vida de las sesiones (`user_data`) en memoria.
+
+    `touch` se registra como TypeHandler en el grupo -2 y anota la última
+    actividad de cada usuario. Cada `sweep_interval` segundos se expulsan de
+    memoria las sesiones con más de `ttl` segundos de inactividad: si
+    `checkpoint` está activo se escriben antes en la persistencia, se vacía su
+    `user_data` y se avisa al participante de que puede continuar más tarde.
+    Como el estado de la conversación se conserva, al volver `MongoPersistence`
+    recarga sus datos y sigue en el mismo paso.
+    """
+
+    def __init__(self, ttl: float, sweep_interval: float, checkpoint: bool, send_hint: bool):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.checkpoint = checkpoint
+        self.send_hint = send_hint
+        # user_id -> (última actividad, chat_id)
+        self._last_seen = {}
+        self._evicted_total = 0
+        self._application = None
+        self._persistence = None
+        self._task = None
+
+    async def touch(self, update, context):
+        user = update.effective_user
+        if user is None:
+            return
+        chat = update.effective_chat
+        self._last_seen[user.id] = (time.monotonic(), chat.id if chat else user.id)
+
+    def start(self, application, persistence):
+        self._application = application
+        self._persistence = persistence
+        if self.ttl > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name='session-eviction')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    stats = self.stats()
+                    logger.info("Expulsadas %s sesiones inactivas; en memoria: %s sesiones, %s bytes", evicted, stats['sesiones'], stats['bytes'])
+            except Exception as e:
+                logger.error("Error al expulsar sesiones inactivas: %s", e)
+
+    def _is_idle(self, user_id: int) -> bool:
+        entry = self._last_seen.get(user_id)
+        return entry is not None and time.monotonic() - entry[0] > self.ttl
+
+    async def evict_idle(self) -> int:
+        now = time.monotonic()
+        idle = [
+            (user_id, chat_id)
+            for user_id, (last_seen, chat_id) in self._last_seen.items()
+            if now - last_seen > self.ttl
+        ]
+        evicted = 0
+        for user_id, chat_id in idle:
+            if await self._evict(user_id, chat_id):
+                evicted += 1
+        return evicted
+
+    async def _evict(self, user_id: int, chat_id: int) -> bool:
+        user_data = self._application.user_data.get(user_id)
+        if not user_data:
+            self._last_seen.pop(user_id, None)
+            return False
+
+        if self.checkpoint and self._persistence:
+            try:
+                await self._persistence.update_user_data(user_id, user_data)
+            except Exception as e:
+                # Sin copia en MongoDB no se libera la sesión; se reintenta en el siguiente barrido
+                logger.error("No se pudo guardar la sesión del usuario %s antes de expulsarla: %s", user_id, e)
+                return False
+
+            # El usuario ha podido escribir mientras se guardaba la sesión: en ese
+            # caso se conserva. Desde aquí no hay más awaits hasta vaciarla.
+            if not self._is_idle(user_id):
+                return False
+
+        session = user_data.get(SESSION_KEY)
+        in_progress = session is None or not session.finished
+
+        # Se vacía el dict en lugar de borrarlo: Application lo expone como solo lectura
+        user_data.clear()
+        if self._persistence:
+            self._persistence.forget_user(user_id)
+        self._last_seen.pop(user_id, None)
+        self._evicted_total += 1
+
+        if self.send_hint and in_progress:
+            try:
+                await self._application.bot.send_message(
+                    chat_id=chat_id, text=EVICTION_HINT, rate_limit_args={'priority': PRIORITY_BULK}
+                )
+            except Exception as e:
+                logger.warning("No se pudo enviar el aviso de sesión guardada al usuario %s: %s", user_id, e)
+        return True
+
+    def stats(self) -> dict:
+        """
+        Sesiones con datos en memoria y su tamaño aproximado. `bytes` suma las
+        sesiones y las copias que guarda la persistencia para calcular las
+        diferencias (de un tamaño parecido), que también se dan por separado.
+        """
+        sessions = {user_id: data for user_id, data in self._application.user_data.items() if data} if self._application else {}
+        session_bytes = sum(deep_sizeof(data) for data in sessions.values())
+        persistence_bytes = deep_sizeof(self._persistence.cached_user_data()) if self._persistence else 0
+        return {
+            'sesiones': len(sessions),
+            'bytes': session_bytes + persistence_bytes,
+            'bytes_sesiones': session_bytes,
+            'bytes_persistencia': persistence_bytes,
+            'expulsadas': self._evicted_total,
+        }
+
+session_manager = SessionManager(SESSION_TTL, SESSION_SWEEP_INTERVAL, SESSION_CHECKPOINT_ON_EVICT, SESSION_EVICTION_HINT)
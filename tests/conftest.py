@@ -0,0 +1,30 @@
+# tests/conftest.py
+#
+# Los módulos del bot leen la configuración al importarse, así que el entorno
+# del bot offline (directorios temporales, métricas desactivadas...) se
+# prepara aquí, antes de que pytest importe ningún módulo de prueba.
+
+import shutil
+import tempfile
+
+import pytest
+
+from offline_bot import FakeDatabase, configure_environment
+
+WORKDIR = tempfile.mkdtemp(prefix='hablacanaria-test-')
+configure_environment(WORKDIR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def fake_db():
+    """Colecciones en memoria de offline_bot.py instaladas como base de datos del bot."""
+    import database
+
+    db = FakeDatabase()
+    database.init(db=db)
+    yield db
+    database.close()
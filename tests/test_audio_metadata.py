@@ -0,0 +1,82 @@
+# tests/test_audio_metadata.py
+
+import struct
+
+import pytest
+
+from audio_metadata import (CAPTURE_PATTERN, NO_GRANULE, OPUS_HEAD, OggError, PAGE_HEADER, extract_metadata,
+                            read_opus_metadata)
+
+SERIAL = 1234
+
+
+def ogg_page(body: bytes, granule: int, sequence: int, serial: int = SERIAL) -> bytes:
+    """Página Ogg con un solo paquete (sin CRC: el analizador no lo comprueba)."""
+    lacing = bytes([255] * (len(body) // 255) + [len(body) % 255])
+    header = PAGE_HEADER.pack(CAPTURE_PATTERN, 0, 0, granule, serial, sequence, 0, len(lacing))
+    return header + lacing + body
+
+
+def opus_file(seconds: float, pre_skip: int = 312, pages: int = 3) -> bytes:
+    head = OPUS_HEAD + struct.pack('<BBHI', 1, 1, pre_skip, 16000) + b'\0\0\0'
+    data = ogg_page(head, 0, 0) + ogg_page(b'OpusTags' + bytes(8), 0, 1)
+    end = pre_skip + int(seconds * 48000)
+    for n in range(1, pages + 1):
+        data += ogg_page(bytes(100), end * n // pages, n + 1)
+    return data
+
+
+@pytest.fixture
+def write(tmp_path):
+    def _write(content: bytes) -> str:
+        path = tmp_path / 'nota.ogg'
+        path.write_bytes(content)
+        return str(path)
+    return _write
+
+
+def test_reads_duration_and_header(write):
+    metadata = read_opus_metadata(write(opus_file(2.5)))
+
+    assert metadata['duracion'] == 2.5
+    assert metadata['canales'] == 1 and metadata['preskip'] == 312
+    assert metadata['frecuencia_original'] == 16000
+    assert metadata['paginas'] == 5 and not metadata['vacio']
+    assert 'truncado' not in metadata
+
+
+def test_short_recording_is_empty(write):
+    assert read_opus_metadata(write(opus_file(0.2)))['vacio']
+
+
+def test_pages_without_granule_and_other_streams_are_skipped(write):
+    content = opus_file(1.0) + ogg_page(bytes(10), NO_GRANULE, 5) + ogg_page(bytes(10), 10 ** 9, 0, serial=99)
+
+    assert read_opus_metadata(write(content))['duracion'] == 1.0
+
+
+@pytest.mark.parametrize('cut', [5, 20, 50])
+def test_truncated_last_page_uses_the_last_complete_one(write, cut):
+    complete = opus_file(3.0, pages=3)
+    content = complete + ogg_page(bytes(100), 10 ** 7, 5)[:cut]
+
+    metadata = read_opus_metadata(write(content))
+    assert metadata['truncado'] and metadata['duracion'] == 3.0
+
+
+@pytest.mark.parametrize('content', [
+    b'',
+    b'RIFF' + bytes(60),
+    CAPTURE_PATTERN + bytes(10),
+    ogg_page(b'OpusTags' + bytes(8), 0, 0),
+    ogg_page(OPUS_HEAD + b'\x01', 0, 0),
+])
+def test_garbage_raises_ogg_error(write, content):
+    path = write(content)
+    with pytest.raises(OggError):
+        read_opus_metadata(path)
+    assert 'error' in extract_metadata(path)
+
+
+def test_missing_file_is_not_marked(tmp_path):
+    assert extract_metadata(str(tmp_path / 'no_existe.ogg')) is None
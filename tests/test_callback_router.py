@@ -0,0 +1,43 @@
+# tests/test_callback_router.py
+
+import pytest
+
+from callback_router import CallbackRouter, answer_stale_callback, decode_callback, encode_callback
+
+
+@pytest.mark.parametrize('namespace, action, arg', [
+    ('tarea', 'elegir', None),
+    ('sm', 'opcion', '3'),
+    # El argumento puede llevar el separador: solo se parten los dos primeros
+    ('sm', 'opcion', 'G-1.1:2'),
+])
+def test_decode_inverts_encode(namespace, action, arg):
+    assert decode_callback(encode_callback(namespace, action, arg)) == (namespace, action, arg)
+
+
+def test_numeric_arg_is_decoded_as_text():
+    assert decode_callback(encode_callback('sm', 'opcion', 3)) == ('sm', 'opcion', '3')
+
+
+def test_data_without_separator():
+    assert decode_callback('antiguo') == ('antiguo', None, None)
+
+
+async def by_action(update, context):
+    pass
+
+
+async def by_namespace(update, context):
+    pass
+
+
+@pytest.mark.parametrize('data, expected', [
+    ('sm:opcion:1', by_action),
+    ('sm:siguiente', by_namespace),
+    ('tarea:elegir:individual', answer_stale_callback),
+    ('antiguo', answer_stale_callback),
+    (None, answer_stale_callback),
+])
+def test_router_resolves_action_then_namespace_then_default(data, expected):
+    router = CallbackRouter({('sm', 'opcion'): by_action, 'sm': by_namespace})
+    assert router.resolve(data) is expected
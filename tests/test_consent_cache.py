@@ -0,0 +1,46 @@
+# tests/test_consent_cache.py
+
+import asyncio
+
+import repository
+from consent_cache import ConsentTextCache
+
+
+def test_missing_version_is_served_from_memory(monkeypatch):
+    loads = []
+
+    async def find_textos_consentimientos():
+        loads.append(1)
+        await asyncio.sleep(0)
+        return [{'version': '1.0', 'texto_consentimiento': 'Texto'}]
+
+    monkeypatch.setattr(repository, 'find_textos_consentimientos', find_textos_consentimientos)
+
+    async def scenario():
+        cache = ConsentTextCache()
+        await cache.load()
+        texts = await asyncio.gather(*(cache.get('2.0') for _ in range(10)))
+        return texts, await cache.get('1.0')
+
+    texts, text = asyncio.run(scenario())
+    assert texts == [None] * 10 and text == 'Texto'
+    # Solo la carga inicial: la recarga por fallo espera MISS_RELOAD_INTERVAL
+    assert len(loads) == 1
+
+
+def test_missing_version_reloads_after_the_interval(monkeypatch):
+    documents = [{'version': '1.0', 'texto_consentimiento': 'Texto'}]
+
+    async def find_textos_consentimientos():
+        return list(documents)
+
+    monkeypatch.setattr(repository, 'find_textos_consentimientos', find_textos_consentimientos)
+    monkeypatch.setattr('consent_cache.MISS_RELOAD_INTERVAL', 0)
+
+    async def scenario():
+        cache = ConsentTextCache()
+        await cache.load()
+        documents.append({'version': '2.0', 'texto_consentimiento': 'Nuevo'})
+        return await cache.get('2.0')
+
+    assert asyncio.run(scenario()) == 'Nuevo'
@@ -0,0 +1,71 @@
+# tests/test_export_checkpoint.py
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from export_responses import Checkpoint
+
+SETTINGS = {'format': 'csv', 'fields': ['respuesta_id', 'respuesta']}
+
+
+class FakeWriter:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+        return self.commits * 100
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'salida.csv.checkpoint.json')
+
+
+def test_first_export_reads_everything(path):
+    checkpoint = Checkpoint(path, SETTINGS)
+
+    assert checkpoint.load() is None
+    assert checkpoint.position is None and checkpoint.query() == {}
+
+
+def test_saved_every_n_batches_and_reloaded(path):
+    writer = FakeWriter()
+    checkpoint = Checkpoint(path, SETTINGS, every=2)
+    first, last = ObjectId(), ObjectId()
+    fecha = datetime(2025, 3, 1, 12, 30)
+
+    checkpoint.advance({'_id': first, 'fecha_insercion': fecha}, 10, writer)
+    assert Checkpoint(path, SETTINGS).load() is None
+    checkpoint.advance({'_id': last, 'fecha_insercion': fecha}, 5, writer)
+
+    state = Checkpoint(path, SETTINGS).load()
+    assert state['_id'] == last and state['fecha_insercion'] == fecha
+    assert state['rows'] == 15 and state['position'] == 100
+    assert checkpoint.query() == {'$or': [
+        {'fecha_insercion': {'$gt': fecha}},
+        {'fecha_insercion': fecha, '_id': {'$gt': last}},
+    ]}
+
+
+def test_watermark_among_answers_without_insertion_date(path):
+    checkpoint = Checkpoint(path, SETTINGS)
+    last = ObjectId()
+    checkpoint.advance({'_id': last}, 1, FakeWriter())
+
+    # Las respuestas con fecha_insercion van detrás de todas las que no la tienen
+    assert checkpoint.query() == {'$or': [
+        {'fecha_insercion': {'$type': 'date'}},
+        {'fecha_insercion': None, '_id': {'$gt': last}},
+    ]}
+
+
+def test_other_settings_are_refused(path):
+    checkpoint = Checkpoint(path, SETTINGS)
+    checkpoint.advance({'_id': ObjectId()}, 1, FakeWriter())
+    checkpoint.save(FakeWriter())
+
+    with pytest.raises(SystemExit):
+        Checkpoint(path, {**SETTINGS, 'format': 'parquet'}).load()
@@ -0,0 +1,120 @@
+# tests/test_migrate_audios.py
+
+import os
+
+import pytest
+
+import database
+import migrate_audios
+from audio_storage import audio_storage
+
+
+@pytest.fixture
+def flat_audios(tmp_path, monkeypatch, fake_db):
+    """Directorio de trabajo del bot con audios en el formato plano y sus respuestas."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audio_storage, 'root', 'audios')
+    monkeypatch.setattr(audio_storage, 'content_hashing', False)
+    os.makedirs('audios')
+    for name, content in (('1_G-1.1_a.ogg', b'uno'), ('2_G-1.2_b.ogg', b'dos')):
+        with open(os.path.join('audios', name), 'wb') as f:
+            f.write(content)
+    fake_db[database.RESPUESTAS].insert_many([
+        {'respuesta_id': 'r1', 'respuesta': 'audios/1_G-1.1_a.ogg'},
+        {'respuesta_id': 'r2', 'respuesta': 'audios/1_G-1.1_a.ogg'},
+        {'respuesta_id': 'r3', 'respuesta': 'audios/2_G-1.2_b.ogg'},
+        {'respuesta_id': 'r4', 'respuesta': 'Opción 1'},
+    ])
+    return fake_db[database.RESPUESTAS]
+
+
+def respuestas(collection) -> dict:
+    return {document['respuesta_id']: document['respuesta'] for document in collection.find({})}
+
+
+@pytest.mark.parametrize('source', ['audios', './audios/', 'ABSOLUTE'])
+def test_updates_answers_whatever_the_source_spelling(flat_audios, source):
+    if source == 'ABSOLUTE':
+        source = os.path.abspath('audios')
+
+    stats = migrate_audios.migrate(source, batch_size=1, dry_run=False)
+
+    paths = respuestas(flat_audios)
+    assert paths['r1'] == paths['r2'] == audio_storage.path_for('1_G-1.1_a.ogg')
+    assert paths['r3'] == audio_storage.path_for('2_G-1.2_b.ogg')
+    assert paths['r4'] == 'Opción 1'
+    assert all(os.path.exists(paths[key]) for key in ('r1', 'r3'))
+    assert not os.path.exists('audios/1_G-1.1_a.ogg')
+    assert stats == {'audios': 2, 'respuestas': 3, 'duplicados': 0}
+
+
+def test_paths_are_stored_relative_to_base_dir(flat_audios, tmp_path, monkeypatch):
+    # El script se ejecuta desde otro directorio que el del bot
+    monkeypatch.chdir(tmp_path.parent)
+    monkeypatch.setattr(audio_storage, 'root', os.path.join(tmp_path.name, 'audios'))
+
+    migrate_audios.migrate(os.path.join(tmp_path.name, 'audios'), 500, False, base_dir=str(tmp_path))
+
+    stored = respuestas(flat_audios)['r3']
+    assert stored == os.path.relpath(audio_storage.path_for('2_G-1.2_b.ogg'), tmp_path.name)
+    assert os.path.exists(os.path.join(tmp_path, stored))
+
+
+def test_refuses_to_move_files_no_answer_points_at(flat_audios):
+    with pytest.raises(SystemExit):
+        migrate_audios.migrate('audios', 500, False, base_dir='otro_directorio')
+
+    assert sorted(os.listdir('audios')) == ['1_G-1.1_a.ogg', '2_G-1.2_b.ogg']
+    assert respuestas(flat_audios)['r1'] == 'audios/1_G-1.1_a.ogg'
+
+
+def test_mongo_error_leaves_files_in_place(flat_audios, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('MongoDB no disponible')
+
+    monkeypatch.setattr(flat_audios, 'bulk_write', fail)
+    with pytest.raises(RuntimeError):
+        migrate_audios.migrate('audios', 500, False)
+
+    assert sorted(os.listdir('audios')) == ['1_G-1.1_a.ogg', '2_G-1.2_b.ogg']
+
+
+def test_interrupted_migration_can_be_run_again(flat_audios, monkeypatch):
+    replace = os.replace
+
+    def crash(*args):
+        raise KeyboardInterrupt
+
+    # Las respuestas se actualizan y el proceso muere antes de mover los ficheros
+    monkeypatch.setattr(migrate_audios.os, 'replace', crash)
+    with pytest.raises(KeyboardInterrupt):
+        migrate_audios.migrate('audios', 500, False)
+    monkeypatch.setattr(migrate_audios.os, 'replace', replace)
+
+    stats = migrate_audios.migrate('audios', 500, False)
+
+    paths = respuestas(flat_audios)
+    assert stats['audios'] == 2 and stats['respuestas'] == 0
+    assert all(os.path.exists(paths[key]) for key in ('r1', 'r2', 'r3'))
+
+
+def test_content_hashing_removes_duplicates(flat_audios, monkeypatch):
+    monkeypatch.setattr(audio_storage, 'content_hashing', True)
+    with open('audios/3_G-1.3_c.ogg', 'wb') as f:
+        f.write(b'uno')
+    flat_audios.insert_one({'respuesta_id': 'r5', 'respuesta': 'audios/3_G-1.3_c.ogg'})
+
+    stats = migrate_audios.migrate('audios', 500, False)
+
+    paths = respuestas(flat_audios)
+    assert paths['r1'] == paths['r5'] != paths['r3']
+    assert stats['duplicados'] == 1
+    assert os.listdir('audios') != [] and not any(name.endswith('.ogg') for name in os.listdir('audios'))
+
+
+def test_dry_run_changes_nothing(flat_audios):
+    stats = migrate_audios.migrate('audios', 500, True)
+
+    assert stats['respuestas'] == 3
+    assert sorted(os.listdir('audios')) == ['1_G-1.1_a.ogg', '2_G-1.2_b.ogg']
+    assert respuestas(flat_audios)['r1'] == 'audios/1_G-1.1_a.ogg'
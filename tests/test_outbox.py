@@ -0,0 +1,79 @@
+# tests/test_outbox.py
+
+import asyncio
+from types import SimpleNamespace
+
+from outbox import MAX_MESSAGE_LENGTH, SEPARATOR, Outbox
+
+KEYBOARD = object()
+
+
+class FakeBot:
+    def __init__(self, fail_chat: int = None):
+        self.messages = []
+        self.fail_chat = fail_chat
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id == self.fail_chat:
+            raise RuntimeError('Forbidden')
+        self.messages.append({'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup})
+
+
+def update(update_id: int = 1, chat_id: int = 1):
+    return SimpleNamespace(update_id=update_id, effective_chat=SimpleNamespace(id=chat_id))
+
+
+def flush(outbox: Outbox, *updates, bot: FakeBot = None) -> list:
+    bot = bot or FakeBot()
+    for pending in updates:
+        asyncio.run(outbox.flush(pending, SimpleNamespace(bot=bot)))
+    return bot.messages
+
+
+def test_consecutive_messages_are_merged_and_keep_the_last_keyboard():
+    outbox, current = Outbox(), update()
+    outbox.send(current, "Respuesta guardada")
+    outbox.send(current, "Pregunta 2", reply_markup=KEYBOARD)
+
+    assert flush(outbox, current) == [{'chat_id': 1, 'text': f"Respuesta guardada{SEPARATOR}Pregunta 2",
+                                       'reply_markup': KEYBOARD}]
+    assert outbox.sent == 1 and outbox.coalesced == 1
+
+
+def test_message_with_keyboard_is_not_merged():
+    outbox, current = Outbox(), update()
+    outbox.send(current, "Pregunta 1", reply_markup=KEYBOARD)
+    outbox.send(current, "Pregunta 2")
+
+    assert [message['text'] for message in flush(outbox, current)] == ["Pregunta 1", "Pregunta 2"]
+
+
+def test_merge_stops_at_the_telegram_limit():
+    outbox, current = Outbox(), update()
+    first = 'a' * (MAX_MESSAGE_LENGTH - len(SEPARATOR) - 10)
+    outbox.send(current, first)
+    outbox.send(current, 'b' * 10)
+    outbox.send(current, 'c')
+
+    texts = [message['text'] for message in flush(outbox, current)]
+    assert texts == [f"{first}{SEPARATOR}{'b' * 10}", 'c']
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for text in texts)
+
+
+def test_different_chats_and_updates_are_kept_apart():
+    outbox, first, second = Outbox(), update(1), update(2)
+    outbox.send(first, "Para el chat 1")
+    outbox.send(first, "Para el chat 2", chat_id=2)
+    outbox.send(second, "Otra actualización")
+
+    assert [message['text'] for message in flush(outbox, first)] == ["Para el chat 1", "Para el chat 2"]
+    assert [message['text'] for message in flush(outbox, second)] == ["Otra actualización"]
+
+
+def test_a_failed_send_does_not_stop_the_rest():
+    outbox, current = Outbox(), update()
+    outbox.send(current, "Bloqueado", chat_id=2)
+    outbox.send(current, "Entregado")
+
+    assert [message['text'] for message in flush(outbox, current, bot=FakeBot(fail_chat=2))] == ["Entregado"]
+    assert outbox.sent == 1
@@ -0,0 +1,49 @@
+# tests/test_persistence.py
+
+import asyncio
+
+import repository
+from persistence import MongoPersistence
+
+
+def test_conversation_states_of_one_pass_are_written_together(monkeypatch):
+    writes = []
+
+    async def save_estados_conversacion(operations):
+        writes.append(len(operations))
+
+    monkeypatch.setattr(repository, 'save_estados_conversacion', save_estados_conversacion)
+
+    async def scenario():
+        persistence = MongoPersistence(update_interval=60)
+        # Como Application.update_persistence: todos los estados en un gather
+        await asyncio.gather(*(persistence.update_conversation('registro', (n, n), 1) for n in range(5)))
+        await asyncio.sleep(0)
+        # Sin esperar update_interval otra vez
+        assert writes == [5]
+        await persistence.update_conversation('registro', (0, 0), None)
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert writes == [5, 1]
+
+
+def test_failed_states_are_retried_on_flush(monkeypatch):
+    writes = []
+
+    async def save_estados_conversacion(operations):
+        if not writes:
+            writes.append('fallo')
+            raise RuntimeError('MongoDB no disponible')
+        writes.append(len(operations))
+
+    monkeypatch.setattr(repository, 'save_estados_conversacion', save_estados_conversacion)
+
+    async def scenario():
+        persistence = MongoPersistence(update_interval=60)
+        await persistence.update_conversation('registro', (1, 1), 2)
+        await asyncio.sleep(0)
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert writes == ['fallo', 1]
@@ -0,0 +1,76 @@
+# tests/test_rate_limiter.py
+
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from rate_limiter import PRIORITY_INTERACTIVE, PriorityRateLimiter, _TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = _TokenBucket(rate=2, capacity=3, now=0.0)
+    for _ in range(3):
+        assert bucket.wait_time(0.0) == 0
+        bucket.consume(0.0)
+    assert bucket.wait_time(0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(0.5) == 0
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = _TokenBucket(rate=1, capacity=2, now=0.0)
+    bucket.consume(0.0)
+    bucket.consume(0.0)
+    assert not bucket.full(1.0)
+    assert bucket.full(100.0) and bucket.tokens == 2
+
+
+def test_retry_keeps_its_place_in_the_queue():
+    calls = []
+
+    def request(name: str, fail_first: bool = False):
+        async def callback():
+            calls.append(name)
+            if fail_first and calls.count(name) == 1:
+                await asyncio.sleep(0.02)
+                raise RetryAfter(1)
+            return name
+        return callback
+
+    async def scenario():
+        # Un mensaje cada 50 ms en el chat: B espera en la cola mientras se envía A
+        limiter = PriorityRateLimiter(overall_rate=1000, chat_rate=20, chat_burst=1)
+        await limiter.initialize()
+        # RetryAfter(1) pausaría un segundo; basta con una pausa corta
+        limiter._pause = lambda seconds: PriorityRateLimiter._pause(limiter, 0.05)
+        try:
+            first = asyncio.create_task(
+                limiter.process_request(request('A', fail_first=True), (), {}, 'sendMessage', {'chat_id': 1}, None))
+            await asyncio.sleep(0.005)
+            second = asyncio.create_task(
+                limiter.process_request(request('B'), (), {}, 'sendMessage', {'chat_id': 1}, None))
+            return await asyncio.gather(first, second)
+        finally:
+            await limiter.shutdown()
+
+    assert asyncio.run(scenario()) == ['A', 'B']
+    # El reintento de A sale antes que B, que llegó después
+    assert calls == ['A', 'A', 'B']
+
+
+def test_queue_depth_ignores_cancelled_requests():
+    async def scenario():
+        limiter = PriorityRateLimiter()
+        await limiter.initialize()
+        limiter._pause(60)
+        try:
+            waiting = [asyncio.create_task(limiter._acquire(PRIORITY_INTERACTIVE, chat_id)) for chat_id in (1, 2)]
+            await asyncio.sleep(0)
+            assert limiter.queue_depth() == 2
+            waiting[0].cancel()
+            await asyncio.sleep(0)
+            return limiter.queue_depth(), limiter.stats()['en_cola'], len(limiter._queue)
+        finally:
+            await limiter.shutdown()
+
+    assert asyncio.run(scenario()) == (1, 1, 2)
@@ -0,0 +1,196 @@
+# tests/test_registration_form.py
+
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import registration_form
+from callback_router import encode_callback
+from forms import REGISTRO
+from handlers import registration
+from outbox import outbox
+from registration_form import FIRST_STEP, PARTICIPANT_FIELDS, STEPS, Option, Step
+
+TEXT_ANSWERS = {'email': 'ana@example.com', 'anio_nacimiento': '1990', 'grado_tipo': 'Psicología'}
+_update_ids = itertools.count(1)
+
+
+# ============================================================================
+# TABLA DE PASOS
+# ============================================================================
+
+def test_check_steps_rejects_unknown_next(monkeypatch):
+    broken = [Step('papel', "¿Papel?", key='papel', options=[Option('otro', "Otro", next='no_existe')])]
+    monkeypatch.setattr(registration_form, '_STEPS', broken)
+    monkeypatch.setattr(registration_form, 'STEPS', {step.name: step for step in broken})
+
+    with pytest.raises(ValueError, match="no_existe"):
+        registration_form._check_steps()
+
+
+def successors(step: Step) -> set:
+    if step.kind == 'text':
+        return {step.next}
+    return {option.next or step.next for option in step.options}
+
+
+def test_every_step_is_reachable_and_every_path_ends():
+    reachable, pending = set(), [FIRST_STEP]
+    while pending:
+        name = pending.pop()
+        if name is None or name in reachable:
+            continue
+        reachable.add(name)
+        pending.extend(successors(STEPS[name]))
+
+    assert reachable == set(STEPS)
+    assert any(None in successors(step) for step in STEPS.values())
+    assert {step.key for step in STEPS.values()} <= set(PARTICIPANT_FIELDS)
+
+
+@pytest.mark.parametrize('validator, text', [
+    (registration_form.validate_email, 'ana@'),
+    (registration_form.validate_birth_year, 'mil novecientos'),
+    (registration_form.validate_birth_year, '2024'),
+    (registration_form.validate_degree, 'x'),
+])
+def test_validators_reject_with_a_message(validator, text):
+    with pytest.raises(ValueError):
+        validator(text)
+
+
+# ============================================================================
+# TRANSICIONES (handlers/registration.py)
+# ============================================================================
+
+class Registration:
+    """Recorre el formulario llamando a los handlers con actualizaciones mínimas."""
+
+    def __init__(self, flow_name: str):
+        self.flow_name = flow_name
+        self.context = SimpleNamespace(user_data={})
+        self.completed = 0
+        self.edits = []
+        self.sent = []
+
+    def _update(self, **fields):
+        return SimpleNamespace(update_id=next(_update_ids), effective_chat=SimpleNamespace(id=1), **fields)
+
+    def _collect(self, update):
+        self.sent.extend(message['text'] for message in outbox._pending.pop(update.update_id, []))
+
+    @property
+    def step(self) -> str:
+        return self.context.user_data.get(registration.STEP_KEY)
+
+    async def start(self):
+        update = self._update()
+        assert await registration.start(update, self.context, self.flow_name) == REGISTRO
+        self._collect(update)
+
+    async def choose(self, option_id: str, step_name: str = None):
+        async def answer():
+            pass
+
+        async def edit_message_text(text):
+            self.edits.append(text)
+
+        query = SimpleNamespace(data=encode_callback('registro', step_name or self.step, option_id),
+                                answer=answer, edit_message_text=edit_message_text)
+        update = self._update(callback_query=query)
+        state = await registration.handle_choice(update, self.context)
+        self._collect(update)
+        return state
+
+    async def write(self, text: str):
+        update = self._update(message=SimpleNamespace(text=text))
+        state = await registration.handle_text(update, self.context)
+        self._collect(update)
+        return state
+
+    async def complete(self):
+        """Primera opción con valor en los pasos de botones; TEXT_ANSWERS o 'Texto' en los de texto."""
+        while self.step is not None:
+            step = STEPS[self.step]
+            if step.kind == 'choice':
+                await self.choose(next(option.id for option in step.options if option.value is not None))
+            else:
+                await self.write(TEXT_ANSWERS.get(step.name, 'Texto'))
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    calls = []
+
+    def completion(flow_name):
+        async def complete(update, context):
+            calls.append(flow_name)
+            return 'FIN'
+        return complete
+
+    monkeypatch.setattr(registration, '_completions', {name: completion(name) for name in registration_form.FLOWS})
+    return calls
+
+
+def test_other_option_asks_for_text_in_the_same_message(completions):
+    async def scenario():
+        form = Registration('individual')
+        await form.start()
+        await form.choose('papel_otro')
+        assert form.step == 'otro_papel' and 'papel' not in form.context.user_data
+        assert form.edits == [STEPS['otro_papel'].question]
+        await form.write('Técnico de laboratorio')
+        return form
+
+    form = asyncio.run(scenario())
+    assert form.context.user_data['papel'] == 'Técnico de laboratorio'
+    assert form.step == 'email'
+
+
+def test_invalid_text_and_stale_buttons_keep_the_step(completions):
+    async def scenario():
+        form = Registration('individual')
+        await form.start()
+        await form.choose('papel_estudiante')
+        assert await form.write('no es un correo') == REGISTRO
+        # Botón de un mensaje anterior
+        assert await form.choose('papel_profesor', step_name='papel') == REGISTRO
+        return form
+
+    form = asyncio.run(scenario())
+    assert form.step == 'email' and form.context.user_data['papel'] == 'Estudiante'
+    assert form.sent[-1].startswith("El correo electrónico proporcionado no es válido")
+
+
+def test_individual_flow_completes_once(completions):
+    async def scenario():
+        form = Registration('individual')
+        await form.start()
+        await form.complete()
+        return form
+
+    form = asyncio.run(scenario())
+    assert completions == ['individual']
+    assert form.context.user_data['email'] == 'ana@example.com'
+    assert form.context.user_data['anio_nacimiento'] == 1990
+    assert registration.STEP_KEY not in form.context.user_data
+
+
+def test_group_flow_collects_both_participants(completions):
+    async def scenario():
+        form = Registration('grupal')
+        await form.start()
+        await form.complete()
+        return form
+
+    form = asyncio.run(scenario())
+    user_data = form.context.user_data
+    assert completions == ['grupal']
+    assert user_data['email_participante_1'] == user_data['email_participante_2'] == 'ana@example.com'
+    assert 'email' not in user_data
+    assert form.sent[0] == "Participante 1, por favor, selecciona tu papel:"
+    # outbox une el aviso con la primera pregunta del participante 2
+    assert ("Gracias. Ahora, vamos a recoger los datos del participante 2.\n\n"
+            "Participante 2, por favor, selecciona tu papel:") in form.sent
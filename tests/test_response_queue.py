@@ -0,0 +1,168 @@
+# tests/test_response_queue.py
+
+import asyncio
+import os
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import repository
+from response_queue import DUPLICATE_KEY_ERROR, ResponseQueue
+
+
+class FakeRespuestas:
+    """save_respuestas en memoria con el índice único de respuesta_id."""
+
+    def __init__(self):
+        self.documents = {}
+        self.available = True
+
+    async def save(self, documents: list, ordered: bool = True):
+        if not self.available:
+            raise AutoReconnect('MongoDB no disponible')
+        errors = []
+        inserted = 0
+        for index, document in enumerate(documents):
+            if document['respuesta_id'] in self.documents:
+                errors.append({'index': index, 'code': DUPLICATE_KEY_ERROR})
+                if ordered:
+                    break
+                continue
+            self.documents[document['respuesta_id']] = dict(document)
+            inserted += 1
+        if errors:
+            raise BulkWriteError({'nInserted': inserted, 'writeErrors': errors})
+
+
+@pytest.fixture
+def respuestas(monkeypatch):
+    fake = FakeRespuestas()
+    monkeypatch.setattr(repository, 'save_respuestas', fake.save)
+    return fake
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ResponseQueue(batch_size=2, flush_interval=60, spill_path=str(tmp_path / 'pendientes.jsonl'))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_flush_writes_in_batches_and_confirms(queue, respuestas):
+    saved = []
+
+    async def scenario():
+        await queue.start()
+        for n in range(5):
+            queue.enqueue({'respuesta_id': f'r{n}'}, on_saved=lambda n=n: saved.append(n))
+        await queue.flush()
+        await queue.stop()
+
+    run(scenario())
+    assert sorted(respuestas.documents) == ['r0', 'r1', 'r2', 'r3', 'r4']
+    assert sorted(saved) == [0, 1, 2, 3, 4]
+    assert all('fecha_insercion' in document for document in respuestas.documents.values())
+
+
+def test_duplicate_counts_as_saved(queue, respuestas):
+    respuestas.documents['r1'] = {'respuesta_id': 'r1'}
+    saved = []
+
+    async def scenario():
+        await queue.start()
+        for n in range(3):
+            queue.enqueue({'respuesta_id': f'r{n}'}, on_saved=lambda n=n: saved.append(n))
+        await queue.flush()
+        await queue.stop()
+
+    run(scenario())
+    assert sorted(respuestas.documents) == ['r0', 'r1', 'r2']
+    assert sorted(saved) == [0, 1, 2]
+    assert not os.path.exists(queue.spill_path)
+
+
+def test_spill_and_replay_when_mongo_is_down(queue, respuestas):
+    saved = []
+
+    async def scenario():
+        await queue.start()
+        respuestas.available = False
+        for n in range(3):
+            queue.enqueue({'respuesta_id': f'r{n}'}, on_saved=lambda n=n: saved.append(n))
+        await queue.flush()
+        # En disco ya cuentan como guardadas
+        assert sorted(saved) == [0, 1, 2] and len(queue) == 0
+        assert os.path.exists(queue.spill_path) and not respuestas.documents
+
+        respuestas.available = True
+        await queue.flush()
+        await queue.stop()
+
+    run(scenario())
+    assert sorted(respuestas.documents) == ['r0', 'r1', 'r2']
+    assert not os.path.exists(queue.spill_path)
+
+
+def test_spill_is_replayed_on_start(queue, respuestas):
+    async def scenario():
+        await queue.start()
+        respuestas.available = False
+        queue.enqueue({'respuesta_id': 'r0'})
+        await queue.stop()
+
+        # Reinicio con MongoDB disponible
+        respuestas.available = True
+        restarted = ResponseQueue(2, 60, queue.spill_path)
+        await restarted.start()
+        await restarted.stop()
+
+    run(scenario())
+    assert list(respuestas.documents) == ['r0']
+    assert not os.path.exists(queue.spill_path)
+
+
+def test_unexpected_error_spills_the_batch(queue, respuestas, monkeypatch):
+    saved = []
+
+    async def fail(documents, ordered=True):
+        raise TypeError('documento no codificable')
+
+    async def scenario():
+        await queue.start()
+        monkeypatch.setattr(repository, 'save_respuestas', fail)
+        queue.enqueue({'respuesta_id': 'r0'}, on_saved=lambda: saved.append(0))
+        await queue.flush()
+        assert saved == [0] and os.path.exists(queue.spill_path)
+
+        monkeypatch.setattr(repository, 'save_respuestas', respuestas.save)
+        await queue.flush()
+        await queue.stop()
+
+    run(scenario())
+    assert list(respuestas.documents) == ['r0']
+
+
+def test_background_task_survives_a_failed_flush(queue, respuestas, monkeypatch):
+    flush = queue.flush
+    calls = []
+
+    async def failing_flush():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('fallo inesperado')
+        await flush()
+
+    async def scenario():
+        queue.flush_interval = 0.01
+        monkeypatch.setattr(queue, 'flush', failing_flush)
+        await queue.start()
+        queue.enqueue({'respuesta_id': 'r0'})
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        assert not queue._task.done()
+        await queue.stop()
+
+    run(scenario())
+    assert list(respuestas.documents) == ['r0']
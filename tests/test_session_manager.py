@@ -0,0 +1,22 @@
+# tests/test_session_manager.py
+
+from types import SimpleNamespace
+
+from persistence import MongoPersistence
+from session_manager import SessionManager, deep_sizeof
+
+
+def test_stats_include_persistence_snapshots():
+    user_data = {1: {'pareja_id': 'pareja-1', 'respuestas': ['a' * 100] * 10}, 2: {}}
+    persistence = MongoPersistence()
+    persistence._snapshots[1] = {'pareja_id': 'pareja-1', 'respuestas': ['a' * 100] * 10}
+    persistence._loaded_users.update({1, 2})
+
+    manager = SessionManager(ttl=0, sweep_interval=60, checkpoint=False, send_hint=False)
+    manager.start(SimpleNamespace(user_data=user_data), persistence)
+    stats = manager.stats()
+
+    assert stats['sesiones'] == 1
+    assert stats['bytes_sesiones'] == deep_sizeof(user_data[1])
+    assert stats['bytes_persistencia'] >= deep_sizeof(persistence._snapshots)
+    assert stats['bytes'] == stats['bytes_sesiones'] + stats['bytes_persistencia']
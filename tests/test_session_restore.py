@@ -0,0 +1,103 @@
+# tests/test_session_restore.py
+#
+# Reinicio del bot con un estado de conversación guardado pero sin la sesión
+# del cuestionario en user_data (el bot se detuvo entre el bulk_write de los
+# estados y la escritura de datos_usuario). Los handlers del cuestionario no
+# deben fallar: empiezan uno nuevo o terminan la conversación.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import offline_bot
+import repository
+from forms import PREGUNTAS_GRUPAL, PREGUNTAS_INDIVIDUAL
+from session import SESSION_KEY
+
+USER_ID = 300001
+
+
+def text_message(bot, text: str) -> dict:
+    user = {'id': USER_ID, 'is_bot': False, 'first_name': 'Participante'}
+    return {
+        'update_id': bot.next_update_id(),
+        'message': {
+            'message_id': 1,
+            'date': int(datetime.now(timezone.utc).timestamp()),
+            'chat': {'id': USER_ID, 'type': 'private'},
+            'from': user,
+            'text': text,
+        },
+    }
+
+
+async def restart_with_state(monkeypatch, state: int, user_data: dict = None):
+    """Arranca el bot offline con el estado `state` guardado y `user_data` (o nada) en datos_usuario."""
+    install_fake_mongo = offline_bot.install_fake_mongo
+
+    def install_with_saved_state(*args, **kwargs):
+        collections = install_fake_mongo(*args, **kwargs)
+        collections['estados_conversacion'].documents.append({
+            '_id': f'registro:{USER_ID}:{USER_ID}', 'name': 'registro', 'key': [USER_ID, USER_ID], 'state': state,
+        })
+        if user_data is not None:
+            collections['datos_usuario'].documents.append({'_id': USER_ID, 'user_data': user_data})
+        return collections
+
+    monkeypatch.setattr(offline_bot, 'install_fake_mongo', install_with_saved_state)
+    # post_shutdown cierra el pool de MongoDB; cada prueba arranca el bot con uno nuevo
+    monkeypatch.setattr(repository, '_executor', ThreadPoolExecutor(max_workers=2))
+    bot = offline_bot.OfflineBot()
+    await bot.start()
+    return bot
+
+
+def sent_text(bot) -> str:
+    """Todo lo que el bot ha enviado al participante (outbox agrupa los mensajes de cada actualización)."""
+    return '\n\n'.join(message.get('text') or '' for message in bot.request.messages(USER_ID))
+
+
+def test_individual_questionnaire_restarts_without_session(monkeypatch):
+    async def scenario():
+        bot = await restart_with_state(monkeypatch, PREGUNTAS_INDIVIDUAL)
+        try:
+            await bot.process_update(text_message(bot, 'hola'))
+            return sent_text(bot), bot.user_data(USER_ID).get(SESSION_KEY)
+        finally:
+            await bot.stop()
+
+    text, session = asyncio.run(scenario())
+    assert text.startswith("No hemos podido recuperar tu cuestionario. Empezamos uno nuevo.")
+    assert session is not None and session.index == 0 and len(session) > 0
+    # Se ha enviado la primera pregunta del cuestionario nuevo
+    assert '\U0001F4AC' in text
+
+
+def test_group_questionnaire_ends_without_session_or_pair(monkeypatch):
+    async def scenario():
+        bot = await restart_with_state(monkeypatch, PREGUNTAS_GRUPAL)
+        try:
+            await bot.process_update(text_message(bot, 'hola'))
+            # El siguiente mensaje ya no llega al cuestionario
+            await bot.process_update(text_message(bot, 'hola'))
+            return sent_text(bot), bot.user_data(USER_ID).get(SESSION_KEY)
+        finally:
+            await bot.stop()
+
+    text, session = asyncio.run(scenario())
+    assert text == "No hemos podido recuperar su cuestionario. Escriban /start para empezar de nuevo."
+    assert session is None
+
+
+def test_group_questionnaire_restarts_with_pair(monkeypatch):
+    async def scenario():
+        bot = await restart_with_state(monkeypatch, PREGUNTAS_GRUPAL, {'pareja_id': 'pareja-1'})
+        try:
+            await bot.process_update(text_message(bot, 'hola'))
+            return sent_text(bot), bot.user_data(USER_ID).get(SESSION_KEY)
+        finally:
+            await bot.stop()
+
+    text, session = asyncio.run(scenario())
+    assert text.startswith("No hemos podido recuperar su cuestionario. Empezamos uno nuevo.")
+    assert session is not None and session.current_question_id.startswith('G-1.')
@@ -0,0 +1,94 @@
+# update_processor.py
+
+import asyncio
+import logging
+import time
+
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+from config import LOG_SLOW_UPDATE
+from logging_setup import user_id_var
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Procesa actualizaciones de distintos usuarios en paralelo y las de un mismo
+    usuario en orden.
+
+    Cada par (chat, usuario) tiene su propio candado, de modo que el
+    ConversationHandler nunca ve dos actualizaciones del mismo participante a
+    la vez. El candado se toma antes de ocupar una de las
+    `max_concurrent_updates` plazas globales de PTB, así que las actualizaciones
+    que esperan su turno no quitan plazas a otros usuarios. Los candados de
+    asyncio despiertan a las tareas en orden de llegada, así que se respeta el
+    orden de cada conversación.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # clave -> [candado, actualizaciones en curso o esperando]
+        self._locks = {}
+
+    @staticmethod
+    def _conversation_key(update):
+        chat = getattr(update, 'effective_chat', None)
+        user = getattr(update, 'effective_user', None)
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def process_update(self, update, coroutine):
+        """
+        Sustituye a la de BaseUpdateProcessor para esperar el turno del usuario
+        antes de ocupar una de las `max_concurrent_updates` plazas globales:
+        si un participante envía muchas actualizaciones seguidas, solo la que
+        se está procesando ocupa plaza y el resto de usuarios no se bloquea.
+        """
+        user = getattr(update, 'effective_user', None)
+        token = user_id_var.set(user.id if user else None)
+        start = time.perf_counter()
+        try:
+            await self._process_in_order(update, coroutine)
+        finally:
+            # Incluye la espera por las actualizaciones anteriores del mismo usuario
+            latency = time.perf_counter() - start
+            metrics.UPDATE_LATENCY.observe(latency)
+            extra = {'latency_ms': round(latency * 1000, 1)}
+            if latency >= LOG_SLOW_UPDATE:
+                logger.warning("Actualización %s lenta: %.0f ms", getattr(update, 'update_id', None), latency * 1000, extra=extra)
+            else:
+                logger.debug("Actualización %s procesada en %.1f ms", getattr(update, 'update_id', None), latency * 1000, extra=extra)
+            user_id_var.reset(token)
+
+    async def _process_in_order(self, update, coroutine):
+        key = self._conversation_key(update)
+        if key is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Primero el candado del usuario y después la plaza global
+            async with entry[0]:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass